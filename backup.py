@@ -0,0 +1,227 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    BACKUP_DIR, BACKUP_KEEP, BACKUP_COMPRESS,
+    BACKUP_PAGES_PER_STEP, BACKUP_STEP_PAUSE
+)
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# Таблицы, без которых копия считается битой
+REQUIRED_TABLES = {'employees', 'records', 'system_settings'}
+
+def backup_dir() -> str:
+    if os.path.isabs(BACKUP_DIR):
+        return BACKUP_DIR
+    return os.path.join(os.path.dirname(os.path.abspath(db.db_path)), BACKUP_DIR)
+
+def _backup_prefix() -> str:
+    return os.path.splitext(os.path.basename(db.db_path))[0] + "-"
+
+def _copy_pages(source: sqlite3.Connection, target: sqlite3.Connection):
+    """
+    Копирование страницами через backup API.
+    Открытая транзакция чтения фиксирует снимок базы: в режиме WAL она не мешает
+    записи, а копия не начинается заново после каждого изменения базы
+    """
+    source.execute("BEGIN")
+    source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+    try:
+        source.backup(
+            target,
+            pages=BACKUP_PAGES_PER_STEP,
+            progress=lambda status, remaining, total: time.sleep(BACKUP_STEP_PAUSE)
+        )
+    finally:
+        source.rollback()
+
+def check_integrity(path: str) -> Tuple[bool, str]:
+    """PRAGMA integrity_check и наличие основных таблиц"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            return False, result
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = REQUIRED_TABLES - tables
+        if missing:
+            return False, f"нет таблиц: {', '.join(sorted(missing))}"
+        return True, "ok"
+    except sqlite3.DatabaseError as e:
+        return False, str(e)
+    finally:
+        conn.close()
+
+def _copy_archives(target_dir: str):
+    """Годовые архивы не меняются - копируем только новые"""
+    for year in sorted(db.archived_years):
+        source = db._archive_path(year)
+        target = os.path.join(target_dir, "archive", os.path.basename(source))
+        if os.path.exists(target) or not os.path.exists(source):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy2(source, target + ".part")
+        os.replace(target + ".part", target)
+        logger.info(f"Архив {year} скопирован в резервные копии")
+
+def rotate_backups(keep: int = BACKUP_KEEP) -> int:
+    """Удаляет старые копии, оставляя keep последних"""
+    removed = 0
+    for backup in list_backups()[keep:]:
+        os.remove(os.path.join(backup_dir(), backup['name']))
+        removed += 1
+    return removed
+
+def create_backup(tag: str = None, compress: bool = BACKUP_COMPRESS) -> Optional[Dict[str, Any]]:
+    """
+    Онлайн-копия базы. Выполняется в рабочем потоке, не в цикле событий.
+    Копия проверяется integrity_check до сжатия и ротации
+    """
+    started = time.monotonic()
+    target_dir = backup_dir()
+    os.makedirs(target_dir, exist_ok=True)
+
+    name = _backup_prefix() + datetime.now().strftime("%Y%m%d-%H%M%S")
+    if tag:
+        name += f"-{tag}"
+    name += ".db"
+    path = os.path.join(target_dir, name)
+    part = path + ".part"
+
+    try:
+        source = sqlite3.connect(db.db_path)
+        target = sqlite3.connect(part)
+        try:
+            _copy_pages(source, target)
+            # Копия - один самодостаточный файл без -wal/-shm
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+            source.close()
+
+        ok, details = check_integrity(part)
+        if not ok:
+            os.remove(part)
+            logger.error(f"Резервная копия не прошла проверку: {details}")
+            return None
+
+        if compress:
+            with open(part, "rb") as src, gzip.open(part + ".gz", "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(part)
+            name += ".gz"
+            os.replace(part + ".gz", path + ".gz")
+            path += ".gz"
+        else:
+            os.replace(part, path)
+
+        _copy_archives(target_dir)
+        removed = rotate_backups()
+
+        result = {
+            'name': name,
+            'size': os.path.getsize(path),
+            'seconds': round(time.monotonic() - started, 2),
+            'removed': removed,
+        }
+        logger.info(f"Резервная копия {name}: {result['size']} байт за {result['seconds']} с")
+        return result
+    except Exception as e:
+        logger.error(f"Ошибка резервного копирования: {e}")
+        for leftover in (part, part + ".gz"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        return None
+
+def list_backups() -> List[Dict[str, Any]]:
+    """Копии от новых к старым"""
+    target_dir = backup_dir()
+    if not os.path.isdir(target_dir):
+        return []
+
+    prefix = _backup_prefix()
+    backups = []
+    for name in os.listdir(target_dir):
+        if name.startswith(prefix) and (name.endswith(".db") or name.endswith(".db.gz")):
+            stat = os.stat(os.path.join(target_dir, name))
+            backups.append({'name': name, 'size': stat.st_size, 'mtime': stat.st_mtime})
+    backups.sort(key=lambda b: b['mtime'], reverse=True)
+    return backups
+
+def backup_key(name: str) -> str:
+    """Короткий ключ копии для кнопок: имя целиком не влезает в 64 байта callback_data"""
+    return hashlib.blake2b(name.encode(), digest_size=6).hexdigest()
+
+def find_backup(key: str) -> Optional[str]:
+    for backup in list_backups():
+        if backup_key(backup['name']) == key:
+            return backup['name']
+    return None
+
+def restore_backup(name: str) -> Tuple[bool, str]:
+    """
+    Восстановление из копии: распаковка, проверка целостности,
+    страховочная копия текущей базы и перенос страниц в рабочий файл
+    """
+    if os.path.basename(name) != name or name not in {b['name'] for b in list_backups()}:
+        return False, "копия не найдена"
+
+    path = os.path.join(backup_dir(), name)
+    restored = os.path.join(backup_dir(), ".restore.db")
+    try:
+        if name.endswith(".gz"):
+            with gzip.open(path, "rb") as src, open(restored, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        else:
+            shutil.copy2(path, restored)
+
+        ok, details = check_integrity(restored)
+        if not ok:
+            return False, f"копия повреждена: {details}"
+
+        if not create_backup(tag="pre-restore"):
+            return False, "не удалось сохранить текущую базу перед восстановлением"
+
+        source = sqlite3.connect(restored)
+        target = sqlite3.connect(db.db_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+        # Схема копии могла быть старее - миграции и флаги архива перечитываются
+        db.init_database()
+        db.cache.clear()
+        logger.warning(f"База восстановлена из копии {name}")
+        return True, "ok"
+    except Exception as e:
+        logger.error(f"Ошибка восстановления из {name}: {e}")
+        return False, str(e)
+    finally:
+        if os.path.exists(restored):
+            os.remove(restored)
+
+async def run_backup(tag: str = None) -> Optional[Dict[str, Any]]:
+    """Резервная копия в рабочем потоке (для планировщика и команд)"""
+    return await asyncio.get_running_loop().run_in_executor(None, create_backup, tag)
+
+def format_backups(backups: List[Dict[str, Any]], limit: int = 10) -> str:
+    if not backups:
+        return "💾 Резервных копий пока нет"
+
+    text = f"💾 Резервные копии ({len(backups)}):\n\n"
+    for backup in backups[:limit]:
+        created = datetime.fromtimestamp(backup['mtime']).strftime("%d.%m.%Y %H:%M")
+        text += f"• <code>{backup['name']}</code>\n  {created}, {backup['size'] / 1024:.0f} КБ\n"
+    return text
@@ -2,7 +2,7 @@ import logging
 import asyncio
 import re
 from datetime import datetime, date, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command, CommandStart
@@ -12,8 +12,14 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.utils.markdown import hbold
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from config import BOT_TOKEN, ADMIN_IDS
+from config import (
+    BOT_TOKEN, ADMIN_IDS, SHIFT_HOURS, EMPLOYEES_PAGE_SIZE,
+    SEARCH_RESULTS_LIMIT, HISTORY_PAGE_SIZE, MAX_BULK_DATES,
+    BACKUP_INTERVAL_HOURS, MAINTENANCE_INTERVAL_MINUTES, WORKERS,
+    UPDATE_DEDUPE_FLUSH_INTERVAL, TELEGRAM_API_URL, RECORD_UPDATES, BROADCAST_SYNC_INTERVAL
+)
 try:
     from database_postgres import db
     print("✅ Используем PostgreSQL базу данных")
@@ -22,6 +28,16 @@ except ImportError:
     print("⚠️ Используем SQLite базу данных")
 from keyboards import *
 from calculations import *
+from send_queue import send_scheduler, format_send_stats
+from team_coverage import calculate_coverage, format_coverage
+from broadcast import start_broadcast, cancel_broadcast, resume_broadcasts, sync_broadcasts, format_broadcast_progress
+from backup import run_backup, list_backups, restore_backup, format_backups, backup_key, find_backup
+from middlewares import activity, user_order, update_dedupe
+from maintenance import run_maintenance, get_last_report, format_maintenance
+from sharding import ShardedPolling
+from telegram_session import create_session, format_session_stats, POLLING_BACKOFF
+from profiling import start_profiling, stop_profiling, start_memory_tracing, stop_memory_tracing, memory_report
+from loop_watchdog import loop_watchdog, format_lag
 
 # Настройка логирования
 logging.basicConfig(
@@ -35,9 +51,21 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Инициализация бота
-bot = Bot(token=BOT_TOKEN)
+bot = Bot(token=BOT_TOKEN, session=create_session())
+bot.session.middleware(send_scheduler)
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
+dp.update.outer_middleware(activity)
+# В режиме воркеров повторы отсекает фронт до раздачи апдейтов
+if WORKERS == 1:
+    dp.update.outer_middleware(update_dedupe)
+if RECORD_UPDATES:
+    from recorder import UpdateRecorder
+    dp.update.outer_middleware(UpdateRecorder())
+dp.update.outer_middleware(user_order)
+
+# Фоновые задачи: резервные копии и обслуживание базы
+scheduler = AsyncIOScheduler()
 
 # ============================================
 # STATES (СОСТОЯНИЯ ДЛЯ FSM)
@@ -68,6 +96,10 @@ class SalaryState(StatesGroup):
 class CheckDayState(StatesGroup):
     waiting_date = State()
 
+class BroadcastState(StatesGroup):
+    waiting_text = State()
+    waiting_confirm = State()
+
 # ============================================
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
 # ============================================
@@ -149,6 +181,129 @@ def parse_flexible_date(date_str: str) -> Optional[date]:
     
     return None
 
+def parse_past_date(value: str) -> Optional[date]:
+    """
+    Дата для отметки задним числом: "15.10" без года - ближайшее прошедшее 15 октября
+    """
+    today = date.today()
+    match = re.match(r'^(\d{1,2})[\./](\d{1,2})$', value.strip())
+    if not match:
+        return parse_flexible_date(value)
+    day, month = int(match.group(1)), int(match.group(2))
+    try:
+        result = date(today.year, month, day)
+    except ValueError:
+        return None
+    # "30.12" в январе - это прошлый год
+    if result > today + timedelta(days=31):
+        try:
+            result = date(today.year - 1, month, day)
+        except ValueError:
+            return None
+    return result
+
+def parse_shift_dates(text: str) -> Tuple[List[date], Optional[float], List[str]]:
+    """
+    Разбор списка дат для пакетной отметки: "1.10 2.10 5.10-7.10 8ч".
+    Возвращает (даты, часы или None, нераспознанные части)
+    """
+    dates = set()
+    hours = None
+    bad_parts = []
+    
+    text = text.lower()
+    hours_match = re.search(r'(?:^|\s)(\d+(?:[\.,]\d+)?)\s*(?:ч|h|часов|часа|час)(?=\s|$)', text)
+    if hours_match:
+        hours = float(hours_match.group(1).replace(",", "."))
+        text = text[:hours_match.start()] + " " + text[hours_match.end():]
+    
+    for part in text.replace(",", " ").split():
+        if "-" in part and not re.match(r'^\d{4}-\d{2}-\d{2}$', part):
+            start_str, _, end_str = part.partition("-")
+            start, end = parse_past_date(start_str), parse_past_date(end_str)
+            if not start or not end or end < start or (end - start).days >= MAX_BULK_DATES:
+                bad_parts.append(part)
+                continue
+            for i in range((end - start).days + 1):
+                dates.add(start + timedelta(days=i))
+            continue
+        
+        parsed = parse_past_date(part)
+        if parsed:
+            dates.add(parsed)
+        else:
+            bad_parts.append(part)
+    
+    return sorted(dates), hours, bad_parts
+
+def format_bulk_result(result: Dict[str, Any], day_type: str, hours: float) -> str:
+    """Один ответ по итогам пакетной записи"""
+    type_names = {
+        "work": "Рабочая смена",
+        "vacation": "Отпуск",
+        "sick": "Больничный",
+        "unpaid": "За свой счёт",
+        "reinforce": "Усиление"
+    }
+    
+    text = ""
+    if result['written']:
+        dates_str = ", ".join(
+            datetime.strptime(d, "%Y-%m-%d").strftime("%d.%m") for d in result['written']
+        )
+        text += f"✅ Отмечено: {len(result['written'])}\n"
+        text += f"📋 Тип: {type_names.get(day_type, day_type)}"
+        text += f" ({hours}ч)\n" if hours else "\n"
+        text += f"📅 {dates_str}\n"
+    
+    if result['conflicts']:
+        if text:
+            text += "\n"
+        text += f"⚠️ Уже есть записи ({len(result['conflicts'])}):\n"
+        for conflict in result['conflicts']:
+            date_str = datetime.strptime(conflict['date'], "%Y-%m-%d").strftime("%d.%m")
+            text += f"• {date_str} - {conflict['day_type']}\n"
+    
+    return text or "📭 Нечего записывать"
+
+def is_locked_date(d: date) -> bool:
+    """Месяц закрыт или год в архиве - записи не меняются"""
+    return db.is_month_closed(d) or db.is_archived(d)
+
+LOCKED_DATE_TEXT = "🔒 Месяц закрыт, изменения не принимаются"
+
+async def save_bulk_records(user_id: int, dates: List[date], day_type: str, hours: float,
+                            state: FSMContext) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Пакетная запись дат; конфликты можно перезаписать одной кнопкой"""
+    locked = [d for d in dates if is_locked_date(d)]
+    if locked:
+        await state.clear()
+        dates_str = ", ".join(d.strftime("%d.%m.%Y") for d in locked[:5])
+        return f"{LOCKED_DATE_TEXT}: {dates_str}", None
+    
+    result = db.add_records_bulk(user_id, dates, day_type, hours)
+    
+    if result is None:
+        await state.clear()
+        return "❌ Ошибка при сохранении записей", None
+    
+    await state.clear()
+    if not result['conflicts']:
+        return format_bulk_result(result, day_type, hours), None
+    
+    await state.update_data(
+        bulk_conflicts=[c['date'] for c in result['conflicts']],
+        bulk_day_type=day_type,
+        bulk_hours=hours
+    )
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="✏️ Перезаписать", callback_data="bulk_overwrite"),
+            InlineKeyboardButton(text="🚫 Оставить как есть", callback_data="bulk_keep")
+        ]
+    ])
+    return format_bulk_result(result, day_type, hours), keyboard
+
 def format_day_check_response(employee: Dict[str, Any], target_date: date, 
                              day_type: str, existing_record: Optional[Dict[str, Any]]) -> str:
     """
@@ -306,6 +461,7 @@ async def cmd_start(message: Message):
             f"Ваша смена: <b>{employee['shift_number']}</b>\n\n"
             f"<b>📋 Основные команды:</b>\n"
             f"/смена - отметить рабочую смену\n"
+            f"/заполнить - отметить месяц по графику\n"
             f"/усиление - отметить выход вне графика\n"
             f"/отпуск - один день отпуска\n"
             f"/больничный - один день больничного\n"
@@ -314,6 +470,8 @@ async def cmd_start(message: Message):
             f"/больничный_период - больничный на несколько дней\n\n"
             f"<b>🔍 Проверка графика:</b>\n"
             f"/статистика - статистика и расчёт\n"
+            f"/период [с] [по] - статистика за любой период\n"
+            f"/год [ГГГГ] - сводка за год\n"
             f"/график - мой график на месяц\n"
             f"/будет [дата] - проверить любой день\n\n"
             f"<b>⚙️ Управление:</b>\n"
@@ -349,10 +507,73 @@ async def cmd_shift(message: Message, state: FSMContext):
         await message.answer("❌ Вы не зарегистрированы в системе.")
         return
     
+    parts = message.text.split(maxsplit=1)
+    if len(parts) > 1:
+        # Пакетная отметка: /смена 1.10 2.10 5.10-7.10 8ч
+        dates, hours, bad_parts = parse_shift_dates(parts[1])
+        hours = SHIFT_HOURS if hours is None else hours
+        
+        if bad_parts or not dates:
+            await message.answer(
+                "❌ Не могу разобрать: " + (", ".join(bad_parts) or "нет дат") + "\n\n"
+                "Пример: <code>/смена 1.10 2.10 5.10-7.10 8ч</code>",
+                parse_mode="HTML"
+            )
+            return
+        if len(dates) > MAX_BULK_DATES or hours < 0.5 or hours > 12:
+            await message.answer(f"❌ Не больше {MAX_BULK_DATES} дат и от 0.5 до 12 часов")
+            return
+        
+        text, keyboard = await save_bulk_records(user_id, dates, 'work', hours, state)
+        await message.answer(text, reply_markup=keyboard)
+        return
+    
     await state.set_state(ShiftState.waiting_date)
     await message.answer(
-        "📅 За какую дату отмечаете смену?",
-        reply_markup=get_date_keyboard()
+        "📅 За какую дату отмечаете смену?\n\n"
+        "<i>Можно сразу несколько: /смена 1.10 2.10 5.10-7.10 8ч</i>",
+        reply_markup=get_date_keyboard(),
+        parse_mode="HTML"
+    )
+
+@dp.message(Command("заполнить"))
+async def cmd_fill_month(message: Message):
+    """Отметить все смены месяца по графику"""
+    user_id = message.from_user.id
+    employee = db.get_employee(user_id)
+    
+    if not employee:
+        await message.answer("❌ Вы не зарегистрированы в системе.")
+        return
+    
+    today = date.today()
+    year, month = today.year, today.month
+    
+    parts = message.text.split(maxsplit=1)
+    if len(parts) > 1:
+        match = re.match(r'^(\d{1,2})(?:[\./](\d{4}))?$', parts[1].strip())
+        if not match or not 1 <= int(match.group(1)) <= 12:
+            await message.answer(
+                "❌ Укажите месяц: <code>/заполнить 11</code> или <code>/заполнить 11.2026</code>",
+                parse_mode="HTML"
+            )
+            return
+        month = int(match.group(1))
+        year = int(match.group(2)) if match.group(2) else today.year
+    
+    if is_locked_date(date(year, month, 1)):
+        await message.answer(LOCKED_DATE_TEXT)
+        return
+    
+    plan = get_month_fill_plan(user_id, year, month)
+    
+    if plan is None:
+        await message.answer("❌ Не удалось рассчитать график.")
+        return
+    
+    await message.answer(
+        format_month_fill_plan(plan, year, month),
+        reply_markup=get_fill_month_keyboard(year, month) if plan['days'] else None
     )
 
 @dp.message(Command("отпуск"))
@@ -436,7 +657,7 @@ async def cmd_vacation_period(message: Message, state: FSMContext):
     await message.answer(
         "🏖 Отметить отпуск\n"
         "📅 С какой даты начинается отпуск?",
-        reply_markup=get_date_keyboard()
+        reply_markup=get_date_keyboard(allow_multi=False)
     )
 
 @dp.message(Command("больничный_период"))
@@ -456,7 +677,7 @@ async def cmd_sick_period(message: Message, state: FSMContext):
     await message.answer(
         "🤒 Отметить больничный\n"
         "📅 С какой даты начинается больничный?",
-        reply_markup=get_date_keyboard()
+        reply_markup=get_date_keyboard(allow_multi=False)
     )
 
 @dp.message(Command("статистика"))
@@ -478,6 +699,65 @@ async def cmd_stats(message: Message):
     else:
         await message.answer("❌ Не удалось получить статистику.")
 
+@dp.message(Command("год"))
+async def cmd_year_stats(message: Message):
+    """Сводка за год по месяцам"""
+    user_id = message.from_user.id
+    employee = db.get_employee(user_id)
+    
+    if not employee:
+        await message.answer("❌ Вы не зарегистрированы в системе.")
+        return
+    
+    parts = message.text.split()[1:]
+    year = datetime.now().year
+    if parts:
+        if not re.match(r'^\d{4}$', parts[0]):
+            await message.answer(
+                "📆 Укажите год: <code>/год 2025</code>",
+                parse_mode="HTML"
+            )
+            return
+        year = int(parts[0])
+    
+    stats = calculate_year_stats(user_id, year)
+    await message.answer(format_year_stats(stats))
+
+@dp.message(Command("период"))
+async def cmd_range_stats(message: Message):
+    """Статистика за произвольный период"""
+    user_id = message.from_user.id
+    employee = db.get_employee(user_id)
+    
+    if not employee:
+        await message.answer("❌ Вы не зарегистрированы в системе.")
+        return
+    
+    parts = message.text.split()[1:]
+    if len(parts) != 2:
+        await message.answer(
+            "📊 Укажите начало и конец периода:\n"
+            "<code>/период 16.09 15.10</code>\n"
+            "<code>/период 01.01.2026 31.12.2026</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    start, end = parse_past_date(parts[0]), parse_past_date(parts[1])
+    if start and end and end < start and end.year == start.year:
+        # "16.12 15.01" - период через Новый год
+        try:
+            end = date(end.year + 1, end.month, end.day)
+        except ValueError:
+            # 29.02, а следующий год не високосный
+            end = None
+    if not start or not end or end < start:
+        await message.answer("❌ Не могу понять даты периода.")
+        return
+    
+    stats = calculate_range_stats(user_id, start, end)
+    await message.answer(format_range_stats(stats))
+
 @dp.message(Command("график"))
 async def cmd_schedule(message: Message):
     """График на текущий месяц"""
@@ -601,7 +881,7 @@ async def process_check_date_input(message: Message, state: FSMContext):
 
 @dp.message(Command("исправить"))
 async def cmd_correct(message: Message):
-    """Удалить последнюю запись"""
+    """Удалить запись (история с листанием)"""
     user_id = message.from_user.id
     employee = db.get_employee(user_id)
     
@@ -609,15 +889,15 @@ async def cmd_correct(message: Message):
         await message.answer("❌ Вы не зарегистрированы в системе.")
         return
     
-    records = db.get_last_records(user_id, 5)
+    page = db.get_records_page(user_id, limit=HISTORY_PAGE_SIZE)
     
-    if not records:
+    if not page['records']:
         await message.answer("📭 У вас нет записей для удаления.")
         return
     
     await message.answer(
         "📝 Выберите запись для удаления:",
-        reply_markup=get_last_records_keyboard(records)
+        reply_markup=get_records_history_keyboard(page, is_locked_date)
     )
 
 @dp.message(Command("отпуски"))
@@ -726,6 +1006,28 @@ async def cmd_set_salary(message: Message, state: FSMContext):
         f"Введите новый оклад (в рублях):"
     )
 
+def build_employees_page(after_id: int = None, before_id: int = None):
+    """Текст и кнопки страницы списка сотрудников"""
+    page = db.get_employees_page(after_id=after_id, before_id=before_id, limit=EMPLOYEES_PAGE_SIZE)
+    
+    if not page['employees'] and (after_id is not None or before_id is not None):
+        # Сотрудник-якорь удалён - начинаем сначала
+        page = db.get_employees_page(limit=EMPLOYEES_PAGE_SIZE)
+    
+    if not page['employees']:
+        return None, None
+    
+    text = f"📋 Список сотрудников (всего {db.count_employees()}):\n\n"
+    for emp in page['employees']:
+        text += (
+            f"• <b>{emp['full_name']}</b>\n"
+            f"   ID: {emp['user_id']} | Смена: {emp['shift_number']}\n"
+            f"   Отпуск: {emp['vacation_rate']} ₽/день\n"
+            f"   Больничный: {emp['sick_rate']} ₽/день\n\n"
+        )
+    
+    return text, get_employees_page_keyboard(page)
+
 @dp.message(Command("список"))
 async def cmd_list_employees(message: Message):
     """Список всех сотрудников (админ)"""
@@ -734,23 +1036,360 @@ async def cmd_list_employees(message: Message):
         await message.answer("❌ Эта команда только для администраторов.")
         return
     
-    employees = db.get_all_employees()
+    text, keyboard = build_employees_page()
     
-    if not employees:
+    if not text:
         await message.answer("📭 В системе нет сотрудников.")
         return
     
-    text = "📋 Список сотрудников:\n\n"
-    for i, emp in enumerate(employees, 1):
-        text += (
-            f"{i}. <b>{emp['full_name']}</b>\n"
-            f"   ID: {emp['user_id']} | Смена: {emp['shift_number']}\n"
-            f"   Отпуск: {emp['vacation_rate']} ₽/день\n"
-            f"   Больничный: {emp['sick_rate']} ₽/день\n\n"
+    await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
+
+@dp.message(Command("найти"))
+async def cmd_find_employee(message: Message):
+    """Поиск сотрудника по ФИО (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    parts = message.text.split(maxsplit=1)
+    if len(parts) < 2:
+        await message.answer(
+            "🔍 Использование: <code>/найти фамилия</code>\n\n"
+            "Можно вводить начало слов: <code>/найти иван пет</code>",
+            parse_mode="HTML"
         )
+        return
+    
+    employees = db.search_employees(parts[1], limit=SEARCH_RESULTS_LIMIT)
+    
+    if not employees:
+        await message.answer("📭 Никого не нашлось.")
+        return
+    
+    text = "🔍 Найдено:\n\n"
+    for emp in employees:
+        text += f"• <b>{emp['full_name']}</b> | ID: {emp['user_id']} | Смена: {emp['shift_number']}\n"
+    
+    await message.answer(
+        text,
+        reply_markup=get_search_results_keyboard(employees),
+        parse_mode="HTML"
+    )
+
+@dp.message(Command("покрытие"))
+async def cmd_coverage(message: Message):
+    """Покрытие смен и нехватка людей (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    parts = message.text.split()[1:]
+    if len(parts) == 2:
+        start, end = parse_flexible_date(parts[0]), parse_flexible_date(parts[1])
+        if not start or not end or end < start or (end - start).days > 366:
+            await message.answer(
+                "❌ Укажите период до года: <code>/покрытие 01.10.2026 31.12.2026</code>",
+                parse_mode="HTML"
+            )
+            return
+    else:
+        # По умолчанию - текущий квартал
+        today = date.today()
+        quarter_month = (today.month - 1) // 3 * 3 + 1
+        start = date(today.year, quarter_month, 1)
+        if quarter_month == 10:
+            end = date(today.year, 12, 31)
+        else:
+            end = date(today.year, quarter_month + 3, 1) - timedelta(days=1)
+    
+    coverage = calculate_coverage(start, end)
+    await message.answer(format_coverage(coverage))
+
+@dp.message(Command("пересчитать"))
+async def cmd_rebuild_totals(message: Message):
+    """Пересчитать накопительные итоги из записей (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    if db.rebuild_record_totals():
+        await message.answer("✅ Итоги пересчитаны из записей")
+    else:
+        await message.answer("❌ Ошибка при пересчёте итогов")
+
+@dp.message(Command("архив"))
+async def cmd_archive(message: Message):
+    """Архивы закрытых лет и ручная архивация года (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    parts = message.text.split()[1:]
+    if parts:
+        if not re.match(r'^\d{4}$', parts[0]):
+            await message.answer("❌ Укажите год: <code>/архив 2024</code>", parse_mode="HTML")
+            return
+        year = int(parts[0])
+        if year >= date.today().year or year in db.archived_years:
+            await message.answer(f"❌ {year} год нельзя перенести в архив")
+            return
+        
+        await message.answer(f"⏳ Переношу {year} год в архив...")
+        result = await asyncio.get_running_loop().run_in_executor(None, db.archive_year, year)
+        if result:
+            await message.answer(
+                f"✅ {year} год в архиве\n"
+                f"• Записей: {result['records']}\n"
+                f"• Периодов: {result['periods']}"
+            )
+        else:
+            await message.answer(f"❌ Не удалось архивировать {year} год, подробности в логе")
+        return
     
+    archives = db.get_archives()
+    if not archives:
+        text = "🗄 Архивов пока нет\n\n"
+    else:
+        text = "🗄 Архивы закрытых лет:\n\n"
+        for archive in archives:
+            text += f"• {archive['year']}: записей {archive['records']}, периодов {archive['periods']}\n"
+        text += "\n"
+    text += "Перенести год вручную: <code>/архив 2024</code>"
     await message.answer(text, parse_mode="HTML")
 
+@dp.message(Command("закрыть_месяц"))
+async def cmd_close_month(message: Message):
+    """Закрыть выплаченный месяц и зафиксировать расчёт (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    parts = message.text.split()[1:]
+    if parts:
+        match = re.match(r'^(\d{1,2})\.(\d{4})$', parts[0])
+        if not match or not 1 <= int(match.group(1)) <= 12:
+            await message.answer("❌ Укажите месяц: <code>/закрыть_месяц 09.2026</code>", parse_mode="HTML")
+            return
+        year, month = int(match.group(2)), int(match.group(1))
+    else:
+        # По умолчанию - прошлый месяц
+        last_month = date.today().replace(day=1) - timedelta(days=1)
+        year, month = last_month.year, last_month.month
+    
+    closed = db.get_closed_months()
+    text = ""
+    if closed:
+        text += "🔒 Закрытые месяцы:\n"
+        for item in closed:
+            text += f"• {item['month']:02d}.{item['year']} - сотрудников: {item['employees']}\n"
+        text += "\n"
+    
+    if (year, month) in db.closed_months:
+        await message.answer(text + f"Месяц {month:02d}.{year} уже закрыт.")
+        return
+    
+    next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    if next_month > date.today():
+        await message.answer(text + f"❌ Месяц {month:02d}.{year} ещё не закончился.")
+        return
+    
+    text += (
+        f"Закрыть {month:02d}.{year}?\n\n"
+        f"Статистика всех сотрудников ({db.count_employees()}) будет зафиксирована, "
+        f"записи за месяц больше нельзя будет изменить."
+    )
+    await message.answer(text, reply_markup=get_close_month_keyboard(year, month))
+
+@dp.message(Command("бэкап"))
+async def cmd_backup(message: Message):
+    """Резервная копия базы прямо сейчас (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    await message.answer("⏳ Делаю резервную копию...")
+    result = await run_backup()
+    if not result:
+        await message.answer("❌ Не удалось сделать резервную копию, подробности в логе")
+        return
+    
+    await message.answer(
+        f"✅ Копия <code>{result['name']}</code>\n"
+        f"{result['size'] / 1024:.0f} КБ за {result['seconds']} с\n\n" + format_backups(list_backups()),
+        parse_mode="HTML"
+    )
+
+@dp.message(Command("восстановить"))
+async def cmd_restore(message: Message):
+    """Восстановить базу из резервной копии (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    parts = message.text.split()[1:]
+    backups = list_backups()
+    if not parts:
+        await message.answer(
+            format_backups(backups) + "\nВосстановить: <code>/восстановить имя_копии</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    name = parts[0]
+    if name not in {b['name'] for b in backups}:
+        await message.answer("❌ Такой копии нет")
+        return
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="♻️ Восстановить", callback_data=f"restore_ok_{backup_key(name)}"),
+            InlineKeyboardButton(text="❌ Отмена", callback_data="restore_cancel")
+        ]
+    ])
+    await message.answer(
+        f"⚠️ База будет заменена копией <code>{name}</code>.\n"
+        f"Текущее состояние сохранится отдельной копией.",
+        parse_mode="HTML",
+        reply_markup=keyboard
+    )
+
+@dp.message(Command("обслуживание"))
+async def cmd_maintenance(message: Message):
+    """Отчёт об обслуживании базы, "/обслуживание сейчас" - запустить (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    parts = message.text.split()[1:]
+    if parts and parts[0] == "сейчас":
+        await message.answer("⏳ Обслуживаю базу...")
+        await message.answer(format_maintenance(await run_maintenance(force=True)))
+        return
+    
+    await message.answer(format_maintenance(get_last_report()))
+
+@dp.message(Command("очередь"))
+async def cmd_send_queue(message: Message):
+    """Метрики очереди исходящих сообщений (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    await message.answer(format_send_stats(send_scheduler.get_stats()))
+    await message.answer(format_session_stats(bot.session.get_stats()))
+
+@dp.message(Command("профиль"))
+async def cmd_profile(message: Message):
+    """cProfile на N апдейтов или T секунд: "/профиль 200", "/профиль 60с", "/профиль стоп" (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    parts = message.text.split()[1:]
+    if parts and parts[0] == "стоп":
+        if not await stop_profiling():
+            await message.answer("❌ Профилирование не запущено.")
+        return
+    
+    updates, seconds = None, None
+    if parts:
+        arg = parts[0].lower()
+        try:
+            if arg.endswith(("с", "s")):
+                seconds = float(arg[:-1])
+            else:
+                updates = int(arg)
+        except ValueError:
+            await message.answer(
+                "❌ Формат: /профиль [N | Tс | стоп]\n"
+                "Например: /профиль 200 - следующие 200 апдейтов, /профиль 60с - минуту"
+            )
+            return
+    if not updates and not seconds:
+        updates = 100
+    
+    if not start_profiling(bot, dp, message.chat.id, updates=updates, seconds=seconds):
+        await message.answer("❌ Профилирование уже идёт. Остановить: /профиль стоп")
+        return
+    
+    scope = f"{updates} апдейтов" if updates else f"{seconds:g} с"
+    note = "\nВ режиме воркеров профилируется только процесс, обработавший команду." if WORKERS > 1 else ""
+    await message.answer(f"⏱ Профилирование запущено: {scope}. Отчёт придёт файлом.{note}")
+
+@dp.message(Command("память"))
+async def cmd_memory(message: Message):
+    """tracemalloc: "/память старт", "/память" - отчёт, "/память стоп" (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    parts = message.text.split()[1:]
+    if parts and parts[0] == "старт":
+        start_memory_tracing()
+        await message.answer("🧠 Отслеживание памяти включено. Отчёт с приростом: /память")
+        return
+    if parts and parts[0] == "стоп":
+        stop_memory_tracing()
+        await message.answer("🧠 Отслеживание памяти выключено.")
+        return
+    
+    report = memory_report()
+    if report is None:
+        await message.answer("❌ Отслеживание памяти не включено. Запустить: /память старт")
+        return
+    await message.answer_document(
+        types.BufferedInputFile(report.encode("utf-8"), filename=f"memory-{datetime.now():%Y%m%d-%H%M%S}.txt"),
+        caption="🧠 Места выделения памяти"
+    )
+
+@dp.message(Command("лаг"))
+async def cmd_loop_lag(message: Message):
+    """Задержка цикла событий: "/лаг", "/лаг стеки" - файл со стеками, "/лаг сброс" (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    parts = message.text.split()[1:]
+    if parts and parts[0] == "сброс":
+        loop_watchdog.reset()
+        await message.answer("✅ Статистика задержки сброшена.")
+        return
+    if parts and parts[0] == "стеки":
+        stacks = loop_watchdog.format_stacks()
+        if not stacks:
+            await message.answer("✅ Зависаний цикла событий не было.")
+            return
+        await message.answer_document(
+            types.BufferedInputFile(stacks.encode("utf-8"), filename=f"stalls-{datetime.now():%Y%m%d-%H%M%S}.txt"),
+            caption="🐢 Стеки зависаний цикла событий"
+        )
+        return
+    
+    await message.answer(format_lag(loop_watchdog.get_stats()))
+
+@dp.message(Command("рассылка"))
+async def cmd_broadcast(message: Message, state: FSMContext):
+    """Рассылка объявления всем сотрудникам (админ)"""
+    user_id = message.from_user.id
+    if not is_admin(user_id):
+        await message.answer("❌ Эта команда только для администраторов.")
+        return
+    
+    await state.set_state(BroadcastState.waiting_text)
+    await message.answer("📣 Отправьте текст объявления для всех сотрудников:")
+
 # ============================================
 # ОБРАБОТЧИКИ КНОПОК (CALLBACK)
 # ============================================
@@ -771,10 +1410,27 @@ async def handle_date_selection(callback: CallbackQuery, state: FSMContext):
             reply_markup=get_calendar_keyboard(today.year, today.month)
         )
         return
+    elif action == "date_multi":
+        # Периоды задаются началом и концом; кнопка могла остаться в старом сообщении
+        if await state.get_state() == PeriodState.waiting_start.state:
+            await callback.answer("Для периода выберите дату начала", show_alert=True)
+            return
+        today = datetime.now()
+        await state.update_data(multi_dates=[])
+        await callback.message.edit_text(
+            "🗓 Отметьте даты и нажмите «Готово»:",
+            reply_markup=get_multi_calendar_keyboard(today.year, today.month, [])
+        )
+        await callback.answer()
+        return
     else:
         await callback.answer("Неизвестное действие")
         return
     
+    if is_locked_date(selected_date):
+        await callback.answer(LOCKED_DATE_TEXT, show_alert=True)
+        return
+    
     current_state = await state.get_state()
     
     if current_state == ShiftState.waiting_date.state:
@@ -852,6 +1508,10 @@ async def handle_calendar_selection(callback: CallbackQuery, state: FSMContext):
     
     current_state = await state.get_state()
     
+    if current_state != CheckDayState.waiting_date.state and is_locked_date(selected_date):
+        await callback.answer(LOCKED_DATE_TEXT, show_alert=True)
+        return
+    
     if current_state == ShiftState.waiting_date.state:
         await state.update_data(selected_date=selected_date)
         await state.set_state(ShiftState.waiting_hours)
@@ -923,6 +1583,180 @@ async def handle_calendar_selection(callback: CallbackQuery, state: FSMContext):
     
     await callback.answer()
 
+@dp.callback_query(F.data.startswith("mcal_"))
+async def handle_multi_calendar(callback: CallbackQuery, state: FSMContext):
+    """Выбор нескольких дат в календаре"""
+    data = await state.get_data()
+    selected = data.get('multi_dates', [])
+    parts = callback.data.split("_")
+    
+    if parts[1] == "nav":
+        year, month = int(parts[2]), int(parts[3])
+        await callback.message.edit_reply_markup(
+            reply_markup=get_multi_calendar_keyboard(year, month, selected)
+        )
+    elif parts[1] == "t":
+        picked = date(int(parts[2]), int(parts[3]), int(parts[4]))
+        iso = picked.isoformat()
+        if iso in selected:
+            selected.remove(iso)
+        elif len(selected) >= MAX_BULK_DATES:
+            await callback.answer(f"Не больше {MAX_BULK_DATES} дат")
+            return
+        else:
+            selected.append(iso)
+        await state.update_data(multi_dates=selected)
+        await callback.message.edit_reply_markup(
+            reply_markup=get_multi_calendar_keyboard(picked.year, picked.month, selected)
+        )
+    elif parts[1] == "done":
+        if not selected:
+            await callback.answer("Выберите хотя бы одну дату")
+            return
+        
+        current_state = await state.get_state()
+        absence_type = data.get('absence_type')
+        
+        if current_state == ShiftState.waiting_date.state:
+            await state.update_data(selected_dates=sorted(selected))
+            await state.set_state(ShiftState.waiting_hours)
+            await callback.message.edit_text(
+                f"📅 Выбрано дат: {len(selected)}\n"
+                f"⏰ Отработали полные смены (12 часов)?",
+                reply_markup=get_hours_keyboard()
+            )
+        elif absence_type:
+            dates = [datetime.strptime(d, "%Y-%m-%d").date() for d in selected]
+            hours = 12 if absence_type == 'reinforce' else 0
+            text, keyboard = await save_bulk_records(callback.from_user.id, dates, absence_type, hours, state)
+            await callback.message.edit_text(text, reply_markup=keyboard)
+        else:
+            await callback.message.edit_text("❌ Ошибка: не понятно, что отмечать")
+            await state.clear()
+    
+    await callback.answer()
+
+@dp.callback_query(F.data.startswith("bulk_"))
+async def handle_bulk_conflicts(callback: CallbackQuery, state: FSMContext):
+    """Перезапись конфликтов пакетной отметки"""
+    data = await state.get_data()
+    conflicts = data.get('bulk_conflicts')
+    
+    if callback.data == "bulk_keep" or not conflicts:
+        await callback.message.edit_reply_markup(reply_markup=None)
+        await state.clear()
+        await callback.answer()
+        return
+    
+    day_type = data.get('bulk_day_type', 'work')
+    hours = data.get('bulk_hours', 0)
+    dates = [datetime.strptime(d, "%Y-%m-%d").date() for d in conflicts]
+    
+    # Месяц могли закрыть, пока кнопка висела
+    locked = [d for d in dates if is_locked_date(d)]
+    if locked:
+        await state.clear()
+        dates_str = ", ".join(d.strftime("%d.%m.%Y") for d in locked[:5])
+        await callback.message.edit_text(f"{LOCKED_DATE_TEXT}: {dates_str}")
+        await callback.answer()
+        return
+    
+    result = db.add_records_bulk(callback.from_user.id, dates, day_type, hours, overwrite=True)
+    await state.clear()
+    
+    if result is None:
+        await callback.message.edit_text("❌ Ошибка при перезаписи записей")
+    else:
+        await callback.message.edit_text("✏️ Перезаписано\n\n" + format_bulk_result(result, day_type, hours))
+    
+    await callback.answer()
+
+@dp.callback_query(F.data.startswith("fill_"))
+async def handle_fill_month(callback: CallbackQuery):
+    """Подтверждение заполнения месяца по графику"""
+    if callback.data == "fill_cancel":
+        await callback.message.edit_text("❌ Заполнение отменено")
+        await callback.answer()
+        return
+    
+    parts = callback.data.split("_")
+    year, month = int(parts[2]), int(parts[3])
+    user_id = callback.from_user.id
+    
+    if is_locked_date(date(year, month, 1)):
+        await callback.message.edit_text(LOCKED_DATE_TEXT)
+        await callback.answer()
+        return
+    
+    # План пересчитываем: с момента предпросмотра могли появиться записи
+    plan = get_month_fill_plan(user_id, year, month)
+    if plan is None:
+        await callback.message.edit_text("❌ Не удалось рассчитать график.")
+        await callback.answer()
+        return
+    
+    dates = [day['date'] for day in plan['days']]
+    result = db.add_records_bulk(user_id, dates, 'work', SHIFT_HOURS)
+    
+    if result is None:
+        await callback.message.edit_text("❌ Ошибка при сохранении записей")
+    else:
+        await callback.message.edit_text(format_bulk_result(result, 'work', SHIFT_HOURS))
+    
+    await callback.answer()
+
+@dp.callback_query(F.data.startswith("close_"))
+async def handle_close_month(callback: CallbackQuery):
+    """Подтверждение закрытия месяца"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Только для администраторов")
+        return
+    
+    if callback.data == "close_cancel":
+        await callback.message.edit_text("❌ Закрытие месяца отменено")
+        await callback.answer()
+        return
+    
+    parts = callback.data.split("_")
+    year, month = int(parts[2]), int(parts[3])
+    
+    count = await asyncio.get_running_loop().run_in_executor(
+        None, close_month_for_team, year, month, callback.from_user.id
+    )
+    if count is None:
+        await callback.message.edit_text(f"❌ Не удалось закрыть {month:02d}.{year}")
+    else:
+        await callback.message.edit_text(
+            f"🔒 Месяц {month:02d}.{year} закрыт\n"
+            f"Зафиксирована статистика сотрудников: {count}"
+        )
+    await callback.answer()
+
+@dp.callback_query(F.data.startswith("restore_"))
+async def handle_restore(callback: CallbackQuery):
+    """Подтверждение восстановления из копии"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Только для администраторов")
+        return
+    
+    if callback.data == "restore_cancel":
+        await callback.message.edit_text("❌ Восстановление отменено")
+        await callback.answer()
+        return
+    
+    name = find_backup(callback.data[len("restore_ok_"):])
+    if name is None:
+        await callback.message.edit_text("❌ Копия не найдена - возможно, уже удалена ротацией")
+        await callback.answer()
+        return
+    await callback.message.edit_text(f"⏳ Восстанавливаю из {name}...")
+    ok, details = await asyncio.get_running_loop().run_in_executor(None, restore_backup, name)
+    if ok:
+        await callback.message.edit_text(f"✅ База восстановлена из {name}")
+    else:
+        await callback.message.edit_text(f"❌ Восстановление не выполнено: {details}")
+    await callback.answer()
+
 @dp.callback_query(F.data.startswith("hours_"))
 async def handle_hours_selection(callback: CallbackQuery, state: FSMContext):
     """Обработка выбора часов"""
@@ -942,6 +1776,14 @@ async def handle_hours_selection(callback: CallbackQuery, state: FSMContext):
     
     data = await state.get_data()
     selected_date = data.get('selected_date')
+    selected_dates = data.get('selected_dates')
+    
+    if selected_dates:
+        dates = [datetime.strptime(d, "%Y-%m-%d").date() for d in selected_dates]
+        text, keyboard = await save_bulk_records(callback.from_user.id, dates, 'work', hours, state)
+        await callback.message.edit_text(text, reply_markup=keyboard)
+        await callback.answer()
+        return
     
     if not selected_date:
         await callback.message.edit_text("❌ Ошибка: дата не выбрана")
@@ -1003,6 +1845,12 @@ async def handle_overwrite(callback: CallbackQuery):
             selected_date = datetime.strptime(date_str, "%Y-%m-%d").date()
             user_id = callback.from_user.id
             
+            # Кнопка могла остаться с тех пор, как месяц был открыт
+            if is_locked_date(selected_date):
+                await callback.message.edit_text(LOCKED_DATE_TEXT)
+                await callback.answer()
+                return
+            
             success = db.add_record(
                 user_id=user_id,
                 date=selected_date,
@@ -1026,6 +1874,30 @@ async def handle_overwrite(callback: CallbackQuery):
     
     await callback.answer()
 
+@dp.callback_query(F.data.startswith("history_"))
+async def handle_history_page(callback: CallbackQuery):
+    """Листание истории записей в /исправить"""
+    _, direction, date_str, record_id = callback.data.split("_")
+    anchor = (date_str, int(record_id))
+    user_id = callback.from_user.id
+    
+    if direction == "older":
+        page = db.get_records_page(user_id, before=anchor, limit=HISTORY_PAGE_SIZE)
+    else:
+        page = db.get_records_page(user_id, after=anchor, limit=HISTORY_PAGE_SIZE)
+    
+    if not page['records']:
+        await callback.answer("Больше записей нет")
+        return
+    
+    await callback.message.edit_reply_markup(reply_markup=get_records_history_keyboard(page, is_locked_date))
+    await callback.answer()
+
+@dp.callback_query(F.data == "locked")
+async def handle_locked_record(callback: CallbackQuery):
+    """Запись закрытого месяца в /исправить"""
+    await callback.answer(LOCKED_DATE_TEXT, show_alert=True)
+
 @dp.callback_query(F.data.startswith("delete_"))
 async def handle_delete(callback: CallbackQuery):
     """Удаление записи"""
@@ -1044,6 +1916,12 @@ async def handle_delete(callback: CallbackQuery):
         return
     
     record_id = int(callback.data.split("_")[1])
+    record_date = db.get_record_date(record_id)
+    if record_date and is_locked_date(record_date):
+        await callback.message.edit_text(LOCKED_DATE_TEXT)
+        await callback.answer()
+        return
+    
     success = db.delete_record(record_id)
     
     if success:
@@ -1053,6 +1931,93 @@ async def handle_delete(callback: CallbackQuery):
     
     await callback.answer()
 
+@dp.callback_query(F.data.startswith("employees_"))
+async def handle_employees_page(callback: CallbackQuery):
+    """Листание списка сотрудников"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Только для администраторов")
+        return
+    
+    _, direction, anchor = callback.data.split("_")
+    if direction == "next":
+        text, keyboard = build_employees_page(after_id=int(anchor))
+    else:
+        text, keyboard = build_employees_page(before_id=int(anchor))
+    
+    if text:
+        await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    else:
+        await callback.message.edit_text("📭 В системе нет сотрудников.")
+    
+    await callback.answer()
+
+@dp.callback_query(F.data.startswith("find_stats_"))
+async def handle_find_stats(callback: CallbackQuery):
+    """Статистика найденного сотрудника за текущий месяц"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Только для администраторов")
+        return
+    
+    employee_id = int(callback.data.split("_")[2])
+    employee = db.get_employee(employee_id)
+    
+    if not employee:
+        await callback.answer("Сотрудник не найден")
+        return
+    
+    today = datetime.now()
+    stats = calculate_month_stats(employee_id, today.year, today.month)
+    
+    if stats:
+        await callback.message.answer(f"👤 {employee['full_name']}\n\n" + format_month_stats(stats))
+    else:
+        await callback.message.answer("❌ Не удалось получить статистику.")
+    
+    await callback.answer()
+
+@dp.callback_query(F.data.startswith("broadcast_"))
+async def handle_broadcast(callback: CallbackQuery, state: FSMContext):
+    """Подтверждение и остановка рассылки"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Только для администраторов")
+        return
+    
+    if callback.data == "broadcast_cancel":
+        await callback.message.edit_text("❌ Рассылка отменена")
+        await state.clear()
+    elif callback.data == "broadcast_send":
+        data = await state.get_data()
+        text = data.get('broadcast_text')
+        await state.clear()
+        
+        if not text:
+            await callback.message.edit_text("❌ Ошибка: текст рассылки не найден")
+            await callback.answer()
+            return
+        
+        broadcast_id = db.create_broadcast(text, callback.from_user.id)
+        if broadcast_id < 0:
+            await callback.message.edit_text("❌ Не удалось создать рассылку")
+            await callback.answer()
+            return
+        
+        progress = db.get_broadcast_progress(broadcast_id)
+        await callback.message.edit_text(
+            format_broadcast_progress(progress),
+            reply_markup=get_broadcast_keyboard(broadcast_id)
+        )
+        db.set_broadcast_status_message(broadcast_id, callback.message.chat.id, callback.message.message_id)
+        start_broadcast(bot, broadcast_id)
+    elif callback.data.startswith("broadcast_stop_"):
+        broadcast_id = int(callback.data.split("_")[2])
+        if cancel_broadcast(broadcast_id):
+            await callback.answer("Останавливаем рассылку...")
+            return
+        await callback.answer("Рассылка уже завершена")
+        return
+    
+    await callback.answer()
+
 # ============================================
 # ОБРАБОТЧИКИ ТЕКСТОВОГО ВВОДА (с правильным приоритетом)
 # ============================================
@@ -1138,6 +2103,23 @@ async def process_salary(message: Message, state: FSMContext):
     except ValueError:
         await message.answer("❌ Введите корректное число (только цифры)")
 
+@dp.message(BroadcastState.waiting_text)
+async def process_broadcast_text(message: Message, state: FSMContext):
+    """Обработка текста рассылки"""
+    if not message.text:
+        await message.answer("❌ Отправьте текстовое сообщение")
+        return
+    
+    await state.update_data(broadcast_text=message.html_text)
+    await state.set_state(BroadcastState.waiting_confirm)
+    
+    employees_count = db.count_employees()
+    await message.answer(
+        f"📣 Предпросмотр рассылки ({employees_count} получателей):\n\n{message.html_text}",
+        reply_markup=get_broadcast_confirm_keyboard(),
+        parse_mode="HTML"
+    )
+
 @dp.message(RatesState.waiting_vacation)
 async def process_vacation_rate(message: Message, state: FSMContext):
     """Обработка ввода стоимости отпуска"""
@@ -1210,6 +2192,13 @@ async def process_custom_hours(message: Message, state: FSMContext):
         
         data = await state.get_data()
         selected_date = data.get('selected_date')
+        selected_dates = data.get('selected_dates')
+        
+        if selected_dates:
+            dates = [datetime.strptime(d, "%Y-%m-%d").date() for d in selected_dates]
+            text, keyboard = await save_bulk_records(message.from_user.id, dates, 'work', hours, state)
+            await message.answer(text, reply_markup=keyboard)
+            return
         
         if not selected_date:
             await message.answer("❌ Ошибка: дата не выбрана")
@@ -1260,8 +2249,36 @@ async def main():
         logger.error("Не указан BOT_TOKEN в .env файле!")
         return
     
+    if TELEGRAM_API_URL:
+        logger.info(f"Bot API: {TELEGRAM_API_URL}")
+    
     await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    
+    # Старые годы уезжают в архив, основная база остаётся маленькой
+    archived = await asyncio.get_running_loop().run_in_executor(None, db.archive_closed_years)
+    for result in archived:
+        logger.info(f"Архивирован {result['year']} год: записей {result['records']}")
+    
+    await resume_broadcasts(bot)
+    
+    scheduler.add_job(run_backup, "interval", hours=BACKUP_INTERVAL_HOURS, id="backup")
+    scheduler.add_job(run_maintenance, "interval", minutes=MAINTENANCE_INTERVAL_MINUTES, id="maintenance")
+    scheduler.add_job(update_dedupe.flush, "interval", seconds=UPDATE_DEDUPE_FLUSH_INTERVAL, id="update_dedupe")
+    if WORKERS > 1:
+        # Рассылки, созданные и отменённые в воркерах, ведёт фронт
+        scheduler.add_job(sync_broadcasts, "interval", seconds=BROADCAST_SYNC_INTERVAL, args=[bot], id="broadcasts")
+    scheduler.start()
+    loop_watchdog.start()
+    
+    try:
+        if WORKERS > 1:
+            # Фоновые задачи остаются здесь, апдейты обрабатывают воркеры
+            await ShardedPolling(WORKERS).run(bot, dp)
+        else:
+            await dp.start_polling(bot, backoff_config=POLLING_BACKOFF)
+    finally:
+        loop_watchdog.stop()
+        update_dedupe.flush()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
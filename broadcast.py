@@ -0,0 +1,196 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from config import (
+    BROADCAST_CONCURRENCY, BROADCAST_FLUSH_INTERVAL, BROADCAST_PROGRESS_INTERVAL,
+    BROADCAST_MAX_ATTEMPTS, BROADCAST_RETRY_DELAY, BROADCAST_MAX_PASSES
+)
+from database import db
+from keyboards import get_broadcast_keyboard
+from send_queue import bulk_sending
+
+logger = logging.getLogger(__name__)
+
+# Активные рассылки и флаги остановки
+_running: Dict[int, asyncio.Task] = {}
+_cancelled: Set[int] = set()
+# Рассылки, ждущие повторного прохода после ошибок сети
+_delayed: Set[int] = set()
+
+# В режиме воркеров рассылки выполняет только фронт: у него своя доля лимита
+# отправки, и падение воркера их не прерывает. Воркеры создают и отменяют
+# рассылки в базе, фронт подхватывает изменения в sync_broadcasts()
+runs_here = True
+
+def format_broadcast_progress(progress: Dict[str, int], status: str = 'running') -> str:
+    """Текст статуса рассылки"""
+    total = sum(progress.values())
+    done = progress['sent'] + progress['failed']
+    percent = done * 100 // total if total else 100
+
+    title = {
+        'running': "📣 Рассылка идёт...",
+        'done': "✅ Рассылка завершена",
+        'cancelled': "⛔ Рассылка остановлена",
+    }.get(status, "📣 Рассылка")
+
+    return (
+        f"{title}\n\n"
+        f"• Доставлено: {progress['sent']}\n"
+        f"• Ошибки: {progress['failed']}\n"
+        f"• Осталось: {progress['pending']}\n"
+        f"• Прогресс: {done}/{total} ({percent}%)"
+    )
+
+async def _update_status(bot: Bot, broadcast: Dict, status: str = 'running'):
+    if not broadcast.get('status_chat_id'):
+        # Сообщение со статусом сохраняется после создания рассылки, фронт мог начать раньше
+        stored = db.get_broadcast(broadcast['id']) or {}
+        broadcast['status_chat_id'] = stored.get('status_chat_id')
+        broadcast['status_message_id'] = stored.get('status_message_id')
+        if not broadcast['status_chat_id']:
+            return
+
+    progress = db.get_broadcast_progress(broadcast['id'])
+    try:
+        await bot.edit_message_text(
+            format_broadcast_progress(progress, status),
+            chat_id=broadcast['status_chat_id'],
+            message_id=broadcast['status_message_id'],
+            reply_markup=get_broadcast_keyboard(broadcast['id']) if status == 'running' else None
+        )
+    except TelegramBadRequest:
+        # Текст не изменился или сообщение удалено - не критично
+        pass
+
+async def _send_worker(bot: Bot, broadcast: Dict, queue: asyncio.Queue,
+                       results: List[Tuple[int, str, Optional[str]]], attempts: Dict[int, int]):
+    with bulk_sending():
+        while True:
+            user_id = await queue.get()
+            try:
+                if broadcast['id'] in _cancelled:
+                    continue
+                await bot.send_message(user_id, broadcast['text'], parse_mode="HTML")
+                results.append((user_id, 'sent', None))
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Бот заблокирован или чат не найден - повторять бессмысленно
+                results.append((user_id, 'failed', str(e)[:200]))
+            except Exception as e:
+                # Сеть, таймаут, 5xx: получатель остаётся pending и получит сообщение позже
+                attempts[user_id] = attempts.get(user_id, 0) + 1
+                logger.warning(f"Рассылка #{broadcast['id']}, пользователь {user_id}, попытка {attempts[user_id]}: {e}")
+                if attempts[user_id] < BROADCAST_MAX_ATTEMPTS:
+                    await asyncio.sleep(min(30, 2 ** attempts[user_id]))
+                    queue.put_nowait(user_id)
+            finally:
+                queue.task_done()
+
+async def run_broadcast(bot: Bot, broadcast_id: int):
+    """
+    Доставка рассылки оставшимся получателям.
+    Результаты сохраняются пачками, поэтому после перезапуска
+    рассылка продолжается с места остановки
+    """
+    broadcast = db.get_broadcast(broadcast_id)
+    if not broadcast or broadcast['status'] != 'running':
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for user_id in db.get_pending_recipients(broadcast_id):
+        queue.put_nowait(user_id)
+
+    logger.info(f"Рассылка #{broadcast_id}: осталось {queue.qsize()} получателей")
+
+    results: List[Tuple[int, str, Optional[str]]] = []
+    attempts: Dict[int, int] = {}
+    workers = [
+        asyncio.create_task(_send_worker(bot, broadcast, queue, results, attempts))
+        for _ in range(BROADCAST_CONCURRENCY)
+    ]
+
+    def flush():
+        batch = results[:]
+        del results[:len(batch)]
+        db.mark_broadcast_recipients(broadcast_id, batch)
+
+    loop = asyncio.get_running_loop()
+    last_status = loop.time()
+    try:
+        finished = asyncio.create_task(queue.join())
+        while not finished.done():
+            await asyncio.wait([finished], timeout=BROADCAST_FLUSH_INTERVAL)
+            flush()
+            if broadcast_id in _cancelled:
+                finished.cancel()
+                break
+            if loop.time() - last_status >= BROADCAST_PROGRESS_INTERVAL:
+                last_status = loop.time()
+                await _update_status(bot, broadcast)
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        flush()
+
+    status = 'cancelled' if broadcast_id in _cancelled else 'done'
+    _cancelled.discard(broadcast_id)
+    # Проход засчитывается каждому, кто остался pending: после BROADCAST_MAX_PASSES он failed
+    remaining = db.end_broadcast_pass(broadcast_id, BROADCAST_MAX_PASSES) if status == 'done' else 0
+    if remaining != 0:
+        # Остались получатели с ошибками сети (или база недоступна): новый проход позже
+        logger.warning(f"Рассылка #{broadcast_id}: недоступно получателей {remaining}, повтор через {BROADCAST_RETRY_DELAY} с")
+        await _update_status(bot, broadcast)
+        _delayed.add(broadcast_id)
+        asyncio.get_running_loop().call_later(BROADCAST_RETRY_DELAY, _retry, bot, broadcast_id)
+        return
+    db.finish_broadcast(broadcast_id, status)
+    await _update_status(bot, broadcast, status)
+    logger.info(f"Рассылка #{broadcast_id} завершена: {status}")
+
+def _retry(bot: Bot, broadcast_id: int):
+    _delayed.discard(broadcast_id)
+    start_broadcast(bot, broadcast_id)
+
+def start_broadcast(bot: Bot, broadcast_id: int):
+    """Запуск рассылки в фоне (в воркере - её подхватит фронт)"""
+    if not runs_here:
+        return
+    if broadcast_id in _running and not _running[broadcast_id].done():
+        return
+    task = asyncio.create_task(run_broadcast(bot, broadcast_id))
+    _running[broadcast_id] = task
+
+    def forget(_: asyncio.Task):
+        _running.pop(broadcast_id, None)
+        _cancelled.discard(broadcast_id)
+    task.add_done_callback(forget)
+
+def cancel_broadcast(broadcast_id: int) -> bool:
+    if broadcast_id in _running:
+        _cancelled.add(broadcast_id)
+        return True
+    # Рассылка идёт в другом процессе: отметка в базе, фронт остановит её при синхронизации
+    broadcast = db.get_broadcast(broadcast_id)
+    if broadcast and broadcast['status'] == 'running':
+        return db.finish_broadcast(broadcast_id, 'cancelled')
+    return False
+
+async def resume_broadcasts(bot: Bot):
+    """Продолжить рассылки, прерванные перезапуском"""
+    for broadcast in db.get_running_broadcasts():
+        logger.info(f"Продолжаем рассылку #{broadcast['id']}")
+        start_broadcast(bot, broadcast['id'])
+
+async def sync_broadcasts(bot: Bot):
+    """Фронт в режиме воркеров: запустить новые рассылки и остановить отменённые в базе"""
+    running = {broadcast['id'] for broadcast in db.get_running_broadcasts()}
+    for broadcast_id in running - set(_running) - _delayed:
+        logger.info(f"Запускаем рассылку #{broadcast_id}")
+        start_broadcast(bot, broadcast_id)
+    for broadcast_id in set(_running) - running:
+        _cancelled.add(broadcast_id)
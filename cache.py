@@ -0,0 +1,131 @@
+import copy
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ключ "изменилось всё": первый опрос, восстановление из копии, ошибка чтения
+ALL = "*"
+
+class DataCache:
+    """
+    Кэш чтения, согласованный между процессами.
+    PRAGMA data_version на постоянном соединении дёшево показывает, был ли
+    коммит с другого соединения (в том числе из другого процесса).
+    Если был - из таблицы cache_changes читаются изменившиеся ключи
+    и сбрасываются только зависящие от них записи кэша
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 2000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._conn: sqlite3.Connection = None
+        self._data_version = None
+        self._seq = 0
+        self._entries: "OrderedDict[str, Tuple[Any, Tuple[str, ...]]]" = OrderedDict()
+        self._by_dep: Dict[str, Set[str]] = {}
+        self._listeners: List[Tuple[str, Callable[[], None]]] = []
+        self.stats = {'hits': 0, 'misses': 0, 'invalidated': 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._conn
+
+    def on_change(self, key: str, callback: Callable[[], None]):
+        """Вызов callback, когда в базе изменился ключ (например, список архивов)"""
+        self._listeners.append((key, callback))
+
+    def _changed_keys(self) -> Set[str]:
+        conn = self._connection()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return set()
+        first = self._data_version is None
+        self._data_version = version
+
+        max_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM cache_changes").fetchone()[0]
+        if first or max_seq < self._seq:
+            # Счётчик откатился назад - базу подменили целиком
+            self._seq = max_seq
+            return {ALL}
+
+        rows = conn.execute(
+            "SELECT key, seq FROM cache_changes WHERE seq > ?", (self._seq,)
+        ).fetchall()
+        self._seq = max_seq
+        return {key for key, _ in rows}
+
+    def sync(self) -> Set[str]:
+        """Сбросить записи, устаревшие из-за изменений в базе. Возвращает изменившиеся ключи"""
+        with self._lock:
+            try:
+                changed = self._changed_keys()
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка проверки изменений для кэша: {e}")
+                changed = {ALL}
+                self._data_version = None
+            if not changed:
+                return changed
+
+            if ALL in changed:
+                self.stats['invalidated'] += len(self._entries)
+                self._entries.clear()
+                self._by_dep.clear()
+            else:
+                for dep in changed:
+                    for key in self._by_dep.pop(dep, ()):
+                        if self._entries.pop(key, None) is not None:
+                            self.stats['invalidated'] += 1
+
+        for key, callback in self._listeners:
+            if ALL in changed or key in changed:
+                callback()
+        return changed
+
+    def get(self, key: str, deps: Iterable[str], loader: Callable[[], Any]) -> Any:
+        """
+        Значение из кэша или из loader. deps - ключи cache_changes,
+        при изменении которых значение устаревает. None не кэшируется:
+        так loader сообщает об ошибке
+        """
+        self.sync()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return copy.deepcopy(entry[0])
+            self.stats['misses'] += 1
+            version = self._seq
+
+        value = loader()
+        if value is None:
+            return None
+
+        with self._lock:
+            # Пока грузили, могли прийти изменения - такое значение не запоминаем
+            if version == self._seq:
+                deps = tuple(deps)
+                self._entries[key] = (copy.deepcopy(value), deps)
+                for dep in deps:
+                    self._by_dep.setdefault(dep, set()).add(key)
+                while len(self._entries) > self.max_entries:
+                    old_key, (_, old_deps) = self._entries.popitem(last=False)
+                    for dep in old_deps:
+                        self._by_dep.get(dep, set()).discard(old_key)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_dep.clear()
+            self._data_version = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'entries': len(self._entries), 'seq': self._seq}
@@ -40,86 +40,416 @@ def calculate_planned_days(shift_number: str, year: int, month: int) -> int:
     
     return work_days
 
+def get_month_fill_plan(user_id: int, year: int, month: int) -> Optional[Dict[str, Any]]:
+    """
+    Дни месяца по графику (день/ночь), на которые ещё нет записи
+    и которые не попадают в отпуск или больничный
+    """
+    try:
+        user = db.get_employee(user_id)
+        if not user:
+            return None
+        
+        current = date(year, month, 1)
+        if month == 12:
+            last_day = date(year + 1, 1, 1) - timedelta(days=1)
+        else:
+            last_day = date(year, month + 1, 1) - timedelta(days=1)
+        
+        recorded = {record['date'] for record in db.get_records_for_month(user_id, year, month)}
+        periods = [
+            (p['start_date'], p['end_date'])
+            for p in db.get_overlapping_periods(current, last_day, user_id=user_id)
+        ]
+        
+        plan = []
+        skipped_absence = 0
+        while current <= last_day:
+            day_type = get_day_type(user['shift_number'], current)
+            iso = current.isoformat()
+            if day_type in ['day', 'night'] and iso not in recorded:
+                if any(start <= iso <= end for start, end in periods):
+                    skipped_absence += 1
+                else:
+                    plan.append({'date': current, 'day_type': day_type})
+            current += timedelta(days=1)
+        
+        return {
+            'days': plan,
+            'already_recorded': len(recorded),
+            'skipped_absence': skipped_absence
+        }
+        
+    except Exception as e:
+        logger.error(f"Ошибка расчёта заполнения месяца: {e}")
+        return None
+
+def format_month_fill_plan(plan: Dict[str, Any], year: int, month: int) -> str:
+    """
+    Предпросмотр заполнения месяца
+    """
+    month_name = datetime(year, month, 1).strftime("%B %Y")
+    
+    text = f"🗓 Заполнение по графику: {month_name}\n"
+    text += "─" * 30 + "\n\n"
+    
+    if not plan['days']:
+        text += "✅ Все смены по графику уже отмечены.\n"
+    else:
+        text += f"Будет добавлено смен: {len(plan['days'])} × 12ч\n\n"
+        for day in plan['days']:
+            emoji = '🌞' if day['day_type'] == 'day' else '🌙'
+            text += f"{emoji} {day['date'].strftime('%d.%m')} {day['date'].strftime('%a')}\n"
+    
+    text += "\n"
+    if plan['already_recorded']:
+        text += f"📝 Уже есть записей: {plan['already_recorded']} (не изменятся)\n"
+    if plan['skipped_absence']:
+        text += f"🏖 Пропущено из-за отпуска/больничного: {plan['skipped_absence']}\n"
+    
+    return text
+
+def build_month_stats(user: Dict[str, Any], totals: Dict[str, float], year: int, month: int,
+                      salary: int) -> Dict[str, Any]:
+    """
+    Статистика месяца из готовых итогов: без обращений к базе,
+    чтобы закрытие месяца считало всю команду за один проход
+    """
+    # Считаем плановые дни по графику
+    planned_days = calculate_planned_days(user['shift_number'], year, month)
+    planned_hours = planned_days * 12
+    
+    # Фактические данные
+    work_hours = totals['work_hours']
+    work_days = totals['work_days']
+    reinforce_hours = totals['reinforce_hours']
+    reinforce_days = totals['reinforce_days']
+    vacation_days = totals['vacation_days']
+    sick_days = totals['sick_days']
+    unpaid_days = totals['unpaid_days']
+    
+    total_work_hours = work_hours + reinforce_hours
+    
+    hour_rate = salary / planned_hours if planned_hours > 0 else 0
+    
+    # Расчёт
+    hours_diff = total_work_hours - planned_hours
+    hours_adjustment = hours_diff * hour_rate
+    
+    vacation_pay = vacation_days * user['vacation_rate']
+    sick_pay = sick_days * user['sick_rate']
+    
+    total = salary + hours_adjustment + vacation_pay + sick_pay
+    
+    return {
+        'planned_days': planned_days,
+        'planned_hours': planned_hours,
+        'work_days': work_days,
+        'work_hours': work_hours,
+        'reinforce_days': reinforce_days,
+        'reinforce_hours': reinforce_hours,
+        'total_work_hours': total_work_hours,
+        'vacation_days': vacation_days,
+        'sick_days': sick_days,
+        'unpaid_days': unpaid_days,
+        'salary': salary,
+        'hour_rate': round(hour_rate, 2),
+        'hours_adjustment': round(hours_adjustment, 2),
+        'vacation_pay': vacation_pay,
+        'sick_pay': sick_pay,
+        'total': round(total, 2),
+        'vacation_rate': user['vacation_rate'],
+        'sick_rate': user['sick_rate']
+    }
+
+# От чего зависит статистика сотрудника: при изменении любого ключа кэш сбрасывается
+def _stats_deps(user_id: int) -> List[str]:
+    return [f"records:{user_id}", f"employee:{user_id}", f"snapshots:{user_id}", "settings", "closed_months"]
+
 def calculate_month_stats(user_id: int, year: int, month: int) -> Optional[Dict[str, Any]]:
     """
-    Основная функция расчёта статистики за месяц
+    Основная функция расчёта статистики за месяц.
+    Для закрытого месяца возвращается сохранённый при закрытии снимок
     """
+    return db.cache.get(
+        f"month_stats:{user_id}:{year}:{month}", _stats_deps(user_id),
+        lambda: _calculate_month_stats(user_id, year, month)
+    )
+
+def _calculate_month_stats(user_id: int, year: int, month: int) -> Optional[Dict[str, Any]]:
     try:
+        if db.is_month_closed(date(year, month, 1)):
+            snapshot = db.get_month_snapshot(user_id, year, month)
+            if snapshot:
+                return snapshot
+        
         # Получаем данные пользователя
         user = db.get_employee(user_id)
         if not user:
             return None
         
-        # Получаем все записи за месяц
-        records = db.get_records_for_month(user_id, year, month)
+        # Итоги за месяц - две выборки из накопительных итогов
+        first_day = date(year, month, 1)
+        if month == 12:
+            last_day = date(year + 1, 1, 1) - timedelta(days=1)
+        else:
+            last_day = date(year, month + 1, 1) - timedelta(days=1)
+        totals = db.get_range_totals(user_id, first_day, last_day)
+        if totals is None:
+            return None
+        
+        return build_month_stats(user, totals, year, month, db.get_monthly_salary())
         
-        # Считаем плановые дни по графику
-        planned_days = calculate_planned_days(user['shift_number'], year, month)
-        planned_hours = planned_days * 12
+    except Exception as e:
+        logger.error(f"Ошибка расчёта статистики: {e}")
+        return None
+
+def close_month_for_team(year: int, month: int, closed_by: int = None) -> Optional[int]:
+    """
+    Закрытие выплаченного месяца: статистика всех сотрудников считается
+    по одному сгруппированному запросу и сохраняется неизменяемыми снимками.
+    Возвращает число снимков или None
+    """
+    try:
+        next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        if next_month > date.today():
+            logger.warning(f"Месяц {month:02d}.{year} ещё не закончился")
+            return None
         
-        # Считаем фактические данные
-        work_hours = 0
-        work_days = 0
-        reinforce_hours = 0
-        reinforce_days = 0
-        vacation_days = 0
-        sick_days = 0
-        unpaid_days = 0
-        
-        for record in records:
-            if record['day_type'] == 'work':
-                work_hours += record['hours']
-                work_days += 1 if record['hours'] > 0 else 0
-            elif record['day_type'] == 'reinforce':
-                reinforce_hours += record['hours']
-                reinforce_days += 1 if record['hours'] > 0 else 0
-            elif record['day_type'] == 'vacation':
-                vacation_days += 1
-            elif record['day_type'] == 'sick':
-                sick_days += 1
-            elif record['day_type'] == 'unpaid':
-                unpaid_days += 1
-        
-        total_work_hours = work_hours + reinforce_hours
-        
-        # Получаем оклад
-        salary = db.get_monthly_salary()
-        hour_rate = salary / planned_hours if planned_hours > 0 else 0
+        empty = {name: 0 for name, _ in db.TOTALS_COLUMNS}
         
-        # Расчёт
-        hours_diff = total_work_hours - planned_hours
-        hours_adjustment = hours_diff * hour_rate
+        def build_snapshots(team_totals, employees, salary):
+            snapshots = {}
+            for user in employees:
+                stats = build_month_stats(user, team_totals.get(user['user_id'], empty), year, month, salary)
+                stats['closed'] = True
+                snapshots[user['user_id']] = stats
+            return snapshots
+        
+        # Итоги читаются и снимки сохраняются в одной транзакции
+        return db.close_month(year, month, build_snapshots, closed_by)
+        
+    except Exception as e:
+        logger.error(f"Ошибка закрытия месяца: {e}")
+        return None
+
+def count_planned_days(shift_number: str, start: date, end: date) -> int:
+    """
+    Сколько рабочих дней (день+ночь) в произвольном диапазоне дат
+    """
+    days = (end - start).days + 1
+    if days <= 0:
+        return 0
+    
+    # В каждом полном цикле из 4 дней - 2 рабочих
+    full_cycles, remainder = divmod(days, 4)
+    work_days = full_cycles * 2
+    for i in range(remainder):
+        if get_day_type(shift_number, start + timedelta(days=full_cycles * 4 + i)) in ['day', 'night']:
+            work_days += 1
+    
+    return work_days
+
+def calculate_range_stats(user_id: int, start: date, end: date) -> Optional[Dict[str, Any]]:
+    """
+    Статистика за произвольный период (расчётный период, квартал, год)
+    """
+    try:
+        user = db.get_employee(user_id)
+        if not user or end < start:
+            return None
         
-        vacation_pay = vacation_days * user['vacation_rate']
-        sick_pay = sick_days * user['sick_rate']
+        totals = db.get_range_totals(user_id, start, end)
+        if totals is None:
+            return None
         
-        total = salary + hours_adjustment + vacation_pay + sick_pay
+        planned_days = count_planned_days(user['shift_number'], start, end)
+        planned_hours = planned_days * 12
+        total_work_hours = totals['work_hours'] + totals['reinforce_hours']
         
         return {
+            'start': start,
+            'end': end,
             'planned_days': planned_days,
             'planned_hours': planned_hours,
-            'work_days': work_days,
-            'work_hours': work_hours,
-            'reinforce_days': reinforce_days,
-            'reinforce_hours': reinforce_hours,
+            'work_days': totals['work_days'],
+            'work_hours': totals['work_hours'],
+            'reinforce_days': totals['reinforce_days'],
+            'reinforce_hours': totals['reinforce_hours'],
             'total_work_hours': total_work_hours,
-            'vacation_days': vacation_days,
-            'sick_days': sick_days,
-            'unpaid_days': unpaid_days,
-            'salary': salary,
-            'hour_rate': round(hour_rate, 2),
-            'hours_adjustment': round(hours_adjustment, 2),
-            'vacation_pay': vacation_pay,
-            'sick_pay': sick_pay,
-            'total': round(total, 2),
-            'vacation_rate': user['vacation_rate'],
-            'sick_rate': user['sick_rate']
+            'hours_diff': total_work_hours - planned_hours,
+            'vacation_days': totals['vacation_days'],
+            'sick_days': totals['sick_days'],
+            'unpaid_days': totals['unpaid_days'],
+            'vacation_pay': totals['vacation_days'] * user['vacation_rate'],
+            'sick_pay': totals['sick_days'] * user['sick_rate'],
         }
         
     except Exception as e:
-        logger.error(f"Ошибка расчёта статистики: {e}")
+        logger.error(f"Ошибка расчёта статистики за период: {e}")
+        return None
+
+def format_range_stats(stats: Dict[str, Any]) -> str:
+    """
+    Форматирование статистики за период
+    """
+    if not stats:
+        return "❌ Не удалось рассчитать статистику"
+    
+    text = f"📊 {stats['start'].strftime('%d.%m.%Y')} - {stats['end'].strftime('%d.%m.%Y')}\n"
+    text += "─" * 30 + "\n\n"
+    
+    text += f"📅 По графику: {stats['planned_days']} рабочих дней ({stats['planned_hours']}ч)\n\n"
+    
+    text += "✅ Фактически отработано:\n"
+    text += f"• Смен по графику: {stats['work_days']} ({stats['work_hours']}ч)\n"
+    if stats['reinforce_days'] > 0:
+        text += f"• Усиления: {stats['reinforce_days']} ({stats['reinforce_hours']}ч)\n"
+    text += f"• Всего часов: {stats['total_work_hours']}ч\n"
+    
+    sign = "+" if stats['hours_diff'] > 0 else ""
+    text += f"• Разница с графиком: {sign}{stats['hours_diff']}ч\n\n"
+    
+    if stats['vacation_days'] or stats['sick_days'] or stats['unpaid_days']:
+        text += "📋 Отсутствия:\n"
+        if stats['vacation_days']:
+            text += f"• Отпуск: {stats['vacation_days']} дней ({stats['vacation_pay']:,.0f} ₽)\n".replace(',', ' ')
+        if stats['sick_days']:
+            text += f"• Больничный: {stats['sick_days']} дней ({stats['sick_pay']:,.0f} ₽)\n".replace(',', ' ')
+        if stats['unpaid_days']:
+            text += f"• За свой счёт: {stats['unpaid_days']} дней\n"
+    
+    return text
+
+def calculate_year_stats(user_id: int, year: int, compare: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Сводка за год по месяцам: один сгруппированный запрос к записям
+    и плановые дни по графику. При compare - то же за прошлый год
+    """
+    return db.cache.get(
+        f"year_stats:{user_id}:{year}:{int(compare)}", _stats_deps(user_id),
+        lambda: _calculate_year_stats(user_id, year, compare)
+    )
+
+def _calculate_year_stats(user_id: int, year: int, compare: bool) -> Optional[Dict[str, Any]]:
+    try:
+        user = db.get_employee(user_id)
+        if not user:
+            return None
+        
+        first_year = year - 1 if compare else year
+        monthly = db.get_monthly_totals(user_id, first_year, year)
+        if monthly is None:
+            return None
+        
+        salary = db.get_monthly_salary()
+        snapshots = db.get_month_snapshots(user_id, first_year, year)
+        empty = {name: 0 for name, _ in db.TOTALS_COLUMNS}
+        
+        def build_year(y: int) -> Dict[str, Any]:
+            months = []
+            for month in range(1, 13):
+                # Закрытый месяц - как при выплате, открытый - по той же формуле, что и /статистика
+                stats = snapshots.get((y, month))
+                has_records = stats is not None
+                if stats is None:
+                    totals = monthly.get((y, month))
+                    stats = build_month_stats(user, totals or empty, y, month, salary)
+                    has_records = bool(totals)
+                
+                months.append({
+                    'month': month,
+                    'has_records': has_records,
+                    'planned_hours': stats['planned_hours'],
+                    'total_work_hours': stats['total_work_hours'],
+                    'vacation_days': stats['vacation_days'],
+                    'sick_days': stats['sick_days'],
+                    'unpaid_days': stats['unpaid_days'],
+                    'total': stats['total'],
+                })
+            
+            # Итоги года считаем только по месяцам с записями
+            filled = [m for m in months if m['has_records']]
+            return {
+                'year': y,
+                'months': months,
+                'planned_hours': sum(m['planned_hours'] for m in filled),
+                'total_work_hours': sum(m['total_work_hours'] for m in filled),
+                'vacation_days': sum(m['vacation_days'] for m in filled),
+                'sick_days': sum(m['sick_days'] for m in filled),
+                'unpaid_days': sum(m['unpaid_days'] for m in filled),
+                'total': round(sum(m['total'] for m in filled), 2),
+                'filled_months': len(filled),
+            }
+        
+        result = build_year(year)
+        result['shift_number'] = user['shift_number']
+        if compare:
+            previous = build_year(year - 1)
+            result['previous'] = previous if previous['filled_months'] else None
+        return result
+        
+    except Exception as e:
+        logger.error(f"Ошибка расчёта годовой статистики: {e}")
         return None
 
+def format_year_stats(stats: Dict[str, Any]) -> str:
+    """
+    Форматирование годовой сводки
+    """
+    if not stats:
+        return "❌ Не удалось рассчитать статистику"
+    
+    month_names = ['Янв', 'Фев', 'Мар', 'Апр', 'Май', 'Июн',
+                   'Июл', 'Авг', 'Сен', 'Окт', 'Ноя', 'Дек']
+    
+    text = f"📆 {stats['year']} год | Смена #{stats['shift_number']}\n"
+    text += "─" * 30 + "\n"
+    text += "Месяц: факт/план ч | отсутствия | ~₽\n\n"
+    
+    for m in stats['months']:
+        if not m['has_records']:
+            continue
+        absences = []
+        if m['vacation_days']:
+            absences.append(f"🏖{m['vacation_days']}")
+        if m['sick_days']:
+            absences.append(f"🤒{m['sick_days']}")
+        if m['unpaid_days']:
+            absences.append(f"📝{m['unpaid_days']}")
+        text += (
+            f"{month_names[m['month'] - 1]}: {m['total_work_hours']:g}/{m['planned_hours']}ч"
+            f" | {' '.join(absences) or '—'} | {m['total']:,.0f}\n"
+        ).replace(',', ' ')
+    
+    if not stats['filled_months']:
+        text += "Записей за год нет\n"
+        return text
+    
+    diff = stats['total_work_hours'] - stats['planned_hours']
+    sign = "+" if diff > 0 else ""
+    text += "─" * 30 + "\n"
+    text += f"⏱ Часов: {stats['total_work_hours']:g} из {stats['planned_hours']} ({sign}{diff:g}ч)\n"
+    text += f"🏖 Отпуск: {stats['vacation_days']} | 🤒 Больничный: {stats['sick_days']} | 📝 За свой счёт: {stats['unpaid_days']}\n"
+    text += f"💵 Итого за {stats['filled_months']} мес.: ~{stats['total']:,.0f} ₽\n".replace(',', ' ')
+    
+    previous = stats.get('previous')
+    if previous:
+        text += f"\n📈 Сравнение с {previous['year']}:\n"
+        for key, title, unit in [
+            ('total_work_hours', 'Часы', 'ч'),
+            ('vacation_days', 'Отпуск', ' дн.'),
+            ('sick_days', 'Больничный', ' дн.'),
+            ('total', 'Начислено', ' ₽'),
+        ]:
+            delta = stats[key] - previous[key]
+            sign = "+" if delta > 0 else ""
+            text += f"• {title}: {previous[key]:,.0f} → {stats[key]:,.0f} ({sign}{delta:,.0f}{unit})\n".replace(',', ' ')
+        if previous['filled_months'] != stats['filled_months']:
+            text += f"⚠️ Месяцев с записями: {previous['filled_months']} против {stats['filled_months']}\n"
+    
+    return text
+
 def format_month_stats(stats: Dict[str, Any]) -> str:
     """
     Форматирование статистики в красивый текст
@@ -173,6 +503,9 @@ def format_month_stats(stats: Dict[str, Any]) -> str:
     text += "─" * 30 + "\n"
     text += f"💵 ИТОГО: ~{stats['total']:,.0f} ₽\n\n".replace(',', ' ')
     
+    if stats.get('closed'):
+        text += "🔒 Месяц закрыт, расчёт зафиксирован при выплате\n\n"
+    
     text += "⚠️ Внимание: Это примерный расчёт!\n"
     text += "Официальный расчёт делает бухгалтерия."
     
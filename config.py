@@ -15,8 +15,95 @@ SHIFT_CYCLE = ['day', 'night', 'rest', 'off']  # Цикл смен
 START_DATE = (2024, 10, 1)  # 1 октября 2024 - у смены 1 день
 
 # База данных
-DB_PATH = "database.db"
+# На облачных платформах укажите путь на постоянном диске: /tmp очищается при перезапуске
+DB_PATH = os.getenv("DB_PATH", "database.db")
 
 # Другое
 SHIFT_HOURS = 12  # Длительность смены
-DEFAULT_SALARY = 137500  # Оклад по умолчанию
\ No newline at end of file
+DEFAULT_SALARY = 137500  # Оклад по умолчанию
+
+# Соединение с Telegram Bot API
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")  # Пусто - api.telegram.org; иначе свой Bot API сервер
+SESSION_POOL_SIZE = 100  # Соединений в пуле
+SESSION_KEEPALIVE = 30  # Сколько держать простаивающее соединение, сек
+SESSION_CONNECT_TIMEOUT = 5  # Таймаут установки соединения, сек
+SESSION_READ_TIMEOUT = 20  # Таймаут запроса целиком, сек (long polling добавляет своё время)
+SESSION_RETRIES = 3  # Повторов при ошибке сети
+SESSION_BACKOFF_MIN = 0.2  # Первая задержка повтора, сек
+SESSION_BACKOFF_MAX = 5  # Максимальная задержка повтора, сек
+BREAKER_FAILURES = 5  # Ошибок сети подряд, после которых запросы временно не отправляются
+BREAKER_COOLDOWN = 10  # Пауза предохранителя, сек
+
+# Лимиты исходящих сообщений (ограничения Telegram Bot API)
+SEND_GLOBAL_RATE = 30  # Сообщений в секунду на всего бота
+SEND_CHAT_RATE = 1  # Сообщений в секунду в один личный чат
+SEND_CHAT_BURST = 3  # Короткий всплеск в один чат (ответ + редактирование)
+SEND_GROUP_RATE = 20 / 60  # Сообщений в секунду в одну группу
+SEND_MAX_RETRIES = 3  # Повторы после ответа 429 (retry_after)
+
+# Рассылки
+BROADCAST_CONCURRENCY = 30  # Одновременных отправок (темп всё равно держит очередь отправки)
+BROADCAST_FLUSH_INTERVAL = 1  # Как часто сохранять прогресс доставки, сек
+BROADCAST_PROGRESS_INTERVAL = 3  # Как часто обновлять статус у администратора, сек
+BROADCAST_SYNC_INTERVAL = 2  # Режим воркеров: как часто фронт подхватывает новые и отменённые рассылки, сек
+BROADCAST_MAX_ATTEMPTS = 3  # Попыток на получателя при ошибке сети за один проход рассылки
+BROADCAST_RETRY_DELAY = 60  # Через сколько повторить проход для оставшихся после ошибок сети, сек
+BROADCAST_MAX_PASSES = 5  # После стольких проходов с ошибками сети получатель считается недоступным
+
+# Списки
+EMPLOYEES_PAGE_SIZE = 10  # Сотрудников на одной странице /список
+FUZZY_SEARCH_THRESHOLD = 0.5  # Минимальная похожесть ФИО для нечёткого поиска /найти
+SEARCH_RESULTS_LIMIT = 10  # Результатов поиска /найти
+HISTORY_PAGE_SIZE = 8  # Записей на одной странице /исправить
+MAX_BULK_DATES = 62  # Максимум дат в одной пакетной отметке
+
+# Покрытие смен
+MIN_SHIFT_STAFF = 2  # Минимум человек на дневной и ночной смене
+
+# Архив закрытых лет
+ARCHIVE_DIR = "archive"  # Папка годовых архивов (относительный путь - рядом с базой)
+ARCHIVE_KEEP_YEARS = 1  # Сколько прошлых лет держать в основной базе
+
+# Резервные копии
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")  # Папка копий (относительный путь - рядом с базой)
+BACKUP_INTERVAL_HOURS = 6  # Как часто делать копию
+BACKUP_KEEP = 14  # Сколько последних копий хранить
+BACKUP_COMPRESS = True  # Сжимать копии gzip
+BACKUP_PAGES_PER_STEP = 128  # Страниц базы за один шаг копирования
+BACKUP_STEP_PAUSE = 0.01  # Пауза между шагами, сек - запись в базу не ждёт всю копию
+
+# Обслуживание базы (checkpoint WAL, ANALYZE, incremental_vacuum)
+MAINTENANCE_INTERVAL_MINUTES = 30  # Как часто проверять, можно ли обслужить базу
+MAINTENANCE_ACTIVITY_WINDOW = 300  # Окно подсчёта активности, сек
+MAINTENANCE_QUIET_RATE = 5  # Тихий период: не больше стольких обновлений в минуту
+MAINTENANCE_VACUUM_PAGES = 256  # Страниц за один шаг incremental_vacuum
+MAINTENANCE_MAX_SLICES = 20  # Шагов incremental_vacuum за один запуск
+
+# Кэш чтения (сотрудники, оклад, статистика), согласованный между процессами
+CACHE_MAX_ENTRIES = 2000  # Сколько значений держать в памяти
+
+# Несколько процессов: фронт получает апдейты и раздаёт их воркерам по id пользователя
+WORKERS = int(os.getenv("WORKERS", "1"))  # 1 - всё в одном процессе
+SHARD_VIRTUAL_NODES = 64  # Точек на кольце хешей на одного воркера
+SHARD_QUEUE_SIZE = 1000  # Апдейтов в очереди одного воркера
+
+# Порядок обработки апдейтов
+USER_QUEUE_LIMIT = 5  # Апдейтов одного пользователя в очереди, лишние отбрасываются
+CALLBACK_DUPLICATE_WINDOW = 1.0  # Повтор той же кнопки в течение стольких секунд после обработки - дубль
+UPDATE_DEDUPE_SIZE = 10000  # Сколько последних update_id помнить для отсева повторной доставки
+UPDATE_DEDUPE_FLUSH_INTERVAL = 1.0  # Как часто сохранять новые update_id в базу, сек
+
+# Запись входящих апдейтов для воспроизведения нагрузки (replay.py)
+RECORD_UPDATES = os.getenv("RECORD_UPDATES", "") == "1"  # Включить запись
+RECORD_DIR = os.getenv("RECORD_DIR", "captures")  # Папка файлов записи
+RECORD_SALT = os.getenv("RECORD_SALT", "")  # Ключ обезличивания id, нужен и для replay.py
+
+# Профилирование по команде админа (/профиль, /память)
+PROFILE_MAX_SECONDS = 300  # Профиль снимается не дольше, сек
+PROFILE_TOP = 40  # Строк в отчёте
+TRACEMALLOC_FRAMES = 25  # Глубина стека для мест выделения памяти
+
+# Сторож цикла событий (/лаг)
+LAG_CHECK_INTERVAL = 0.1  # Как часто замерять задержку цикла, сек
+LAG_THRESHOLD = 0.2  # Задержка дольше этой - зависание, снимается стек, сек
+LAG_STALLS_KEEP = 50  # Сколько последних зависаний хранить со стеками
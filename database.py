@@ -0,0 +1 @@
+from database_sqlite import Database, db
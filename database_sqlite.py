@@ -1,33 +1,55 @@
+import os
+import re
+import json
 import sqlite3
 import logging
 from datetime import datetime, date
-from typing import Optional, List, Dict, Any
-from config import DB_PATH
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple, Callable
+from config import DB_PATH, FUZZY_SEARCH_THRESHOLD, ARCHIVE_DIR, ARCHIVE_KEEP_YEARS, CACHE_MAX_ENTRIES
+from cache import DataCache
 
 logger = logging.getLogger(__name__)
 
+# Юлианский день полуночи 1 января 1 года минус его порядковый номер
+JULIAN_DAY_OFFSET = 1721424
+
+def day_number(d: date) -> int:
+    """Целый юлианский день даты, как CAST(julianday(d) AS INTEGER) в SQLite"""
+    return d.toordinal() + JULIAN_DAY_OFFSET
+
+def from_day_number(n: int) -> date:
+    return date.fromordinal(n - JULIAN_DAY_OFFSET)
+
+# Коды типов дня в records.type_code
+DAY_TYPE_CODES = {'work': 1, 'reinforce': 2, 'vacation': 3, 'sick': 4, 'unpaid': 5}
+DAY_TYPE_NAMES = {code: name for name, code in DAY_TYPE_CODES.items()}
+
+def record_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+    """Строка records в привычный вид: дата ISO-строкой и тип дня названием"""
+    record = dict(row)
+    if 'day' in record:
+        record['date'] = from_day_number(record.pop('day')).isoformat()
+    if 'type_code' in record:
+        record['day_type'] = DAY_TYPE_NAMES[record.pop('type_code')]
+    return record
+
 class Database:
-    def __init__(self, db_path: str = None):
-        # Автоматическое определение пути для облака
-        if db_path is None:
-            if 'RENDER' in os.environ or 'RAILWAY' in os.environ:
-                # Для облачных платформ используем /tmp/
-                self.db_path = "/tmp/database.db"
-                logger.info(f"Используем базу данных в /tmp/database.db")
-            else:
-                self.db_path = "database.db"
-        else:
-            self.db_path = db_path
-        
-        logger.info(f"База данных: {self.db_path}")
-        self.init_database()
-        
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
+        if os.path.abspath(db_path).startswith("/tmp/"):
+            logger.warning(f"База данных во временной папке {db_path} - она пропадёт при перезапуске")
         self.init_database()
+        
+        # Кэш чтения общий для всех процессов с этой базой: изменения видны через cache_changes
+        self.cache = DataCache(db_path, CACHE_MAX_ENTRIES)
+        self.cache.on_change('archives', self._reload_archived_years)
+        self.cache.on_change('closed_months', self._reload_closed_months)
     
     def get_connection(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+        # uri=True нужен, чтобы подключать архивы только для чтения
+        conn = sqlite3.connect(self.db_path, uri=True)
         conn.row_factory = sqlite3.Row
         return conn
     
@@ -36,6 +58,14 @@ class Database:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 
+                # Новая база сразу с инкрементальным auto_vacuum, старой нужен один VACUUM
+                cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                cursor.execute("PRAGMA auto_vacuum")
+                needs_vacuum = cursor.fetchone()[0] != 2
+                
+                # WAL: чтение и онлайн-копия не блокируют запись
+                cursor.execute("PRAGMA journal_mode=WAL")
+                
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS employees (
                         user_id INTEGER PRIMARY KEY,
@@ -47,18 +77,31 @@ class Database:
                     )
                 """)
                 
+                migrated = self._migrate_records_to_day_numbers(cursor)
+                
+                # day - целый юлианский день, type_code - код из DAY_TYPE_CODES
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS records (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         user_id INTEGER NOT NULL,
-                        date DATE NOT NULL,
-                        day_type TEXT NOT NULL CHECK(day_type IN ('work', 'reinforce', 'vacation', 'sick', 'unpaid')),
+                        day INTEGER NOT NULL,
+                        type_code INTEGER NOT NULL CHECK(type_code BETWEEN 1 AND 5),
                         hours REAL DEFAULT 0,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(user_id, date),
+                        UNIQUE(user_id, day),
                         FOREIGN KEY (user_id) REFERENCES employees (user_id) ON DELETE CASCADE
                     )
                 """)
+                if migrated:
+                    cursor.execute(f"""
+                        INSERT INTO records (id, user_id, day, type_code, hours, created_at)
+                        SELECT id, user_id, CAST(julianday(date) AS INTEGER),
+                               CASE day_type {" ".join(f"WHEN '{name}' THEN {code}" for name, code in DAY_TYPE_CODES.items())} END,
+                               hours, created_at
+                        FROM records_old
+                    """)
+                    logger.info(f"Перенесено записей: {cursor.rowcount}")
+                    cursor.execute("DROP TABLE records_old")
                 
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS absence_periods (
@@ -81,20 +124,562 @@ class Database:
                     )
                 """)
                 
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_user_date ON records(user_id, date)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_date ON records(date)")
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS broadcasts (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        text TEXT NOT NULL,
+                        created_by INTEGER NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'running' CHECK(status IN ('running', 'done', 'cancelled')),
+                        status_chat_id INTEGER,
+                        status_message_id INTEGER,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        finished_at TIMESTAMP
+                    )
+                """)
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                        broadcast_id INTEGER NOT NULL,
+                        user_id INTEGER NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'sent', 'failed')),
+                        error TEXT,
+                        sent_at TIMESTAMP,
+                        passes INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (broadcast_id, user_id),
+                        FOREIGN KEY (broadcast_id) REFERENCES broadcasts (id) ON DELETE CASCADE
+                    ) WITHOUT ROWID
+                """)
+                # Число проходов рассылки, после которых получатель остался pending
+                cursor.execute("SELECT name FROM pragma_table_info('broadcast_recipients')")
+                if 'passes' not in {row[0] for row in cursor.fetchall()}:
+                    cursor.execute("ALTER TABLE broadcast_recipients ADD COLUMN passes INTEGER NOT NULL DEFAULT 0")
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS archives (
+                        year INTEGER PRIMARY KEY,
+                        records INTEGER NOT NULL DEFAULT 0,
+                        periods INTEGER NOT NULL DEFAULT 0,
+                        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                # Закрытые (выплаченные) месяцы и замороженная статистика по ним
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS closed_months (
+                        year INTEGER NOT NULL,
+                        month INTEGER NOT NULL,
+                        first_day INTEGER NOT NULL,
+                        last_day INTEGER NOT NULL,
+                        closed_by INTEGER,
+                        closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (year, month)
+                    )
+                """)
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS payroll_snapshots (
+                        year INTEGER NOT NULL,
+                        month INTEGER NOT NULL,
+                        user_id INTEGER NOT NULL,
+                        stats TEXT NOT NULL,
+                        PRIMARY KEY (year, month, user_id)
+                    ) WITHOUT ROWID
+                """)
+                
+                # Последние обработанные update_id - защита от повторной доставки после перезапуска
+                # seq - порядок сохранения: update_id после сброса бота могут начаться заново
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS processed_updates (
+                        update_id INTEGER PRIMARY KEY,
+                        seq INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                cursor.execute("SELECT name FROM pragma_table_info('processed_updates')")
+                if 'seq' not in {row[0] for row in cursor.fetchall()}:
+                    cursor.execute("ALTER TABLE processed_updates ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+                    cursor.execute("UPDATE processed_updates SET seq = update_id")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_processed_updates_seq ON processed_updates(seq)")
+                
+                # Покрывающие индексы: статистика и история читаются без обращения к таблице.
+                # Уникальный (user_id, day) из UNIQUE не содержит type_code и hours
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_user_day ON records(user_id, day, type_code, hours)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_records_day ON records(day, type_code, user_id)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_periods_user ON absence_periods(user_id)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_periods_dates ON absence_periods(start_date, end_date)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_employees_name ON employees(full_name, user_id)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_broadcasts_status ON broadcasts(status)")
                 
                 cursor.execute("INSERT OR IGNORE INTO system_settings (id, monthly_salary) VALUES (1, 137500)")
                 
+                self.fts_enabled = self._init_search_index(cursor)
+                self.rtree_enabled = self._init_period_index(cursor)
+                self._init_record_totals(cursor)
+                self._create_closed_month_guard(cursor)
+                self._init_change_log(cursor)
+                
+                cursor.execute("SELECT year FROM archives")
+                self.archived_years = {row['year'] for row in cursor.fetchall()}
+                cursor.execute("SELECT year, month FROM closed_months")
+                self.closed_months = {(row['year'], row['month']) for row in cursor.fetchall()}
+                
                 conn.commit()
                 logger.info("База данных инициализирована")
+            
+            if migrated or needs_vacuum:
+                self.vacuum()
                 
         except Exception as e:
             logger.error(f"Ошибка инициализации БД: {e}")
             raise
     
+    def _migrate_records_to_day_numbers(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Старая схема хранила дату текстом и тип дня строкой.
+        Переименовываем таблицу, данные переносятся после создания новой
+        """
+        cursor.execute("SELECT name FROM pragma_table_info('records')")
+        columns = {row[0] for row in cursor.fetchall()}
+        if 'date' not in columns:
+            return False
+        
+        logger.info("Миграция records: дата и тип дня в целые числа")
+        # Вся миграция - одна транзакция вместе с созданием новой таблицы
+        if not cursor.connection.in_transaction:
+            cursor.execute("BEGIN")
+        self._drop_record_triggers(cursor)
+        # Итоги построятся заново по новой таблице
+        cursor.execute("DROP TABLE IF EXISTS record_totals")
+        cursor.execute("DROP INDEX IF EXISTS idx_records_user_date")
+        cursor.execute("DROP INDEX IF EXISTS idx_records_date")
+        cursor.execute("ALTER TABLE records RENAME TO records_old")
+        return True
+    
+    def vacuum(self) -> bool:
+        """Пересобрать файл базы, чтобы вернуть место после миграций и удалений"""
+        try:
+            conn = self.get_connection()
+            try:
+                # Переводит старую базу в режим auto_vacuum=INCREMENTAL
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+            logger.info("VACUUM выполнен")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка VACUUM: {e}")
+            return False
+    
+    # ============================================
+    # ОБСЛУЖИВАНИЕ
+    # ============================================
+    
+    def checkpoint(self) -> Optional[Dict[str, int]]:
+        """Пассивный checkpoint WAL: переносит в базу то, что не мешает читателям и писателям"""
+        try:
+            conn = self.get_connection()
+            try:
+                busy, wal_pages, moved = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            finally:
+                conn.close()
+            return {'busy': busy, 'wal_pages': wal_pages, 'moved': moved}
+        except Exception as e:
+            logger.error(f"Ошибка checkpoint: {e}")
+            return None
+    
+    def optimize(self) -> Optional[Dict[str, Any]]:
+        """
+        Обновление статистики планировщика запросов.
+        Первый раз - полный ANALYZE, дальше PRAGMA optimize с ограничением выборки
+        """
+        try:
+            conn = self.get_connection()
+            try:
+                analyzed = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+                ).fetchone() is not None
+                if analyzed:
+                    conn.execute("PRAGMA analysis_limit=400")
+                    conn.execute("PRAGMA optimize")
+                else:
+                    conn.execute("ANALYZE")
+                conn.commit()
+            finally:
+                conn.close()
+            return {'mode': 'optimize' if analyzed else 'analyze'}
+        except Exception as e:
+            logger.error(f"Ошибка ANALYZE: {e}")
+            return None
+    
+    def get_freelist_count(self) -> int:
+        try:
+            with self.get_connection() as conn:
+                return conn.execute("PRAGMA freelist_count").fetchone()[0]
+        except Exception as e:
+            logger.error(f"Ошибка чтения freelist_count: {e}")
+            return 0
+    
+    def incremental_vacuum(self, pages: int) -> Optional[int]:
+        """Вернуть системе до pages свободных страниц. Возвращает число освобождённых"""
+        try:
+            conn = self.get_connection()
+            try:
+                before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                # execute() делает один шаг прагмы (одну страницу), executescript - до конца
+                conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+                after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            finally:
+                conn.close()
+            return before - after
+        except Exception as e:
+            logger.error(f"Ошибка incremental_vacuum: {e}")
+            return None
+    
+    # Какие ключи кэша меняет строка таблицы ({r} - NEW или OLD)
+    CHANGE_KEYS = {
+        'employees': ["'employee:' || {r}.user_id", "'employees'"],
+        'records': ["'records:' || {r}.user_id"],
+        'absence_periods': ["'periods:' || {r}.user_id"],
+        'payroll_snapshots': ["'snapshots:' || {r}.user_id"],
+        'system_settings': ["'settings'"],
+        'closed_months': ["'closed_months'"],
+        'archives': ["'archives'"],
+    }
+    
+    def _init_change_log(self, cursor: sqlite3.Cursor):
+        """
+        Журнал изменений для кэша: ключ и номер последнего изменения.
+        Ведётся триггерами, поэтому учитывает записи любого процесса и скрипта
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cache_changes (
+                key TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_cache_changes_seq ON cache_changes(seq)")
+        
+        def touch(keys: List[str], r: str) -> str:
+            return "".join(f"""
+                INSERT INTO cache_changes (key, seq)
+                VALUES ({key.format(r=r)}, (SELECT COALESCE(MAX(seq), 0) + 1 FROM cache_changes))
+                ON CONFLICT(key) DO UPDATE SET seq = excluded.seq;
+            """ for key in keys)
+        
+        for table, keys in self.CHANGE_KEYS.items():
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_insert AFTER INSERT ON {table} BEGIN
+                    {touch(keys, 'NEW')}
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_delete AFTER DELETE ON {table} BEGIN
+                    {touch(keys, 'OLD')}
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_update AFTER UPDATE ON {table} BEGIN
+                    {touch(keys, 'OLD')}
+                    {touch(keys, 'NEW')}
+                END
+            """)
+    
+    def _reload_archived_years(self):
+        try:
+            with self.get_connection() as conn:
+                self.archived_years = {row['year'] for row in conn.execute("SELECT year FROM archives")}
+        except Exception as e:
+            logger.error(f"Ошибка чтения списка архивов: {e}")
+    
+    def _reload_closed_months(self):
+        try:
+            with self.get_connection() as conn:
+                self.closed_months = {
+                    (row['year'], row['month']) for row in conn.execute("SELECT year, month FROM closed_months")
+                }
+        except Exception as e:
+            logger.error(f"Ошибка чтения закрытых месяцев: {e}")
+    
+    def _init_search_index(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Полнотекстовый индекс FTS5 по ФИО, синхронизируется триггерами.
+        В индекс пишется ФИО с заменой ё на е, чтобы «Федоров» находил «Фёдоров»
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'employees_fts'")
+        exists = cursor.fetchone() is not None
+        
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS employees_fts USING fts5(
+                    full_name,
+                    content='',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='1 2 3'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 недоступен, поиск будет через LIKE: {e}")
+            return False
+        
+        normalized_new = "replace(replace(NEW.full_name, 'ё', 'е'), 'Ё', 'Е')"
+        normalized_old = "replace(replace(OLD.full_name, 'ё', 'е'), 'Ё', 'Е')"
+        
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_employees_fts_insert AFTER INSERT ON employees BEGIN
+                INSERT INTO employees_fts (rowid, full_name) VALUES (NEW.user_id, {normalized_new});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_employees_fts_delete AFTER DELETE ON employees BEGIN
+                INSERT INTO employees_fts (employees_fts, rowid, full_name) VALUES ('delete', OLD.user_id, {normalized_old});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_employees_fts_update AFTER UPDATE OF user_id, full_name ON employees BEGIN
+                INSERT INTO employees_fts (employees_fts, rowid, full_name) VALUES ('delete', OLD.user_id, {normalized_old});
+                INSERT INTO employees_fts (rowid, full_name) VALUES (NEW.user_id, {normalized_new});
+            END
+        """)
+        
+        if not exists:
+            # Индекс создан впервые - заполняем из существующих сотрудников
+            cursor.execute("""
+                INSERT INTO employees_fts (rowid, full_name)
+                SELECT user_id, replace(replace(full_name, 'ё', 'е'), 'Ё', 'Е') FROM employees
+            """)
+            logger.info("Построен поисковый индекс сотрудников")
+        
+        return True
+    
+    def _init_period_index(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Интервальный индекс R*Tree по периодам отсутствия (юлианские дни).
+        Отвечает на «кто отсутствует в день X» и «что пересекает диапазон»
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'absence_periods_rtree'")
+        exists = cursor.fetchone() is not None
+        
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS absence_periods_rtree USING rtree_i32(
+                    id, start_day, end_day, +user_id
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"R*Tree недоступен, периоды ищутся по B-tree индексу: {e}")
+            return False
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_periods_rtree_insert AFTER INSERT ON absence_periods BEGIN
+                INSERT INTO absence_periods_rtree (id, start_day, end_day, user_id)
+                VALUES (NEW.id, CAST(julianday(NEW.start_date) AS INTEGER),
+                        CAST(julianday(NEW.end_date) AS INTEGER), NEW.user_id);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_periods_rtree_delete AFTER DELETE ON absence_periods BEGIN
+                DELETE FROM absence_periods_rtree WHERE id = OLD.id;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_periods_rtree_update AFTER UPDATE ON absence_periods BEGIN
+                DELETE FROM absence_periods_rtree WHERE id = OLD.id;
+                INSERT INTO absence_periods_rtree (id, start_day, end_day, user_id)
+                VALUES (NEW.id, CAST(julianday(NEW.start_date) AS INTEGER),
+                        CAST(julianday(NEW.end_date) AS INTEGER), NEW.user_id);
+            END
+        """)
+        
+        if not exists:
+            cursor.execute("""
+                INSERT INTO absence_periods_rtree (id, start_day, end_day, user_id)
+                SELECT id, CAST(julianday(start_date) AS INTEGER),
+                       CAST(julianday(end_date) AS INTEGER), user_id
+                FROM absence_periods
+            """)
+            logger.info("Построен интервальный индекс периодов отсутствия")
+        
+        return True
+    
+    # Накопительные итоги: (колонка, выражение для строки записи)
+    TOTALS_COLUMNS = [
+        ('work_hours', f"CASE WHEN {{r}}.type_code = {DAY_TYPE_CODES['work']} THEN {{r}}.hours ELSE 0 END"),
+        ('work_days', f"({{r}}.type_code = {DAY_TYPE_CODES['work']} AND {{r}}.hours > 0)"),
+        ('reinforce_hours', f"CASE WHEN {{r}}.type_code = {DAY_TYPE_CODES['reinforce']} THEN {{r}}.hours ELSE 0 END"),
+        ('reinforce_days', f"({{r}}.type_code = {DAY_TYPE_CODES['reinforce']} AND {{r}}.hours > 0)"),
+        ('vacation_days', f"({{r}}.type_code = {DAY_TYPE_CODES['vacation']})"),
+        ('sick_days', f"({{r}}.type_code = {DAY_TYPE_CODES['sick']})"),
+        ('unpaid_days', f"({{r}}.type_code = {DAY_TYPE_CODES['unpaid']})"),
+    ]
+    
+    def _init_record_totals(self, cursor: sqlite3.Cursor):
+        """
+        Накопительные итоги по сотруднику на каждую дату с записью.
+        Любой диапазон считается разностью двух строк
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'record_totals'")
+        exists = cursor.fetchone() is not None
+        
+        self._create_totals_table(cursor)
+        self._create_totals_triggers(cursor)
+        
+        if not exists:
+            self._rebuild_record_totals(cursor)
+            logger.info("Построены накопительные итоги по записям")
+    
+    def _create_totals_table(self, cursor: sqlite3.Cursor, schema: str = 'main'):
+        columns = ", ".join(
+            f"{name} {'INTEGER' if name.endswith('_days') else 'REAL'} NOT NULL DEFAULT 0"
+            for name, _ in self.TOTALS_COLUMNS
+        )
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}.record_totals (
+                user_id INTEGER NOT NULL,
+                day INTEGER NOT NULL,
+                {columns},
+                PRIMARY KEY (user_id, day)
+            ) WITHOUT ROWID
+        """)
+    
+    def _drop_record_triggers(self, cursor: sqlite3.Cursor):
+        """Снять все триггеры records: итоги, запрет правок закрытых месяцев и журнал изменений"""
+        for trigger in ('totals_insert', 'totals_delete', 'totals_update',
+                        'closed_insert', 'closed_delete', 'closed_update',
+                        'changes_insert', 'changes_delete', 'changes_update'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_records_{trigger}")
+    
+    def _create_record_triggers(self, cursor: sqlite3.Cursor):
+        """Вернуть всё, что снял _drop_record_triggers"""
+        self._create_totals_triggers(cursor)
+        self._create_closed_month_guard(cursor)
+        # Без триггеров журнала кэш других процессов не узнает о правках записей
+        self._init_change_log(cursor)
+    
+    def _create_closed_month_guard(self, cursor: sqlite3.Cursor):
+        """Записи закрытых месяцев нельзя добавить, изменить или удалить"""
+        closed = "EXISTS (SELECT 1 FROM closed_months WHERE {r}.day BETWEEN first_day AND last_day)"
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_records_closed_insert BEFORE INSERT ON records
+            WHEN {closed.format(r='NEW')} BEGIN
+                SELECT RAISE(ABORT, 'month is closed');
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_records_closed_delete BEFORE DELETE ON records
+            WHEN {closed.format(r='OLD')} BEGIN
+                SELECT RAISE(ABORT, 'month is closed');
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_records_closed_update BEFORE UPDATE ON records
+            WHEN {closed.format(r='OLD')} OR {closed.format(r='NEW')} BEGIN
+                SELECT RAISE(ABORT, 'month is closed');
+            END
+        """)
+    
+    def _create_totals_triggers(self, cursor: sqlite3.Cursor):
+        names = [name for name, _ in self.TOTALS_COLUMNS]
+        
+        def add_row(r: str) -> str:
+            prev_values = ", ".join(
+                f"COALESCE(prev.{name}, 0) + {expr.format(r=r)}" for name, expr in self.TOTALS_COLUMNS
+            )
+            shift_later = ", ".join(
+                f"{name} = {name} + {expr.format(r=r)}" for name, expr in self.TOTALS_COLUMNS
+            )
+            return f"""
+                INSERT INTO record_totals (user_id, day, {", ".join(names)})
+                SELECT {r}.user_id, {r}.day, {prev_values}
+                FROM (SELECT 1) LEFT JOIN (
+                    SELECT * FROM record_totals
+                    WHERE user_id = {r}.user_id AND day < {r}.day
+                    ORDER BY day DESC LIMIT 1
+                ) prev ON 1;
+                UPDATE record_totals SET {shift_later}
+                WHERE user_id = {r}.user_id AND day > {r}.day;
+            """
+        
+        def remove_row(r: str) -> str:
+            shift_later = ", ".join(
+                f"{name} = {name} - {expr.format(r=r)}" for name, expr in self.TOTALS_COLUMNS
+            )
+            return f"""
+                DELETE FROM record_totals WHERE user_id = {r}.user_id AND day = {r}.day;
+                UPDATE record_totals SET {shift_later}
+                WHERE user_id = {r}.user_id AND day > {r}.day;
+            """
+        
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_records_totals_insert AFTER INSERT ON records BEGIN
+                {add_row('NEW')}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_records_totals_delete AFTER DELETE ON records BEGIN
+                {remove_row('OLD')}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_records_totals_update AFTER UPDATE ON records BEGIN
+                {remove_row('OLD')}
+                {add_row('NEW')}
+            END
+        """)
+    
+    def _rebuild_record_totals(self, cursor: sqlite3.Cursor, schema: str = 'main'):
+        names = [name for name, _ in self.TOTALS_COLUMNS]
+        running = ", ".join(f"SUM({expr.format(r='records')}) OVER w" for _, expr in self.TOTALS_COLUMNS)
+        cursor.execute(f"DELETE FROM {schema}.record_totals")
+        cursor.execute(f"""
+            INSERT INTO {schema}.record_totals (user_id, day, {", ".join(names)})
+            SELECT user_id, day, {running}
+            FROM {schema}.records
+            WINDOW w AS (PARTITION BY user_id ORDER BY day ROWS UNBOUNDED PRECEDING)
+        """)
+    
+    def rebuild_record_totals(self) -> bool:
+        """Пересчитать накопительные итоги из таблицы records"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                self._rebuild_record_totals(cursor)
+                conn.commit()
+                logger.info("Накопительные итоги пересчитаны")
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка пересчёта накопительных итогов: {e}")
+            return False
+    
+    def get_range_totals(self, user_id: int, start_date: date, end_date: date) -> Optional[Dict[str, float]]:
+        """
+        Итоги за диапазон дат включительно: две точечные выборки из record_totals.
+        В каждом архиве свои итоги, результаты по файлам складываются
+        """
+        names = [name for name, _ in self.TOTALS_COLUMNS]
+        columns = ", ".join(names)
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                totals = {name: 0 for name in names}
+                for schema in self._attach_archives(conn, start_date, end_date):
+                    cursor.execute(
+                        f"SELECT {columns} FROM {schema}.record_totals WHERE user_id = ? AND day <= ? ORDER BY day DESC LIMIT 1",
+                        (user_id, day_number(end_date))
+                    )
+                    upper = cursor.fetchone()
+                    cursor.execute(
+                        f"SELECT {columns} FROM {schema}.record_totals WHERE user_id = ? AND day < ? ORDER BY day DESC LIMIT 1",
+                        (user_id, day_number(start_date))
+                    )
+                    lower = cursor.fetchone()
+                    for name in names:
+                        totals[name] += (upper[name] if upper else 0) - (lower[name] if lower else 0)
+                # Разность накопленных сумм REAL даёт хвосты вроде 35.999999
+                return {name: round(value, 2) for name, value in totals.items()}
+        except Exception as e:
+            logger.error(f"Ошибка получения итогов за период: {e}")
+            return None
+    
     def add_employee(self, user_id: int, full_name: str, shift_number: str) -> bool:
         try:
             with self.get_connection() as conn:
@@ -114,6 +699,10 @@ class Database:
             return False
     
     def get_employee(self, user_id: int) -> Optional[Dict[str, Any]]:
+        key = f"employee:{user_id}"
+        return self.cache.get(key, [key], lambda: self._load_employee(user_id))
+    
+    def _load_employee(self, user_id: int) -> Optional[Dict[str, Any]]:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -128,6 +717,9 @@ class Database:
             return None
     
     def get_all_employees(self) -> List[Dict[str, Any]]:
+        return self.cache.get("employees", ["employees"], self._load_all_employees) or []
+    
+    def _load_all_employees(self) -> Optional[List[Dict[str, Any]]]:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -137,7 +729,159 @@ class Database:
                 return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Ошибка получения списка сотрудников: {e}")
+            return None
+    
+    def get_employees_page(self, after_id: int = None, before_id: int = None,
+                           limit: int = 10) -> Dict[str, Any]:
+        """
+        Страница сотрудников по ключу (full_name, user_id).
+        Якорь - сотрудник на границе соседней страницы
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                columns = "user_id, full_name, shift_number, vacation_rate, sick_rate"
+                
+                if before_id is not None:
+                    cursor.execute(
+                        f"""
+                        SELECT {columns} FROM employees
+                        WHERE (full_name, user_id) < (SELECT full_name, user_id FROM employees WHERE user_id = ?)
+                        ORDER BY full_name DESC, user_id DESC
+                        LIMIT ?
+                        """,
+                        (before_id, limit + 1)
+                    )
+                    rows = [dict(row) for row in cursor.fetchall()]
+                    has_prev = len(rows) > limit
+                    return {'employees': rows[:limit][::-1], 'has_prev': has_prev, 'has_next': True}
+                
+                if after_id is not None:
+                    cursor.execute(
+                        f"""
+                        SELECT {columns} FROM employees
+                        WHERE (full_name, user_id) > (SELECT full_name, user_id FROM employees WHERE user_id = ?)
+                        ORDER BY full_name, user_id
+                        LIMIT ?
+                        """,
+                        (after_id, limit + 1)
+                    )
+                else:
+                    cursor.execute(
+                        f"SELECT {columns} FROM employees ORDER BY full_name, user_id LIMIT ?",
+                        (limit + 1,)
+                    )
+                rows = [dict(row) for row in cursor.fetchall()]
+                return {'employees': rows[:limit], 'has_prev': after_id is not None, 'has_next': len(rows) > limit}
+        except Exception as e:
+            logger.error(f"Ошибка получения страницы сотрудников: {e}")
+            return {'employees': [], 'has_prev': False, 'has_next': False}
+    
+    def search_employees(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Поиск сотрудников по началу слов ФИО.
+        Если точных совпадений нет - нечёткий поиск по похожим словам
+        """
+        words = re.findall(r'\w+', query.lower().replace('ё', 'е'))
+        if not words:
             return []
+        
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                columns = "e.user_id, e.full_name, e.shift_number, e.vacation_rate, e.sick_rate"
+                
+                if not self.fts_enabled:
+                    where = " AND ".join("lower(e.full_name) LIKE ?" for _ in words)
+                    cursor.execute(
+                        f"SELECT {columns} FROM employees e WHERE {where} ORDER BY e.full_name LIMIT ?",
+                        [f"%{word}%" for word in words] + [limit]
+                    )
+                    return [dict(row) for row in cursor.fetchall()]
+                
+                match = " ".join(f'"{word}"*' for word in words)
+                cursor.execute(
+                    f"""
+                    SELECT {columns} FROM employees_fts f
+                    JOIN employees e ON e.user_id = f.rowid
+                    WHERE employees_fts MATCH ?
+                    ORDER BY f.rank
+                    LIMIT ?
+                    """,
+                    (match, limit)
+                )
+                results = [dict(row) for row in cursor.fetchall()]
+                if results:
+                    return results
+                
+                # Нечёткий поиск: кандидаты по первым буквам слов (лучшие по bm25),
+                # затем сортировка по похожести
+                match = " OR ".join(f'"{word[:2]}"*' for word in words)
+                cursor.execute(
+                    f"""
+                    SELECT {columns} FROM employees_fts f
+                    JOIN employees e ON e.user_id = f.rowid
+                    WHERE employees_fts MATCH ?
+                    ORDER BY f.rank
+                    LIMIT 200
+                    """,
+                    (match,)
+                )
+                results = self._rank_by_similarity(words, [dict(row) for row in cursor.fetchall()], limit)
+                if results:
+                    return results
+        except Exception as e:
+            logger.error(f"Ошибка поиска сотрудников: {e}")
+            return []
+        
+        # Опечатка в первых буквах: по префиксу кандидатов нет, перебор по общим триграммам
+        query_grams = self._trigrams(words)
+        candidates = [
+            emp for emp in self.get_all_employees()
+            if query_grams & self._trigrams(re.findall(r'\w+', emp['full_name'].lower().replace('ё', 'е')))
+        ]
+        return self._rank_by_similarity(words, candidates, limit)
+    
+    @staticmethod
+    def _trigrams(words: List[str]) -> set:
+        """Триграммы слов, короткое слово - целиком"""
+        grams = set()
+        for word in words:
+            grams |= {word[i:i + 3] for i in range(len(word) - 2)} or {word}
+        return grams
+    
+    def _rank_by_similarity(self, words: List[str], candidates: List[Dict[str, Any]],
+                            limit: int) -> List[Dict[str, Any]]:
+        scored = [(self._name_similarity(words, emp['full_name']), emp) for emp in candidates]
+        scored = [item for item in scored if item[0] >= FUZZY_SEARCH_THRESHOLD]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [emp for _, emp in scored[:limit]]
+    
+    @staticmethod
+    def _name_similarity(words: List[str], full_name: str) -> float:
+        """Средняя похожесть слов запроса на лучшие слова ФИО"""
+        name_words = re.findall(r'\w+', full_name.lower().replace('ё', 'е'))
+        if not name_words:
+            return 0.0
+        return sum(
+            max(SequenceMatcher(None, word, name_word).ratio() for name_word in name_words)
+            for word in words
+        ) / len(words)
+    
+    def count_employees(self) -> int:
+        # Заголовок /список пересчитывался бы на каждой странице
+        count = self.cache.get("employees_count", ["employees"], self._load_employees_count)
+        return count if count is not None else 0
+    
+    def _load_employees_count(self) -> Optional[int]:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM employees")
+                return cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Ошибка подсчёта сотрудников: {e}")
+            return None
     
     def update_employee_rates(self, user_id: int, vacation_rate: int = None, sick_rate: int = None) -> bool:
         try:
@@ -167,15 +911,19 @@ class Database:
             return False
     
     def add_record(self, user_id: int, date: date, day_type: str, hours: float = 0) -> bool:
+        if self.is_archived(date) or self.is_month_closed(date):
+            logger.warning(f"Запись {user_id} на {date} отклонена: месяц закрыт")
+            return False
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     """
-                    INSERT OR REPLACE INTO records (user_id, date, day_type, hours)
+                    INSERT INTO records (user_id, day, type_code, hours)
                     VALUES (?, ?, ?, ?)
+                    ON CONFLICT(user_id, day) DO UPDATE SET type_code = excluded.type_code, hours = excluded.hours
                     """,
-                    (user_id, date.isoformat(), day_type, hours)
+                    (user_id, day_number(date), DAY_TYPE_CODES[day_type], hours)
                 )
                 conn.commit()
                 return True
@@ -183,16 +931,70 @@ class Database:
             logger.error(f"Ошибка добавления записи: {e}")
             return False
     
+    def add_records_bulk(self, user_id: int, dates: List[date], day_type: str, hours: float = 0,
+                         overwrite: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Запись нескольких дат одной транзакцией.
+        Без overwrite существующие записи не трогаются и возвращаются как конфликты
+        """
+        if not dates:
+            return {'written': [], 'conflicts': []}
+        if any(self.is_archived(d) or self.is_month_closed(d) for d in dates):
+            logger.warning(f"Пакетная запись {user_id} отклонена: есть даты из закрытых месяцев")
+            return None
+        
+        days = sorted({day_number(d) for d in dates})
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                placeholders = ", ".join("?" for _ in days)
+                cursor.execute(
+                    f"""
+                    SELECT day, type_code, hours FROM records
+                    WHERE user_id = ? AND day IN ({placeholders})
+                    ORDER BY day
+                    """,
+                    [user_id] + days
+                )
+                rows = cursor.fetchall()
+                
+                if overwrite:
+                    to_write = days
+                    conflict_clause = "DO UPDATE SET type_code = excluded.type_code, hours = excluded.hours"
+                else:
+                    existing = {row['day'] for row in rows}
+                    to_write = [d for d in days if d not in existing]
+                    conflict_clause = "DO NOTHING"
+                
+                type_code = DAY_TYPE_CODES[day_type]
+                cursor.executemany(
+                    f"""
+                    INSERT INTO records (user_id, day, type_code, hours)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(user_id, day) {conflict_clause}
+                    """,
+                    [(user_id, d, type_code, hours) for d in to_write]
+                )
+                conn.commit()
+                return {
+                    'written': [from_day_number(d).isoformat() for d in to_write],
+                    'conflicts': [] if overwrite else [record_from_row(row) for row in rows]
+                }
+        except Exception as e:
+            logger.error(f"Ошибка пакетной записи: {e}")
+            return None
+    
     def get_record(self, user_id: int, date: date) -> Optional[Dict[str, Any]]:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                schemas = self._attach_archives(conn, date, date)
                 cursor.execute(
-                    "SELECT id, user_id, date, day_type, hours FROM records WHERE user_id = ? AND date = ?",
-                    (user_id, date.isoformat())
+                    self._union(schemas, "SELECT id, user_id, day, type_code, hours FROM {db}.records WHERE user_id = ? AND day = ?"),
+                    (user_id, day_number(date)) * len(schemas)
                 )
                 row = cursor.fetchone()
-                return dict(row) if row else None
+                return record_from_row(row) if row else None
         except Exception as e:
             logger.error(f"Ошибка получения записи: {e}")
             return None
@@ -201,42 +1003,146 @@ class Database:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                start_date = f"{year:04d}-{month:02d}-01"
-                end_date = f"{year:04d}-{month+1:02d}-01" if month < 12 else f"{year+1:04d}-01-01"
+                start_day = day_number(date(year, month, 1))
+                end_day = day_number(date(year, month + 1, 1) if month < 12 else date(year + 1, 1, 1))
+                schemas = self._attach_archives(conn, date(year, month, 1), date(year, month, 1))
                 
                 cursor.execute(
-                    """
-                    SELECT id, user_id, date, day_type, hours 
-                    FROM records 
-                    WHERE user_id = ? AND date >= ? AND date < ?
-                    ORDER BY date
-                    """,
-                    (user_id, start_date, end_date)
+                    self._union(schemas, """
+                    SELECT id, user_id, day, type_code, hours 
+                    FROM {db}.records 
+                    WHERE user_id = ? AND day >= ? AND day < ?
+                    """) + " ORDER BY day",
+                    (user_id, start_day, end_day) * len(schemas)
                 )
-                return [dict(row) for row in cursor.fetchall()]
+                return [record_from_row(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Ошибка получения записей за месяц: {e}")
             return []
     
+    def get_monthly_totals(self, user_id: int, first_year: int, last_year: int) -> Optional[Dict[Tuple[int, int], Dict[str, float]]]:
+        """
+        Итоги по месяцам за несколько лет одним сгруппированным запросом.
+        Ключ - (год, месяц), месяцы без записей отсутствуют
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                schemas = self._attach_archives(conn, date(first_year, 1, 1), date(last_year, 12, 31))
+                # Месяц целиком лежит в одном файле, группы из разных схем не пересекаются
+                cursor.execute(
+                    self._union(schemas, """
+                    SELECT strftime('%Y-%m', day + 0.5) AS month, type_code,
+                           COUNT(*) AS days,
+                           SUM(hours > 0) AS worked_days,
+                           SUM(hours) AS hours
+                    FROM {db}.records
+                    WHERE user_id = ? AND day >= ? AND day < ?
+                    GROUP BY month, type_code
+                    """),
+                    (user_id, day_number(date(first_year, 1, 1)), day_number(date(last_year + 1, 1, 1))) * len(schemas)
+                )
+
+                result: Dict[Tuple[int, int], Dict[str, float]] = {}
+                for row in cursor.fetchall():
+                    year, month = map(int, row['month'].split('-'))
+                    totals = result.setdefault((year, month), {name: 0 for name, _ in self.TOTALS_COLUMNS})
+                    day_type = DAY_TYPE_NAMES[row['type_code']]
+                    if day_type in ('work', 'reinforce'):
+                        totals[f"{day_type}_hours"] += row['hours'] or 0
+                        totals[f"{day_type}_days"] += row['worked_days'] or 0
+                    else:
+                        totals[f"{day_type}_days"] += row['days']
+                return result
+        except Exception as e:
+            logger.error(f"Ошибка получения итогов по месяцам: {e}")
+            return None
+
     def get_last_records(self, user_id: int, limit: int = 5) -> List[Dict[str, Any]]:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     """
-                    SELECT id, date, day_type, hours 
+                    SELECT id, day, type_code, hours 
                     FROM records 
                     WHERE user_id = ? 
-                    ORDER BY date DESC, id DESC 
+                    ORDER BY day DESC 
                     LIMIT ?
                     """,
                     (user_id, limit)
                 )
-                return [dict(row) for row in cursor.fetchall()]
+                return [record_from_row(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Ошибка получения последних записей: {e}")
             return []
     
+    def get_records_page(self, user_id: int, before: Tuple[str, int] = None,
+                         after: Tuple[str, int] = None, limit: int = 10) -> Dict[str, Any]:
+        """
+        Страница истории записей от новых к старым по ключу (date, id).
+        before/after - (дата, id) записи на границе соседней страницы.
+        День уникален для сотрудника, поэтому сортировки по day достаточно
+        и чтение идёт только по покрывающему индексу idx_records_user_day
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                
+                if after is not None:
+                    cursor.execute(
+                        """
+                        SELECT id, day, type_code, hours
+                        FROM records
+                        WHERE user_id = ? AND (day, id) > (?, ?)
+                        ORDER BY day
+                        LIMIT ?
+                        """,
+                        (user_id, day_number(date.fromisoformat(after[0])), after[1], limit + 1)
+                    )
+                    rows = [record_from_row(row) for row in cursor.fetchall()]
+                    return {'records': rows[:limit][::-1], 'has_newer': len(rows) > limit, 'has_older': True}
+                
+                if before is not None:
+                    cursor.execute(
+                        """
+                        SELECT id, day, type_code, hours
+                        FROM records
+                        WHERE user_id = ? AND (day, id) < (?, ?)
+                        ORDER BY day DESC
+                        LIMIT ?
+                        """,
+                        (user_id, day_number(date.fromisoformat(before[0])), before[1], limit + 1)
+                    )
+                else:
+                    cursor.execute(
+                        """
+                        SELECT id, day, type_code, hours
+                        FROM records
+                        WHERE user_id = ?
+                        ORDER BY day DESC
+                        LIMIT ?
+                        """,
+                        (user_id, limit + 1)
+                    )
+                rows = [record_from_row(row) for row in cursor.fetchall()]
+                return {'records': rows[:limit], 'has_newer': before is not None, 'has_older': len(rows) > limit}
+        except Exception as e:
+            logger.error(f"Ошибка получения истории записей: {e}")
+            return {'records': [], 'has_newer': False, 'has_older': False}
+    
+    def get_record_date(self, record_id: int) -> Optional[date]:
+        """Дата записи по id: перед удалением проверяется, не закрыт ли её месяц"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT day FROM records WHERE id = ?", (record_id,))
+                row = cursor.fetchone()
+                return from_day_number(row['day']) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка получения даты записи: {e}")
+            return None
+    
     def delete_record(self, record_id: int) -> bool:
         try:
             with self.get_connection() as conn:
@@ -249,6 +1155,9 @@ class Database:
             return False
     
     def add_absence_period(self, user_id: int, period_type: str, start_date: date, end_date: date) -> int:
+        if self.is_archived(start_date):
+            logger.warning(f"Период {user_id} с {start_date} отклонён: год в архиве")
+            return -1
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -310,6 +1219,10 @@ class Database:
             return False
     
     def get_monthly_salary(self) -> int:
+        salary = self.cache.get("settings", ["settings"], self._load_monthly_salary)
+        return salary if salary is not None else 137500
+    
+    def _load_monthly_salary(self) -> Optional[int]:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -318,7 +1231,7 @@ class Database:
                 return row['monthly_salary'] if row else 137500
         except Exception as e:
             logger.error(f"Ошибка получения оклада: {e}")
-            return 137500
+            return None
     
     def update_monthly_salary(self, salary: int) -> bool:
         try:
@@ -338,22 +1251,670 @@ class Database:
             logger.error(f"Ошибка обновления оклада: {e}")
             return False
     
+    def get_shift_headcounts(self) -> Dict[str, int]:
+        """Количество сотрудников в каждой смене"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT shift_number, COUNT(*) AS cnt FROM employees GROUP BY shift_number")
+                return {row['shift_number']: row['cnt'] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Ошибка подсчёта смен: {e}")
+            return {}
+    
+    def get_overlapping_periods(self, start_date: date, end_date: date,
+                                user_id: int = None) -> List[Dict[str, Any]]:
+        """Периоды отсутствия, пересекающие диапазон (по R*Tree-индексу)"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                columns = "p.id, p.user_id, e.shift_number, p.period_type, p.start_date, p.end_date"
+                
+                if self.rtree_enabled:
+                    query = f"""
+                        SELECT {columns}
+                        FROM absence_periods_rtree r
+                        JOIN absence_periods p ON p.id = r.id
+                        JOIN employees e ON e.user_id = p.user_id
+                        WHERE r.start_day <= ? AND r.end_day >= ?
+                    """
+                    params = [day_number(end_date), day_number(start_date)]
+                    if user_id is not None:
+                        query += " AND r.user_id = ?"
+                        params.append(user_id)
+                else:
+                    query = f"""
+                        SELECT {columns}
+                        FROM absence_periods p
+                        JOIN employees e ON e.user_id = p.user_id
+                        WHERE p.start_date <= ? AND p.end_date >= ?
+                    """
+                    params = [end_date.isoformat(), start_date.isoformat()]
+                    if user_id is not None:
+                        query += " AND p.user_id = ?"
+                        params.append(user_id)
+                
+                # Архивные периоды - в годовых файлах, там обычный B-tree индекс
+                archives = [s for s in self._attach_archives(conn, start_date, end_date) if s != 'main']
+                for schema in archives:
+                    query += f"""
+                        UNION ALL
+                        SELECT {columns}
+                        FROM {schema}.absence_periods p
+                        JOIN main.employees e ON e.user_id = p.user_id
+                        WHERE p.start_date <= ? AND p.end_date >= ?
+                    """
+                    params += [end_date.isoformat(), start_date.isoformat()]
+                    if user_id is not None:
+                        query += " AND p.user_id = ?"
+                        params.append(user_id)
+                
+                cursor.execute(query + " ORDER BY start_date", params)
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка поиска пересекающихся периодов: {e}")
+            return []
+    
+    def get_absent_on(self, target_date: date) -> List[Dict[str, Any]]:
+        """Кто отсутствует в указанный день"""
+        return self.get_overlapping_periods(target_date, target_date)
+    
+    def get_records_in_range(self, start_date: date, end_date: date, day_types: List[str]) -> List[Dict[str, Any]]:
+        """Записи всех сотрудников указанных типов за диапазон"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                placeholders = ", ".join("?" for _ in day_types)
+                schemas = self._attach_archives(conn, start_date, end_date)
+                cursor.execute(
+                    self._union(schemas, f"""
+                    SELECT r.user_id, e.shift_number, r.day, r.type_code
+                    FROM {{db}}.records r
+                    JOIN main.employees e ON e.user_id = r.user_id
+                    WHERE r.day >= ? AND r.day <= ? AND r.type_code IN ({placeholders})
+                    """),
+                    ([day_number(start_date), day_number(end_date)] + [DAY_TYPE_CODES[t] for t in day_types]) * len(schemas)
+                )
+                return [record_from_row(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка получения записей за диапазон: {e}")
+            return []
+    
     def check_date_conflict(self, user_id: int, start_date: date, end_date: date) -> List[Dict[str, Any]]:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                schemas = self._attach_archives(conn, start_date, end_date)
+                cursor.execute(
+                    self._union(schemas, """
+                    SELECT day, type_code, hours 
+                    FROM {db}.records 
+                    WHERE user_id = ? AND day >= ? AND day <= ?
+                    """) + " ORDER BY day",
+                    (user_id, day_number(start_date), day_number(end_date)) * len(schemas)
+                )
+                return [record_from_row(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка проверки конфликтов: {e}")
+            return []
+
+    def create_broadcast(self, text: str, created_by: int) -> int:
+        """Создаёт рассылку и список получателей из всех сотрудников"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO broadcasts (text, created_by) VALUES (?, ?)",
+                    (text, created_by)
+                )
+                broadcast_id = cursor.lastrowid
                 cursor.execute(
                     """
-                    SELECT date, day_type, hours 
-                    FROM records 
-                    WHERE user_id = ? AND date >= ? AND date <= ?
-                    ORDER BY date
+                    INSERT INTO broadcast_recipients (broadcast_id, user_id)
+                    SELECT ?, user_id FROM employees
+                    """,
+                    (broadcast_id,)
+                )
+                conn.commit()
+                logger.info(f"Создана рассылка #{broadcast_id} на {cursor.rowcount} получателей")
+                return broadcast_id
+        except Exception as e:
+            logger.error(f"Ошибка создания рассылки: {e}")
+            return -1
+    
+    def get_broadcast(self, broadcast_id: int) -> Optional[Dict[str, Any]]:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    SELECT id, text, created_by, status, status_chat_id, status_message_id
+                    FROM broadcasts WHERE id = ?
                     """,
-                    (user_id, start_date.isoformat(), end_date.isoformat())
+                    (broadcast_id,)
+                )
+                row = cursor.fetchone()
+                return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка получения рассылки: {e}")
+            return None
+    
+    def get_running_broadcasts(self) -> List[Dict[str, Any]]:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    SELECT id, text, created_by, status, status_chat_id, status_message_id
+                    FROM broadcasts WHERE status = 'running' ORDER BY id
+                    """
                 )
                 return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
-            logger.error(f"Ошибка проверки конфликтов: {e}")
+            logger.error(f"Ошибка получения активных рассылок: {e}")
+            return []
+    
+    def set_broadcast_status_message(self, broadcast_id: int, chat_id: int, message_id: int) -> bool:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "UPDATE broadcasts SET status_chat_id = ?, status_message_id = ? WHERE id = ?",
+                    (chat_id, message_id, broadcast_id)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Ошибка сохранения статуса рассылки: {e}")
+            return False
+    
+    def finish_broadcast(self, broadcast_id: int, status: str = 'done') -> bool:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "UPDATE broadcasts SET status = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    (status, broadcast_id)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Ошибка завершения рассылки: {e}")
+            return False
+    
+    def get_pending_recipients(self, broadcast_id: int) -> List[int]:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    SELECT user_id FROM broadcast_recipients
+                    WHERE broadcast_id = ? AND status = 'pending'
+                    """,
+                    (broadcast_id,)
+                )
+                return [row['user_id'] for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка получения получателей рассылки: {e}")
+            return []
+    
+    def mark_broadcast_recipients(self, broadcast_id: int, results: List[Tuple[int, str, Optional[str]]]) -> bool:
+        """Сохраняет результаты доставки пачкой: (user_id, status, error)"""
+        if not results:
+            return True
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(
+                    """
+                    UPDATE broadcast_recipients
+                    SET status = ?, error = ?, sent_at = CURRENT_TIMESTAMP
+                    WHERE broadcast_id = ? AND user_id = ?
+                    """,
+                    [(status, error, broadcast_id, user_id) for user_id, status, error in results]
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения прогресса рассылки: {e}")
+            return False
+    
+    def end_broadcast_pass(self, broadcast_id: int, max_passes: int) -> Optional[int]:
+        """
+        Конец прохода рассылки: оставшимся pending засчитывается проход,
+        исчерпавшие max_passes помечаются failed. Возвращает число оставшихся pending
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    UPDATE broadcast_recipients SET passes = passes + 1
+                    WHERE broadcast_id = ? AND status = 'pending'
+                    """,
+                    (broadcast_id,)
+                )
+                cursor.execute(
+                    """
+                    UPDATE broadcast_recipients
+                    SET status = 'failed', error = 'недоступен после повторов', sent_at = CURRENT_TIMESTAMP
+                    WHERE broadcast_id = ? AND status = 'pending' AND passes >= ?
+                    """,
+                    (broadcast_id, max_passes)
+                )
+                cursor.execute(
+                    "SELECT COUNT(*) FROM broadcast_recipients WHERE broadcast_id = ? AND status = 'pending'",
+                    (broadcast_id,)
+                )
+                remaining = cursor.fetchone()[0]
+                conn.commit()
+                return remaining
+        except Exception as e:
+            logger.error(f"Ошибка завершения прохода рассылки: {e}")
+            return None
+    
+    def get_broadcast_progress(self, broadcast_id: int) -> Dict[str, int]:
+        progress = {'pending': 0, 'sent': 0, 'failed': 0}
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    SELECT status, COUNT(*) AS cnt FROM broadcast_recipients
+                    WHERE broadcast_id = ? GROUP BY status
+                    """,
+                    (broadcast_id,)
+                )
+                for row in cursor.fetchall():
+                    progress[row['status']] = row['cnt']
+        except Exception as e:
+            logger.error(f"Ошибка получения прогресса рассылки: {e}")
+        return progress
+    
+    # ---------- обработанные апдейты ----------
+    
+    def get_processed_updates(self, limit: int) -> List[int]:
+        """Последние limit обработанных update_id, от старых к новым"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT update_id FROM processed_updates ORDER BY seq DESC LIMIT ?",
+                    (limit,)
+                )
+                return [row['update_id'] for row in reversed(cursor.fetchall())]
+        except Exception as e:
+            logger.error(f"Ошибка чтения обработанных апдейтов: {e}")
+            return []
+    
+    def save_processed_updates(self, update_ids: List[int], keep: int) -> bool:
+        """Добавить update_id и оставить в таблице только keep последних по порядку сохранения"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(
+                    """
+                    INSERT OR IGNORE INTO processed_updates (update_id, seq)
+                    VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM processed_updates))
+                    """,
+                    [(update_id,) for update_id in update_ids]
+                )
+                cursor.execute(
+                    """
+                    DELETE FROM processed_updates WHERE seq <
+                        (SELECT seq FROM processed_updates ORDER BY seq DESC LIMIT 1 OFFSET ?)
+                    """,
+                    (keep - 1,)
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения обработанных апдейтов: {e}")
+            return False
+    
+    # ---------- закрытые месяцы ----------
+    
+    def is_month_closed(self, d: date) -> bool:
+        # Месяц мог закрыть другой процесс
+        self.cache.sync()
+        return (d.year, d.month) in self.closed_months
+    
+    def get_team_month_totals(self, year: int, month: int) -> Optional[Dict[int, Dict[str, float]]]:
+        """Итоги месяца по всем сотрудникам одним запросом по индексу дней"""
+        try:
+            with self.get_connection() as conn:
+                schemas = self._attach_archives(conn, date(year, month, 1), date(year, month, 1))
+                return self._read_team_month_totals(conn.cursor(), schemas, year, month)
+        except Exception as e:
+            logger.error(f"Ошибка получения итогов месяца по команде: {e}")
+            return None
+    
+    def _read_team_month_totals(self, cursor: sqlite3.Cursor, schemas: List[str],
+                                year: int, month: int) -> Dict[int, Dict[str, float]]:
+        first = date(year, month, 1)
+        next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        running = ", ".join(
+            f"SUM({expr.format(r='r')}) AS {name}" for name, expr in self.TOTALS_COLUMNS
+        )
+        cursor.execute(
+            self._union(schemas, f"""
+            SELECT r.user_id, {running}
+            FROM {{db}}.records r
+            WHERE r.day >= ? AND r.day < ?
+            GROUP BY r.user_id
+            """),
+            (day_number(first), day_number(next_month)) * len(schemas)
+        )
+        result: Dict[int, Dict[str, float]] = {}
+        for row in cursor.fetchall():
+            totals = result.setdefault(row['user_id'], {name: 0 for name, _ in self.TOTALS_COLUMNS})
+            for name, _ in self.TOTALS_COLUMNS:
+                totals[name] = round(totals[name] + (row[name] or 0), 2)
+        return result
+    
+    def close_month(self, year: int, month: int,
+                    build_snapshots: Callable[[Dict[int, Dict[str, float]], List[Dict[str, Any]], int],
+                                              Dict[int, Dict[str, Any]]],
+                    closed_by: int = None) -> Optional[int]:
+        """
+        Закрыть месяц: сохранить статистику всех сотрудников одной транзакцией.
+        Итоги, сотрудники и оклад читаются под блокировкой записи (BEGIN IMMEDIATE),
+        снимки строит build_snapshots(итоги, сотрудники, оклад). Запись, добавленная
+        во время закрытия, либо попадёт в снимок, либо будет отклонена триггером.
+        Возвращает число снимков или None
+        """
+        if (year, month) in self.closed_months:
+            return None
+        
+        first = date(year, month, 1)
+        next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        try:
+            with self.get_connection() as conn:
+                # ATTACH внутри транзакции невозможен - архивы подключаются до неё
+                schemas = self._attach_archives(conn, first, first)
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                team_totals = self._read_team_month_totals(cursor, schemas, year, month)
+                cursor.execute(
+                    "SELECT user_id, full_name, shift_number, vacation_rate, sick_rate FROM employees ORDER BY full_name"
+                )
+                employees = [dict(row) for row in cursor.fetchall()]
+                cursor.execute("SELECT monthly_salary FROM system_settings WHERE id = 1")
+                row = cursor.fetchone()
+                salary = row['monthly_salary'] if row else 137500
+                snapshots = build_snapshots(team_totals, employees, salary)
+                
+                cursor.execute(
+                    """
+                    INSERT INTO closed_months (year, month, first_day, last_day, closed_by)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (year, month, day_number(first), day_number(next_month) - 1, closed_by)
+                )
+                cursor.executemany(
+                    "INSERT INTO payroll_snapshots (year, month, user_id, stats) VALUES (?, ?, ?, ?)",
+                    [
+                        (year, month, user_id, json.dumps(stats, ensure_ascii=False))
+                        for user_id, stats in snapshots.items()
+                    ]
+                )
+                conn.commit()
+        except sqlite3.IntegrityError:
+            logger.warning(f"Месяц {month:02d}.{year} уже закрыт")
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка закрытия месяца: {e}")
+            return None
+        
+        self.closed_months.add((year, month))
+        logger.info(f"Закрыт месяц {month:02d}.{year}: снимков {len(snapshots)}")
+        return len(snapshots)
+    
+    def get_month_snapshot(self, user_id: int, year: int, month: int) -> Optional[Dict[str, Any]]:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT stats FROM payroll_snapshots WHERE year = ? AND month = ? AND user_id = ?",
+                    (year, month, user_id)
+                )
+                row = cursor.fetchone()
+                return json.loads(row['stats']) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка получения снимка статистики: {e}")
+            return None
+    
+    def get_month_snapshots(self, user_id: int, first_year: int, last_year: int) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """Снимки сотрудника за несколько лет, ключ - (год, месяц)"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    SELECT year, month, stats FROM payroll_snapshots
+                    WHERE year BETWEEN ? AND ? AND user_id = ?
+                    """,
+                    (first_year, last_year, user_id)
+                )
+                return {(row['year'], row['month']): json.loads(row['stats']) for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Ошибка получения снимков статистики: {e}")
+            return {}
+    
+    def get_closed_months(self, limit: int = 12) -> List[Dict[str, Any]]:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    SELECT c.year, c.month, c.closed_by, c.closed_at, COUNT(s.user_id) AS employees
+                    FROM closed_months c
+                    LEFT JOIN payroll_snapshots s ON s.year = c.year AND s.month = c.month
+                    GROUP BY c.year, c.month
+                    ORDER BY c.year DESC, c.month DESC
+                    LIMIT ?
+                    """,
+                    (limit,)
+                )
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка получения закрытых месяцев: {e}")
+            return []
+    
+    # ---------- архив закрытых лет ----------
+    
+    def _archive_path(self, year: int) -> str:
+        archive_dir = ARCHIVE_DIR
+        if not os.path.isabs(archive_dir):
+            archive_dir = os.path.join(os.path.dirname(os.path.abspath(self.db_path)), archive_dir)
+        return os.path.join(archive_dir, f"{year}.db")
+    
+    def is_archived(self, d: date) -> bool:
+        self.cache.sync()
+        return d.year in self.archived_years
+    
+    def _attach_archives(self, conn: sqlite3.Connection, start_date: date, end_date: date) -> List[str]:
+        """
+        Подключает только для чтения архивы лет, попадающих в диапазон.
+        Возвращает схемы, по которым надо выполнить запрос: архивы и main
+        """
+        self.cache.sync()
+        schemas = []
+        for year in sorted(self.archived_years):
+            if start_date.year <= year <= end_date.year:
+                schema = f"archive_{year}"
+                uri = Path(self._archive_path(year)).as_uri() + "?mode=ro"
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (uri,))
+                schemas.append(schema)
+        schemas.append('main')
+        return schemas
+    
+    @staticmethod
+    def _union(schemas: List[str], query: str) -> str:
+        """Один запрос по всем схемам через UNION ALL, {db} - имя схемы"""
+        return " UNION ALL ".join(query.replace("{db}", schema) for schema in schemas)
+    
+    def _create_archive_schema(self, cursor: sqlite3.Cursor, schema: str):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}.records (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                day INTEGER NOT NULL,
+                type_code INTEGER NOT NULL,
+                hours REAL DEFAULT 0,
+                created_at TIMESTAMP,
+                UNIQUE(user_id, day)
+            )
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_records_user_day ON records(user_id, day, type_code, hours)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_records_day ON records(day, type_code, user_id)")
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}.absence_periods (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                period_type TEXT NOT NULL,
+                start_date DATE NOT NULL,
+                end_date DATE NOT NULL,
+                created_at TIMESTAMP
+            )
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_periods_dates ON absence_periods(start_date, end_date)")
+        self._create_totals_table(cursor, schema)
+    
+    def _remove_archive_file(self, path: str):
+        """Недописанный архив: данные года ещё в основной базе, файл можно удалить"""
+        for suffix in ("", "-journal", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    
+    def archive_year(self, year: int) -> Optional[Dict[str, int]]:
+        """
+        Перенос записей и периодов закрытого года в отдельный файл.
+        Периоды через границу года остаются в основной базе.
+        
+        В режиме WAL транзакция по нескольким файлам атомарна только для
+        каждого файла в отдельности, поэтому два шага: сначала архив пишется
+        и фиксируется целиком, потом одной транзакцией основной базы
+        сверяются количества, год регистрируется и удаляется из основной базы.
+        Пока второй шаг не выполнен, данные года есть в основной базе,
+        а файл архива без регистрации - просто остаток прерванного запуска
+        """
+        if year >= date.today().year or year in self.archived_years:
+            logger.warning(f"Год {year} нельзя архивировать")
+            return None
+        
+        path = self._archive_path(year)
+        if os.path.exists(path):
+            logger.warning(f"Архив {path} остался от прерванного запуска, создаётся заново")
+            self._remove_archive_file(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        first_day, last_day = day_number(date(year, 1, 1)), day_number(date(year, 12, 31))
+        period_range = (f"{year:04d}-01-01", f"{year:04d}-12-31")
+        records_where = "day BETWEEN ? AND ?"
+        periods_where = "start_date >= ? AND end_date <= ?"
+        conn = self.get_connection()
+        try:
+            conn.execute("ATTACH DATABASE ? AS archive", (path,))
+            cursor = conn.cursor()
+            
+            # Шаг 1: пишется только файл архива
+            cursor.execute("BEGIN")
+            self._create_archive_schema(cursor, 'archive')
+            cursor.execute(
+                f"""
+                INSERT INTO archive.records (id, user_id, day, type_code, hours, created_at)
+                SELECT id, user_id, day, type_code, hours, created_at
+                FROM main.records WHERE {records_where}
+                """,
+                (first_day, last_day)
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO archive.absence_periods (id, user_id, period_type, start_date, end_date, created_at)
+                SELECT id, user_id, period_type, start_date, end_date, created_at
+                FROM main.absence_periods WHERE {periods_where}
+                """,
+                period_range
+            )
+            self._rebuild_record_totals(cursor, 'archive')
+            conn.commit()
+            
+            # Шаг 2: пишется только основная база. Сверка под блокировкой записи:
+            # правка, успевшая между шагами, не потеряется - архив просто пересоздастся
+            cursor.execute("BEGIN IMMEDIATE")
+            counts = {}
+            for table, where, params in (('records', records_where, (first_day, last_day)),
+                                         ('absence_periods', periods_where, period_range)):
+                cursor.execute(f"SELECT COUNT(*) FROM main.{table} WHERE {where}", params)
+                in_main = cursor.fetchone()[0]
+                cursor.execute(f"SELECT COUNT(*) FROM archive.{table}")
+                in_archive = cursor.fetchone()[0]
+                if in_main != in_archive:
+                    raise RuntimeError(f"{table}: в базе {in_main}, в архиве {in_archive}")
+                counts[table] = in_main
+            records, periods = counts['records'], counts['absence_periods']
+            
+            cursor.execute(
+                "INSERT INTO archives (year, records, periods) VALUES (?, ?, ?)",
+                (year, records, periods)
+            )
+            # Удаление построчно сдвигало бы итоги - пересчитываем их один раз.
+            # Закрытые месяцы переезжают в архив целиком, запрет правок тут не нужен
+            self._drop_record_triggers(cursor)
+            cursor.execute(f"DELETE FROM main.records WHERE {records_where}", (first_day, last_day))
+            cursor.execute(f"DELETE FROM main.absence_periods WHERE {periods_where}", period_range)
+            self._create_record_triggers(cursor)
+            self._rebuild_record_totals(cursor)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            conn.close()
+            conn = None
+            self._remove_archive_file(path)
+            logger.error(f"Ошибка архивации {year} года: {e}")
+            return None
+        finally:
+            if conn is not None:
+                conn.close()
+        
+        self.archived_years.add(year)
+        logger.info(f"{year} год перенесён в архив {path}: записей {records}, периодов {periods}")
+        self.vacuum()
+        return {'year': year, 'records': records, 'periods': periods}
+    
+    def archive_closed_years(self, keep_years: int = ARCHIVE_KEEP_YEARS) -> List[Dict[str, int]]:
+        """Архивировать все годы старше keep_years прошлых лет"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT MIN(day) AS first_day FROM records")
+                row = cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Ошибка поиска лет для архивации: {e}")
+            return []
+        
+        if not row or row['first_day'] is None:
+            return []
+        
+        archived = []
+        last_year = date.today().year - keep_years - 1
+        for year in range(from_day_number(row['first_day']).year, last_year + 1):
+            if year in self.archived_years:
+                continue
+            result = self.archive_year(year)
+            if result:
+                archived.append(result)
+        return archived
+    
+    def get_archives(self) -> List[Dict[str, Any]]:
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT year, records, periods, archived_at FROM archives ORDER BY year")
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка получения списка архивов: {e}")
             return []
 
 # Глобальный экземпляр базы данных
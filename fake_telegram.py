@@ -0,0 +1,285 @@
+"""
+Локальный поддельный Telegram Bot API для прогона бота без сети.
+
+Запуск отдельно:
+    python fake_telegram.py --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python bot.py
+    curl -d '{"user_id": 1, "text": "/start"}' http://127.0.0.1:8081/fake/push
+
+Или внутри теста: FakeTelegram().start() и push_message()/request()
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from statistics import median
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {'id': 1000000, 'is_bot': True, 'first_name': 'ShiftTracker', 'username': 'shifttracker_test_bot'}
+
+class FakeTelegram:
+    """
+    Поддельный Bot API: отдаёт апдейты через getUpdates и запоминает
+    всё, что бот отправил. latency - задержка ответа (число или функция
+    от имени метода), error_rate - доля ответов 502, fail() - точечные ошибки
+    """
+
+    def __init__(self, latency: Union[float, Callable[[str], float]] = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.sent: List[Dict[str, Any]] = []
+        self.calls: Dict[str, int] = {}
+        self._updates: List[Dict[str, Any]] = []
+        self._new_update = asyncio.Event()
+        self._failures: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._listeners: List[tuple] = []
+        # Не с единицы: окно обработанных update_id в базе бота переживает перезапуск сервера.
+        # Микросекунды: следующий запуск начнёт выше, даже если прошлый отдал много апдейтов
+        self._next_update_id = time.time_ns() // 1000
+        self._next_message_id = 1
+        self._runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+
+    # ---------- управление ----------
+
+    def fail(self, method: str, status: int = 502, count: int = 1, retry_after: int = None, html: bool = False):
+        """
+        Следующие count вызовов method вернут ошибку status (429 - с retry_after).
+        html - вместо JSON страница ошибки, как от прокси перед Bot API
+        """
+        error = {'status': status, 'retry_after': retry_after, 'html': html}
+        self._failures.setdefault(method, deque()).extend([error] * count)
+
+    def _push(self, kind: str, payload: Dict[str, Any]) -> int:
+        update_id = self._next_update_id
+        self._next_update_id += 1
+        self._updates.append({'update_id': update_id, kind: payload})
+        self._new_update.set()
+        return update_id
+
+    @staticmethod
+    def _user(user_id: int, first_name: str = "Тест") -> Dict[str, Any]:
+        return {'id': user_id, 'is_bot': False, 'first_name': first_name}
+
+    def push_message(self, user_id: int, text: str) -> int:
+        entities = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}] if text.startswith("/") else None
+        message = {
+            'message_id': self._message_id(),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self._user(user_id),
+            'text': text,
+        }
+        if entities:
+            message['entities'] = entities
+        return self._push('message', message)
+
+    def push_callback(self, user_id: int, data: str, message_id: int = None) -> int:
+        message = {
+            'message_id': message_id or self._message_id(),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': "",
+        }
+        return self._push('callback_query', {
+            'id': str(self._next_update_id),
+            'chat_instance': str(user_id),
+            'from': self._user(user_id),
+            'message': message,
+            'data': data,
+        })
+
+    def _message_id(self) -> int:
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        return message_id
+
+    async def wait_for(self, predicate: Callable[[Dict[str, Any]], bool], timeout: float = 5) -> Dict[str, Any]:
+        """Ждать исходящий запрос бота, подходящий под predicate"""
+        future = asyncio.get_running_loop().create_future()
+        listener = (predicate, future)
+        self._listeners.append(listener)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    async def request(self, user_id: int, text: str, timeout: float = 5) -> Dict[str, Any]:
+        """Сообщение от пользователя и первый ответ бота в этот чат, с временем ответа"""
+        started = time.perf_counter()
+        waiter = asyncio.ensure_future(self.wait_for(
+            lambda call: str(call['params'].get('chat_id')) == str(user_id), timeout
+        ))
+        await asyncio.sleep(0)
+        self.push_message(user_id, text)
+        call = await waiter
+        return {**call, 'seconds': time.perf_counter() - started}
+
+    async def measure(self, user_ids: List[int], text: str, rounds: int = 1) -> Dict[str, float]:
+        """Задержка и пропускная способность: все пользователи пишут одновременно rounds раз"""
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(rounds):
+            replies = await asyncio.gather(*(self.request(user_id, text) for user_id in user_ids))
+            latencies.extend(reply['seconds'] for reply in replies)
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'p50_ms': round(median(latencies) * 1000, 1),
+            'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1),
+            'rps': round(len(latencies) / elapsed, 1),
+        }
+
+    # ---------- HTTP ----------
+
+    async def _params(self, request: web.Request) -> Dict[str, Any]:
+        params: Dict[str, Any] = dict(request.query)
+        if request.content_type == "application/json":
+            params.update(await request.json())
+        elif request.can_read_body:
+            for key, value in (await request.post()).items():
+                if isinstance(value, web.FileField):
+                    params[key] = {'filename': value.filename, 'size': len(value.file.read())}
+                else:
+                    params[key] = value
+        for key in ('reply_markup', 'allowed_updates', 'entities'):
+            if isinstance(params.get(key), str):
+                params[key] = json.loads(params[key])
+        return params
+
+    def _message(self, params: Dict[str, Any], **extra) -> Dict[str, Any]:
+        return {
+            'message_id': int(params.get('message_id') or self._message_id()),
+            'date': int(time.time()),
+            'chat': {'id': int(params['chat_id']), 'type': 'private'},
+            'from': BOT_USER,
+            **extra,
+        }
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get('offset') or 0)
+        if offset:
+            self._updates = [u for u in self._updates if u['update_id'] >= offset]
+        if not self._updates:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), float(params.get('timeout') or 0))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get('limit') or 100)
+        return self._updates[:limit]
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        key = method.lower()
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = await self._params(request)
+
+        latency = self.latency(method) if callable(self.latency) else self.latency
+        if latency and key != "getupdates":
+            await asyncio.sleep(latency)
+
+        failures = self._failures.get(method)
+        if failures:
+            error = failures.popleft()
+            if error['html']:
+                return web.Response(text=f"<html><body><h1>{error['status']} Bad Gateway</h1></body></html>",
+                                    status=error['status'], content_type="text/html")
+            body = {'ok': False, 'error_code': error['status'], 'description': f"Injected error {error['status']}"}
+            if error['retry_after']:
+                body['parameters'] = {'retry_after': error['retry_after']}
+                body['description'] = f"Too Many Requests: retry after {error['retry_after']}"
+            return web.json_response(body, status=error['status'])
+        if self.error_rate and key != "getupdates" and random.random() < self.error_rate:
+            return web.json_response({'ok': False, 'error_code': 502, 'description': "Bad Gateway"}, status=502)
+
+        if key == "getupdates":
+            result: Any = await self._get_updates(params)
+        elif key == "getme":
+            result = BOT_USER
+        elif key == "sendmessage":
+            result = self._message(params, text=params.get('text', ""))
+        elif key == "editmessagetext":
+            result = self._message(params, text=params.get('text', ""), edit_date=int(time.time()))
+        elif key == "senddocument":
+            document = params.get('document') or {}
+            name = document.get('filename', "file") if isinstance(document, dict) else "file"
+            result = self._message(params, document={
+                'file_id': f"doc{self._next_message_id}", 'file_unique_id': f"u{self._next_message_id}",
+                'file_name': name,
+            })
+        else:
+            # answerCallbackQuery, deleteWebhook, setMyCommands и прочее
+            result = True
+
+        if key != "getupdates":
+            call = {'method': method, 'params': params, 'result': result, 'time': time.time()}
+            self.sent.append(call)
+            for predicate, future in list(self._listeners):
+                if not future.done() and predicate(call):
+                    future.set_result(call)
+        return web.json_response({'ok': True, 'result': result})
+
+    async def _control_push(self, request: web.Request) -> web.Response:
+        """POST /fake/push {"user_id": 1, "text": "/start"} или {"user_id": 1, "data": "hours_12"}"""
+        body = await request.json()
+        if 'data' in body:
+            update_id = self.push_callback(int(body['user_id']), body['data'], body.get('message_id'))
+        else:
+            update_id = self.push_message(int(body['user_id']), body['text'])
+        return web.json_response({'update_id': update_id})
+
+    async def _control_sent(self, request: web.Request) -> web.Response:
+        return web.json_response({'calls': self.calls, 'sent': self.sent[-int(request.query.get('limit', 50)):]})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        # Управление сервером, когда он запущен отдельным процессом
+        app.router.add_post("/fake/push", self._control_push)
+        app.router.add_get("/fake/sent", self._control_sent)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запустить сервер, вернуть адрес для TELEGRAM_API_URL"""
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        logger.info(f"Поддельный Bot API слушает {self.url}")
+        return self.url
+
+    async def stop(self):
+        # Отпустить висящие long polling запросы, иначе их обработчики останутся в цикле
+        self._new_update.set()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+async def _serve(port: int, latency: float, error_rate: float):
+    fake = FakeTelegram(latency=latency, error_rate=error_rate)
+    await fake.start(port=port)
+    print(f"TELEGRAM_API_URL={fake.url}")
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Поддельный Telegram Bot API")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, сек")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 502")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve(args.port, args.latency, args.error_rate))
@@ -31,7 +31,8 @@ def get_main_keyboard(is_admin: bool = False) -> ReplyKeyboardMarkup:
     builder.adjust(3, 3, 2, 2, 3)
     return builder.as_markup(resize_keyboard=True)
 
-def get_date_keyboard() -> InlineKeyboardMarkup:
+def get_date_keyboard(allow_multi: bool = True) -> InlineKeyboardMarkup:
+    """allow_multi=False - без выбора нескольких дат (период задаётся началом и концом)"""
     builder = InlineKeyboardBuilder()
     
     today = date.today()
@@ -49,8 +50,13 @@ def get_date_keyboard() -> InlineKeyboardMarkup:
         text="📅 Выбрать дату",
         callback_data="date_custom"
     ))
+    if allow_multi:
+        builder.add(InlineKeyboardButton(
+            text="🗓 Несколько дат",
+            callback_data="date_multi"
+        ))
     
-    builder.adjust(2, 1)
+    builder.adjust(2, 1, 1)
     return builder.as_markup()
 
 def get_hours_keyboard() -> InlineKeyboardMarkup:
@@ -214,3 +220,147 @@ def get_calendar_keyboard(year: int, month: int) -> InlineKeyboardMarkup:
     builder.adjust(7, 7, *[7] * ((last_day.day + weekday_offset) // 7 + 1), 3)
     
     return builder.as_markup()
+
+def get_broadcast_confirm_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    
+    builder.add(InlineKeyboardButton(text="📣 Отправить всем", callback_data="broadcast_send"))
+    builder.add(InlineKeyboardButton(text="❌ Отменить", callback_data="broadcast_cancel"))
+    
+    builder.adjust(2)
+    return builder.as_markup()
+
+def get_broadcast_keyboard(broadcast_id: int) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    
+    builder.add(InlineKeyboardButton(text="⛔ Остановить", callback_data=f"broadcast_stop_{broadcast_id}"))
+    
+    builder.adjust(1)
+    return builder.as_markup()
+
+def get_employees_page_keyboard(page: dict) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    employees = page['employees']
+    
+    buttons = 0
+    if page['has_prev'] and employees:
+        builder.add(InlineKeyboardButton(text="◀️ Назад", callback_data=f"employees_prev_{employees[0]['user_id']}"))
+        buttons += 1
+    if page['has_next'] and employees:
+        builder.add(InlineKeyboardButton(text="Вперёд ▶️", callback_data=f"employees_next_{employees[-1]['user_id']}"))
+        buttons += 1
+    
+    builder.adjust(max(buttons, 1))
+    return builder.as_markup()
+
+def get_search_results_keyboard(employees: list) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    
+    for emp in employees:
+        builder.add(InlineKeyboardButton(
+            text=f"📊 {emp['full_name']}",
+            callback_data=f"find_stats_{emp['user_id']}"
+        ))
+    
+    builder.adjust(1)
+    return builder.as_markup()
+
+def get_records_history_keyboard(page: dict, is_locked=None) -> InlineKeyboardMarkup:
+    """is_locked(date) - записи закрытых месяцев показываются без удаления"""
+    builder = InlineKeyboardBuilder()
+    records = page['records']
+    
+    for record in records:
+        record_date = datetime.strptime(record['date'], "%Y-%m-%d").date()
+        date_str = record_date.strftime("%d.%m.%Y")
+        if is_locked and is_locked(record_date):
+            builder.add(InlineKeyboardButton(
+                text=f"🔒 {date_str} - {record['day_type']}",
+                callback_data="locked"
+            ))
+            continue
+        builder.add(InlineKeyboardButton(
+            text=f"{date_str} - {record['day_type']}",
+            callback_data=f"delete_{record['id']}"
+        ))
+    
+    nav_buttons = 0
+    if page['has_newer'] and records:
+        first = records[0]
+        builder.add(InlineKeyboardButton(text="◀️ Новее", callback_data=f"history_newer_{first['date']}_{first['id']}"))
+        nav_buttons += 1
+    if page['has_older'] and records:
+        last = records[-1]
+        builder.add(InlineKeyboardButton(text="Старше ▶️", callback_data=f"history_older_{last['date']}_{last['id']}"))
+        nav_buttons += 1
+    
+    builder.add(InlineKeyboardButton(text="❌ Отмена", callback_data="cancel"))
+    
+    rows = [1] * len(records)
+    if nav_buttons:
+        rows.append(nav_buttons)
+    builder.adjust(*rows, 1)
+    return builder.as_markup()
+
+def get_multi_calendar_keyboard(year: int, month: int, selected: list) -> InlineKeyboardMarkup:
+    """Календарь с выбором нескольких дат"""
+    builder = InlineKeyboardBuilder()
+    selected = set(selected)
+    
+    month_name = datetime(year, month, 1).strftime("%B %Y")
+    builder.row(InlineKeyboardButton(text=month_name, callback_data="ignore"))
+    builder.row(*[
+        InlineKeyboardButton(text=day, callback_data="ignore")
+        for day in ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+    ])
+    
+    first_day = date(year, month, 1)
+    last_day = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year + 1, 1, 1) - timedelta(days=1)
+    
+    week = [InlineKeyboardButton(text=" ", callback_data="ignore") for _ in range(first_day.weekday())]
+    current = first_day
+    while current <= last_day:
+        mark = "✅" if current.isoformat() in selected else str(current.day)
+        week.append(InlineKeyboardButton(
+            text=mark,
+            callback_data=f"mcal_t_{current.year}_{current.month}_{current.day}"
+        ))
+        if len(week) == 7:
+            builder.row(*week)
+            week = []
+        current += timedelta(days=1)
+    
+    if week:
+        week += [InlineKeyboardButton(text=" ", callback_data="ignore") for _ in range(7 - len(week))]
+        builder.row(*week)
+    
+    prev_month = month - 1 if month > 1 else 12
+    prev_year = year if month > 1 else year - 1
+    next_month = month + 1 if month < 12 else 1
+    next_year = year if month < 12 else year + 1
+    
+    builder.row(
+        InlineKeyboardButton(text="◀️", callback_data=f"mcal_nav_{prev_year}_{prev_month}"),
+        InlineKeyboardButton(text=f"Готово ({len(selected)})", callback_data="mcal_done"),
+        InlineKeyboardButton(text="▶️", callback_data=f"mcal_nav_{next_year}_{next_month}")
+    )
+    
+    return builder.as_markup()
+
+def get_fill_month_keyboard(year: int, month: int) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    
+    builder.add(InlineKeyboardButton(text="✅ Заполнить", callback_data=f"fill_confirm_{year}_{month}"))
+    builder.add(InlineKeyboardButton(text="❌ Отмена", callback_data="fill_cancel"))
+    
+    builder.adjust(2)
+    return builder.as_markup()
+
+def get_close_month_keyboard(year: int, month: int) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    
+    builder.add(InlineKeyboardButton(text="🔒 Закрыть месяц", callback_data=f"close_confirm_{year}_{month}"))
+    builder.add(InlineKeyboardButton(text="❌ Отмена", callback_data="close_cancel"))
+    
+    builder.adjust(2)
+    return builder.as_markup()
@@ -0,0 +1,226 @@
+import asyncio
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional
+
+from config import LAG_CHECK_INTERVAL, LAG_THRESHOLD, LAG_STALLS_KEEP
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы задержки, мс
+LAG_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Код бота: по этим кадрам стека видно, чей обработчик держит цикл
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Прослойки, через которые проходит каждый апдейт, обработчиком не считаются
+PASS_THROUGH = ('middlewares.py', 'recorder.py', 'profiling.py', 'sharding.py', 'loop_watchdog.py')
+# Точки запуска цикла (asyncio.run(main()) в bot.py) стоят в стеке под любым обработчиком
+ENTRY_POINTS = ('<module>', 'main')
+# HandlerObject.call: следующий кадр - зарегистрированный обработчик или фильтр
+AIOGRAM_HANDLER = os.path.join("aiogram", "dispatcher", "event", "handler.py")
+
+class LoopWatchdog:
+    """
+    Сторож цикла событий. Задача в цикле засыпает на interval и замеряет,
+    насколько позже проснулась - это задержка, которую видят все апдейты.
+    Поток-помощник следит за тем же сроком: если цикл не проснулся дольше
+    threshold, снимает стек потока цикла через sys._current_frames(),
+    пока блокирующий код ещё выполняется
+    """
+
+    def __init__(self, interval: float = LAG_CHECK_INTERVAL, threshold: float = LAG_THRESHOLD,
+                 keep: int = LAG_STALLS_KEEP):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self.blockers: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        # Срок пробуждения текущего замера и номер замера, для которого уже снят стек
+        self._due = 0.0
+        self._tick = 0
+        self._captured_tick = -1
+        self._pending: Optional[Dict[str, Any]] = None
+        self.reset()
+
+    def reset(self):
+        self.histogram = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.started_at = datetime.now()
+        self.stalls.clear()
+        self.blockers.clear()
+
+    # ---------- запуск ----------
+
+    def start(self):
+        """Запустить в работающем цикле событий"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._due = time.monotonic() + self.interval
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Сторож цикла событий запущен: замер каждые {self.interval} с, порог {self.threshold} с")
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # ---------- замер в цикле ----------
+
+    async def _run(self):
+        while True:
+            self._due = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._due)
+            self._record(lag)
+            self._tick += 1
+
+    def _record(self, lag: float):
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        self.histogram[bisect.bisect_left(LAG_BUCKETS_MS, lag * 1000)] += 1
+
+        stall, self._pending = self._pending, None
+        if lag < self.threshold:
+            return
+        if stall is None or stall['tick'] != self._tick:
+            # Поток не успел снять стек (например, держали GIL) - запомним хотя бы сам факт
+            stall = {'time': datetime.now(), 'stack': [], 'handler': None, 'site': None}
+        stall['lag'] = round(lag, 3)
+        self.stalls.append(stall)
+        self.blockers[(stall['handler'], stall['site'])] += 1
+        where = stall['site'] or "место не определено"
+        logger.warning(
+            f"Цикл событий заблокирован на {lag * 1000:.0f} мс: {where}\n" + "".join(stall['stack'][-8:])
+        )
+
+    # ---------- поток-помощник ----------
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            tick = self._tick
+            if tick == self._captured_tick or time.monotonic() - self._due < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._captured_tick = tick
+            self._pending = {'tick': tick, **self._describe(frame)}
+
+    @staticmethod
+    def _describe(frame) -> Dict[str, Any]:
+        summary = traceback.extract_stack(frame)
+        # Кадры ниже шага задачи (Handle._run в asyncio) - запуск цикла, а не обработчик.
+        # Если в стеке есть вызов обработчика aiogram, обработчик - следующий кадр бота
+        start = 0
+        for index, entry in enumerate(summary):
+            if entry.name == '_run' and entry.filename.endswith(os.path.join("asyncio", "events.py")):
+                start = index + 1
+            elif entry.filename.endswith(AIOGRAM_HANDLER):
+                start = index + 1
+        own = [
+            entry for entry in summary[start:]
+            if entry.filename.startswith(PROJECT_DIR)
+            and os.path.basename(entry.filename) not in PASS_THROUGH
+            and entry.name not in ENTRY_POINTS
+        ]
+        # Внешний кадр бота - обработчик, внутренний - строка, которая блокирует
+        handler = f"{os.path.basename(own[0].filename)}:{own[0].name}" if own else None
+        site = f"{os.path.basename(own[-1].filename)}:{own[-1].name}:{own[-1].lineno}" if own else None
+        return {
+            'time': datetime.now(),
+            'stack': traceback.format_list(summary),
+            'handler': handler,
+            'site': site,
+        }
+
+    # ---------- отчёт ----------
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'samples': self.samples,
+            'avg_ms': round(self.total_lag / self.samples * 1000, 1) if self.samples else 0.0,
+            'max_ms': round(self.max_lag * 1000, 1),
+            'p50_ms': self._percentile(0.5),
+            'p99_ms': self._percentile(0.99),
+            'histogram': list(self.histogram),
+            'stalls': len(self.stalls),
+            'blockers': self.blockers.most_common(5),
+            'last_stall': self.stalls[-1] if self.stalls else None,
+            'since': self.started_at,
+        }
+
+    def _percentile(self, share: float) -> Optional[float]:
+        """Верхняя граница корзины, в которую попадает доля share замеров"""
+        if not self.samples:
+            return None
+        target = self.samples * share
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                return LAG_BUCKETS_MS[index] if index < len(LAG_BUCKETS_MS) else None
+        return None
+
+    def format_stacks(self) -> str:
+        """Все сохранённые зависания с полными стеками - для отправки файлом"""
+        lines = []
+        for stall in self.stalls:
+            lines.append(f"=== {stall['time']:%d.%m.%Y %H:%M:%S} - {stall['lag'] * 1000:.0f} мс, {stall['site'] or '?'} ===\n")
+            lines.extend(stall['stack'] or ["стек не снят\n"])
+            lines.append("\n")
+        return "".join(lines)
+
+loop_watchdog = LoopWatchdog()
+
+def _bucket_label(index: int) -> str:
+    if index == len(LAG_BUCKETS_MS):
+        return f"> {LAG_BUCKETS_MS[-1]} мс"
+    return f"≤ {LAG_BUCKETS_MS[index]} мс"
+
+def format_lag(stats: Dict[str, Any], threshold: float = LAG_THRESHOLD) -> str:
+    if not stats['samples']:
+        return "🐢 Замеров задержки цикла событий ещё нет."
+
+    p50 = f"≤ {stats['p50_ms']} мс" if stats['p50_ms'] is not None else "—"
+    p99 = f"≤ {stats['p99_ms']} мс" if stats['p99_ms'] is not None else f"> {LAG_BUCKETS_MS[-1]} мс"
+    text = (
+        f"🐢 Задержка цикла событий с {stats['since']:%d.%m %H:%M}\n\n"
+        f"• Замеров: {stats['samples']}\n"
+        f"• Средняя: {stats['avg_ms']} мс, максимум: {stats['max_ms']} мс\n"
+        f"• p50: {p50}, p99: {p99}\n\n"
+        f"Гистограмма:\n"
+    )
+    for index, count in enumerate(stats['histogram']):
+        if count:
+            text += f"• {_bucket_label(index)}: {count}\n"
+
+    text += f"\nЗависаний дольше {threshold * 1000:.0f} мс: {stats['stalls']}\n"
+    if stats['blockers']:
+        text += "Чаще всего блокируют:\n"
+        for (handler, site), count in stats['blockers']:
+            where = f"{handler} → {site}" if handler else "не определено"
+            text += f"• {where} - {count} раз\n"
+
+    last = stats['last_stall']
+    if last:
+        text += f"\nПоследнее: {last['time']:%d.%m %H:%M:%S}, {last['lag'] * 1000:.0f} мс\n"
+        text += "".join(last['stack'][-6:])[-1500:]
+    return text
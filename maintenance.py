@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from config import MAINTENANCE_QUIET_RATE, MAINTENANCE_VACUUM_PAGES, MAINTENANCE_MAX_SLICES
+from database import db
+from middlewares import activity
+
+logger = logging.getLogger(__name__)
+
+# Отчёт последнего запуска для /обслуживание
+last_report: Optional[Dict[str, Any]] = None
+
+def get_last_report() -> Optional[Dict[str, Any]]:
+    return last_report
+
+def is_quiet() -> bool:
+    return activity.rate_per_minute() <= MAINTENANCE_QUIET_RATE
+
+async def _timed(name: str, func: Callable, *args) -> Dict[str, Any]:
+    """Шаг обслуживания в рабочем потоке с замером времени"""
+    started = time.monotonic()
+    result = await asyncio.get_running_loop().run_in_executor(None, func, *args)
+    return {
+        'step': name,
+        'seconds': round(time.monotonic() - started, 3),
+        'ok': result is not None,
+        'result': result,
+    }
+
+async def run_maintenance(force: bool = False) -> Dict[str, Any]:
+    """
+    Обслуживание базы в тихий период: обновление статистики, возврат
+    свободных страниц небольшими шагами и checkpoint WAL. Если пользователи
+    оживились, оставшиеся шаги переносятся на следующий запуск
+    """
+    global last_report
+
+    report: Dict[str, Any] = {
+        'started': datetime.now(),
+        'rate': round(activity.rate_per_minute(), 1),
+        'steps': [],
+        'skipped': False,
+    }
+
+    if not force and not is_quiet():
+        report['skipped'] = True
+        logger.info(f"Обслуживание отложено: {report['rate']} обновлений в минуту")
+        last_report = report
+        return report
+
+    report['steps'].append(await _timed("optimize", db.optimize))
+
+    freed = 0
+    slices = 0
+    started = time.monotonic()
+    while slices < MAINTENANCE_MAX_SLICES and db.get_freelist_count() > 0:
+        if not force and not is_quiet():
+            break
+        pages = await asyncio.get_running_loop().run_in_executor(
+            None, db.incremental_vacuum, MAINTENANCE_VACUUM_PAGES
+        )
+        if not pages:
+            break
+        freed += pages
+        slices += 1
+        # Между шагами цикл событий обслуживает пользователей
+        await asyncio.sleep(0)
+
+    report['steps'].append({
+        'step': "incremental_vacuum",
+        'seconds': round(time.monotonic() - started, 3),
+        'ok': True,
+        'result': {'freed': freed, 'slices': slices, 'left': db.get_freelist_count()},
+    })
+
+    # Checkpoint последним: страницы после vacuum переезжают из WAL и файл укорачивается
+    report['steps'].append(await _timed("checkpoint", db.checkpoint))
+
+    for step in report['steps']:
+        logger.info(f"Обслуживание {step['step']}: {step['seconds']} с, {step['result']}")
+
+    last_report = report
+    return report
+
+def format_maintenance(report: Optional[Dict[str, Any]]) -> str:
+    if not report:
+        return "🧹 Обслуживание базы ещё не запускалось"
+
+    text = f"🧹 Обслуживание базы {report['started'].strftime('%d.%m.%Y %H:%M')}\n"
+    text += f"Активность: {report['rate']} обновлений в минуту\n\n"
+
+    if report['skipped']:
+        text += "⏸ Отложено: пользователи активны"
+        return text
+
+    for step in report['steps']:
+        mark = "✅" if step['ok'] else "❌"
+        result = step['result'] or {}
+        if step['step'] == "checkpoint" and step['ok']:
+            details = f"WAL {result['wal_pages']} стр., перенесено {result['moved']}"
+        elif step['step'] == "optimize" and step['ok']:
+            details = "ANALYZE" if result['mode'] == 'analyze' else "PRAGMA optimize"
+        elif step['step'] == "incremental_vacuum":
+            details = f"освобождено {result['freed']} стр. за {result['slices']} шаг., осталось {result['left']}"
+        else:
+            details = "ошибка, подробности в логе"
+        text += f"{mark} {step['step']}: {details} ({step['seconds']} с)\n"
+
+    return text
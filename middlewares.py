@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config import (
+    MAINTENANCE_ACTIVITY_WINDOW, USER_QUEUE_LIMIT, CALLBACK_DUPLICATE_WINDOW,
+    UPDATE_DEDUPE_SIZE, UPDATE_DEDUPE_FLUSH_INTERVAL
+)
+from database import db
+
+logger = logging.getLogger(__name__)
+
+class ActivityMiddleware(BaseMiddleware):
+    """Счётчик входящих обновлений за скользящее окно"""
+
+    def __init__(self, window: float = MAINTENANCE_ACTIVITY_WINDOW):
+        self.window = window
+        self._seen: Deque[float] = deque()
+
+    def _trim(self, now: float):
+        while self._seen and now - self._seen[0] > self.window:
+            self._seen.popleft()
+
+    def touch(self):
+        now = time.monotonic()
+        self._seen.append(now)
+        self._trim(now)
+
+    def rate_per_minute(self) -> float:
+        now = time.monotonic()
+        self._trim(now)
+        return len(self._seen) * 60 / self.window
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        self.touch()
+        return await handler(event, data)
+
+activity = ActivityMiddleware()
+
+class _UserSlot:
+    __slots__ = ("lock", "waiting", "callbacks")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.waiting = 0
+        # Нажатия кнопок в обработке или только что обработанные: ключ -> время завершения
+        self.callbacks: Dict[Tuple, Optional[float]] = {}
+
+class UserOrderMiddleware(BaseMiddleware):
+    """
+    Апдейты одного пользователя обрабатываются строго по очереди,
+    разных пользователей - параллельно. Очередь пользователя ограничена,
+    повторное нажатие той же кнопки, пока первое не обработано, отбрасывается
+    """
+
+    def __init__(self, limit: int = USER_QUEUE_LIMIT, duplicate_window: float = CALLBACK_DUPLICATE_WINDOW):
+        self.limit = limit
+        self.duplicate_window = duplicate_window
+        self._slots: Dict[int, _UserSlot] = {}
+        self.stats = {'processed': 0, 'dropped_overflow': 0, 'dropped_duplicate': 0}
+
+    @staticmethod
+    def _callback_key(update: Update) -> Optional[Tuple]:
+        query = update.callback_query
+        if query is None:
+            return None
+        message_id = query.message.message_id if query.message else query.inline_message_id
+        return message_id, query.data
+
+    def _purge(self, slot: _UserSlot, now: float):
+        for old_key, finished in list(slot.callbacks.items()):
+            if finished is not None and now - finished > self.duplicate_window:
+                del slot.callbacks[old_key]
+
+    def _is_duplicate(self, slot: _UserSlot, key: Optional[Tuple], now: float) -> bool:
+        if key is None:
+            return False
+        self._purge(slot, now)
+        return key in slot.callbacks
+
+    def _release(self, user_id: int):
+        """Слот без апдейтов в очереди и без свежих нажатий больше не нужен"""
+        slot = self._slots.get(user_id)
+        if slot is None:
+            return
+        self._purge(slot, time.monotonic())
+        if slot.waiting == 0 and not slot.callbacks:
+            del self._slots[user_id]
+
+    async def _drop(self, update: Update, reason: str):
+        self.stats[reason] += 1
+        if update.callback_query:
+            # Иначе у пользователя крутятся часики на кнопке
+            try:
+                await update.callback_query.answer()
+            except Exception:
+                pass
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or not isinstance(event, Update):
+            return await handler(event, data)
+
+        slot = self._slots.get(user.id)
+        if slot is None:
+            slot = self._slots[user.id] = _UserSlot()
+
+        key = self._callback_key(event)
+        if self._is_duplicate(slot, key, time.monotonic()):
+            logger.info(f"Повторное нажатие {key[1]} от {user.id} пропущено")
+            await self._drop(event, 'dropped_duplicate')
+            return None
+        if slot.waiting >= self.limit:
+            logger.warning(f"Очередь апдейтов пользователя {user.id} переполнена, апдейт {event.update_id} пропущен")
+            await self._drop(event, 'dropped_overflow')
+            return None
+
+        if key is not None:
+            slot.callbacks[key] = None
+        slot.waiting += 1
+        try:
+            async with slot.lock:
+                return await handler(event, data)
+        finally:
+            slot.waiting -= 1
+            self.stats['processed'] += 1
+            if key is not None:
+                slot.callbacks[key] = time.monotonic()
+                # Нажатие помнится окно повторов, после него слот освобождается,
+                # даже если пользователь больше ничего не присылает
+                asyncio.get_running_loop().call_later(
+                    self.duplicate_window + 0.01, self._release, user.id
+                )
+            self._release(user.id)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, 'users': len(self._slots)}
+
+user_order = UserOrderMiddleware()
+
+class UpdateDedupe(BaseMiddleware):
+    """
+    Окно последних update_id: кольцевой буфер фиксированного размера
+    и множество для проверки за O(1). Новые id пачками сохраняются в базу,
+    после перезапуска окно загружается обратно
+    """
+
+    def __init__(self, size: int = UPDATE_DEDUPE_SIZE, flush_interval: float = UPDATE_DEDUPE_FLUSH_INTERVAL):
+        self.size = size
+        self.flush_interval = flush_interval
+        self._ring: list = [None] * size
+        self._pos = 0
+        self._seen: set = set()
+        self._pending: list = []
+        # flush вызывается и из планировщика в отдельном потоке
+        self._pending_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self._loaded = False
+        self.stats = {'checked': 0, 'duplicates': 0}
+
+    def _add(self, update_id: int):
+        old = self._ring[self._pos]
+        if old is not None:
+            self._seen.discard(old)
+        self._ring[self._pos] = update_id
+        self._seen.add(update_id)
+        self._pos = (self._pos + 1) % self.size
+
+    def _load(self):
+        for update_id in db.get_processed_updates(self.size):
+            self._add(update_id)
+        self._loaded = True
+
+    def is_duplicate(self, update_id: int) -> bool:
+        """Проверить и запомнить update_id"""
+        if not self._loaded:
+            self._load()
+        self.stats['checked'] += 1
+        if update_id in self._seen:
+            self.stats['duplicates'] += 1
+            logger.warning(f"Апдейт {update_id} уже обработан, пропускаем")
+            return True
+
+        self._add(update_id)
+        with self._pending_lock:
+            self._pending.append(update_id)
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+        return False
+
+    def flush(self):
+        with self._pending_lock:
+            batch, self._pending = self._pending, []
+            self._flushed_at = time.monotonic()
+        if batch and not db.save_processed_updates(batch, self.size):
+            with self._pending_lock:
+                self._pending = batch + self._pending
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, Update) and self.is_duplicate(event.update_id):
+            return None
+        return await handler(event, data)
+
+update_dedupe = UpdateDedupe()
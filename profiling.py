@@ -0,0 +1,157 @@
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import BufferedInputFile, TelegramObject
+
+from config import PROFILE_MAX_SECONDS, PROFILE_TOP, TRACEMALLOC_FRAMES
+
+logger = logging.getLogger(__name__)
+
+class ProfileSession(BaseMiddleware):
+    """
+    Профилирование cProfile на N апдейтов или T секунд.
+    Middleware подключается только на время сессии, поэтому
+    в обычной работе профилировщик ничего не стоит
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, chat_id: int, updates: int = None, seconds: float = None):
+        self.bot = bot
+        self.dp = dp
+        self.chat_id = chat_id
+        self.updates = updates
+        self.seconds = min(seconds or PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS)
+        self.handled = 0
+        self.profile = cProfile.Profile()
+        self._started = 0.0
+        self._timer: Optional[asyncio.Task] = None
+        self._finished = False
+
+    def start(self):
+        self._started = time.perf_counter()
+        self.dp.update.outer_middleware.register(self)
+        self.profile.enable()
+        self._timer = asyncio.create_task(self._stop_later())
+
+    async def _stop_later(self):
+        await asyncio.sleep(self.seconds)
+        await self.finish()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            self.handled += 1
+            if self.updates and self.handled >= self.updates:
+                await self.finish()
+
+    def report(self) -> str:
+        elapsed = time.perf_counter() - self._started
+        out = io.StringIO()
+        out.write(f"Профиль {datetime.now():%d.%m.%Y %H:%M:%S}: {self.handled} апдейтов за {elapsed:.1f} с\n\n")
+        stats = pstats.Stats(self.profile, stream=out).strip_dirs()
+        out.write("=== По накопленному времени (cumulative) ===\n")
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        out.write("\n=== По собственному времени (tottime) ===\n")
+        stats.sort_stats("tottime").print_stats(PROFILE_TOP // 2)
+        return out.getvalue()
+
+    async def finish(self):
+        global _session
+        if self._finished:
+            return
+        self._finished = True
+        self.profile.disable()
+        self.dp.update.outer_middleware.unregister(self)
+        if self._timer and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        if _session is self:
+            _session = None
+
+        text = self.report()
+        logger.info(f"Профилирование завершено: {self.handled} апдейтов")
+        try:
+            await self.bot.send_document(
+                self.chat_id,
+                BufferedInputFile(text.encode("utf-8"), filename=f"profile-{datetime.now():%Y%m%d-%H%M%S}.txt"),
+                caption=f"⏱ Профиль: {self.handled} апдейтов"
+            )
+        except Exception as e:
+            logger.error(f"Не удалось отправить профиль: {e}")
+
+_session: Optional[ProfileSession] = None
+
+def start_profiling(bot: Bot, dp: Dispatcher, chat_id: int, updates: int = None, seconds: float = None) -> bool:
+    """False, если профилирование уже идёт"""
+    global _session
+    if _session is not None:
+        return False
+    _session = ProfileSession(bot, dp, chat_id, updates=updates, seconds=seconds)
+    _session.start()
+    return True
+
+async def stop_profiling() -> bool:
+    if _session is None:
+        return False
+    await _session.finish()
+    return True
+
+# ============================================
+# TRACEMALLOC
+# ============================================
+
+_baseline: Optional[tracemalloc.Snapshot] = None
+
+def _filtered(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+def start_memory_tracing():
+    """Включить tracemalloc и запомнить базовый снимок"""
+    global _baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    _baseline = _filtered(tracemalloc.take_snapshot())
+
+def stop_memory_tracing():
+    global _baseline
+    _baseline = None
+    tracemalloc.stop()
+
+def memory_report() -> Optional[str]:
+    """Топ мест выделения памяти и прирост относительно базового снимка"""
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = _filtered(tracemalloc.take_snapshot())
+    current, peak = tracemalloc.get_traced_memory()
+
+    out = io.StringIO()
+    out.write(f"Память {datetime.now():%d.%m.%Y %H:%M:%S}: сейчас {current / 1024:.0f} КБ, пик {peak / 1024:.0f} КБ\n\n")
+    if _baseline is not None:
+        out.write("=== Прирост с начала наблюдения ===\n")
+        for stat in snapshot.compare_to(_baseline, "lineno")[:PROFILE_TOP]:
+            out.write(f"{stat}\n")
+        out.write("\n")
+    out.write("=== Крупнейшие места выделения ===\n")
+    for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+        out.write(f"{stat}\n")
+    top = snapshot.statistics("traceback")[:1]
+    if top:
+        out.write("\n=== Стек крупнейшего выделения ===\n")
+        out.write("\n".join(top[0].traceback.format()))
+    return out.getvalue()
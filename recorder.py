@@ -0,0 +1,144 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, Iterator, List
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config import RECORD_DIR, RECORD_SALT
+
+logger = logging.getLogger(__name__)
+
+# Без общего ключа id в записи не совпадут с id в копии базы при воспроизведении
+_salt = RECORD_SALT.encode() if RECORD_SALT else secrets.token_bytes(16)
+
+def anonymize_id(value: int) -> int:
+    """Стабильная замена id: ключевой хеш, 48 бит, знак сохраняется (группы отрицательные)"""
+    digest = hmac.new(_salt, str(abs(value)).encode(), hashlib.sha256).digest()
+    anon = int.from_bytes(digest[:6], "big") or 1
+    return -anon if value < 0 else anon
+
+# callback_data с id сотрудника в конце (keyboards.py)
+ID_CALLBACKS = ('find_stats_', 'employees_prev_', 'employees_next_')
+
+# Состояния, в которых текст сообщения - id или ФИО нового сотрудника
+ID_STATES = ('AddEmployeeState:waiting_user_id',)
+NAME_STATES = ('AddEmployeeState:waiting_full_name',)
+MASKED_NAME = "Скрыто Скрыто Скрыто"
+
+def anonymize_callback(value: str) -> str:
+    for prefix in ID_CALLBACKS:
+        if value.startswith(prefix) and value[len(prefix):].lstrip("-").isdigit():
+            return f"{prefix}{anonymize_id(int(value[len(prefix):]))}"
+    return value
+
+def anonymize_update(data: Any) -> Any:
+    """
+    Заменить id пользователей и чатов (в том числе в callback_data),
+    убрать имена и телефоны. Текст сообщений остаётся как есть,
+    кроме ввода id и ФИО при добавлении сотрудника - см. mask_state_text
+    """
+    if isinstance(data, list):
+        return [anonymize_update(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+
+    result = {key: anonymize_update(value) for key, value in data.items()}
+    if isinstance(result.get('callback_data'), str):
+        result['callback_data'] = anonymize_callback(result['callback_data'])
+    if 'chat_instance' in result and isinstance(result.get('data'), str):
+        result['data'] = anonymize_callback(result['data'])
+    is_user = 'is_bot' in result and not result['is_bot']
+    is_chat = 'type' in result and result.get('type') in ('private', 'group', 'supergroup', 'channel')
+    if (is_user or is_chat) and isinstance(result.get('id'), int):
+        result['id'] = anonymize_id(result['id'])
+        for field in ('last_name', 'username', 'title'):
+            result.pop(field, None)
+        if 'first_name' in result:
+            result['first_name'] = "User"
+    if 'user_id' in result and isinstance(result['user_id'], int):
+        result['user_id'] = anonymize_id(result['user_id'])
+    result.pop('phone_number', None)
+    return result
+
+def mask_state_text(raw: Dict[str, Any], state: str = None) -> Dict[str, Any]:
+    """
+    Ответ на вопрос «ID нового сотрудника» заменяется тем же id, что и в копии базы,
+    ответ «ФИО сотрудника» - заглушкой. Состояние FSM знает только бот, поэтому
+    это делается при записи, а не в anonymize_update
+    """
+    message = raw.get('message')
+    if not message or not isinstance(message.get('text'), str):
+        return raw
+    text = message['text'].strip()
+    if state in ID_STATES:
+        message['text'] = str(anonymize_id(int(text))) if text.lstrip("-").isdigit() else MASKED_NAME
+    elif state in NAME_STATES:
+        message['text'] = MASKED_NAME
+    return raw
+
+class UpdateRecorder(BaseMiddleware):
+    """
+    Запись входящих апдейтов для воспроизведения нагрузки.
+    Одна строка JSON на апдейт: {"t": время получения, "u": апдейт}.
+    Файл на день и процесс, только дозапись
+    """
+
+    def __init__(self, directory: str = RECORD_DIR):
+        self.directory = directory
+        self._file = None
+        self._day = None
+        self.recorded = 0
+        if not RECORD_SALT:
+            logger.warning("RECORD_SALT не задан: записанный трафик нельзя будет сопоставить с копией базы")
+
+    def _open(self):
+        today = date.today()
+        if self._day == today:
+            return
+        if self._file:
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"updates-{today:%Y%m%d}-{os.getpid()}.jsonl")
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self._day = today
+
+    def record(self, update: Update, state: str = None):
+        try:
+            self._open()
+            raw = anonymize_update(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+            raw = mask_state_text(raw, state)
+            self._file.write(json.dumps({'t': round(time.time(), 3), 'u': raw},
+                                        ensure_ascii=False, separators=(",", ":")) + "\n")
+            self.recorded += 1
+        except Exception as e:
+            logger.error(f"Ошибка записи апдейта: {e}")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, Update):
+            # raw_state кладёт FSMContextMiddleware, он стоит раньше в цепочке
+            self.record(event, data.get('raw_state'))
+        return await handler(event, data)
+
+def read_capture(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    """Записи из нескольких файлов (по одному на процесс) в порядке времени"""
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+    entries.sort(key=lambda entry: entry['t'])
+    return iter(entries)
@@ -0,0 +1,188 @@
+"""
+Воспроизведение записанного трафика на копии базы.
+
+    RECORD_SALT=... python replay.py captures/updates-20261020-*.jsonl --db database.db --speed 10
+
+Копия базы обезличивается тем же ключом, что и запись, поэтому id
+из записи совпадают с сотрудниками в копии. Бот отвечает поддельному
+Bot API (fake_telegram.py), в конце печатается сводка по задержкам
+"""
+import argparse
+import asyncio
+import glob
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from statistics import median
+from typing import Any, Dict, List
+
+# Колонки с id пользователей, которые обезличиваются в копии базы
+ID_COLUMNS = ('user_id', 'created_by', 'closed_by')
+
+def _anonymize_database(path: str, anonymize_id):
+    """
+    Заменить id пользователей во всех таблицах копии.
+    Триггеры и производные индексы (FTS, R*Tree, итоги) сносятся:
+    init_database создаст их заново уже по новым id
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.create_function("anon", 1, lambda v: anonymize_id(v) if v is not None else None, deterministic=True)
+        objects = conn.execute("SELECT type, name, sql FROM sqlite_master").fetchall()
+        for kind, name, _ in objects:
+            if kind == 'trigger':
+                conn.execute(f"DROP TRIGGER {name}")
+
+        virtual = [name for kind, name, sql in objects if kind == 'table' and (sql or "").startswith("CREATE VIRTUAL")]
+        for name in virtual:
+            conn.execute(f"DROP TABLE {name}")
+        conn.execute("DROP TABLE IF EXISTS record_totals")
+
+        tables = [
+            name for kind, name, sql in objects
+            if kind == 'table' and name not in virtual and not name.startswith("sqlite_")
+            and not any(name.startswith(v + "_") for v in virtual) and name != 'record_totals'
+        ]
+        for table in tables:
+            columns = {row[1] for row in conn.execute(f"SELECT * FROM pragma_table_info('{table}')")}
+            for column in ID_COLUMNS:
+                if column in columns:
+                    conn.execute(f"UPDATE {table} SET {column} = anon({column})")
+
+        # Окно обработанных update_id из продакшена отбросило бы весь повтор
+        conn.execute("DELETE FROM processed_updates")
+        conn.execute("DELETE FROM cache_changes")
+        conn.commit()
+    finally:
+        conn.close()
+
+def prepare_database(source: str, workdir: str, anonymize_id) -> str:
+    """Онлайн-копия базы и годовых архивов в workdir, обезличенная"""
+    from config import ARCHIVE_DIR
+    target = os.path.join(workdir, os.path.basename(source))
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+        years = [row[0] for row in dst.execute("SELECT year FROM archives")]
+    finally:
+        dst.close()
+        src.close()
+    _anonymize_database(target, anonymize_id)
+
+    archive_dir = ARCHIVE_DIR if os.path.isabs(ARCHIVE_DIR) else os.path.join(os.path.dirname(os.path.abspath(source)), ARCHIVE_DIR)
+    for year in years:
+        archive = os.path.join(archive_dir, f"{year}.db")
+        copy = os.path.join(workdir, "archive", f"{year}.db")
+        os.makedirs(os.path.dirname(copy), exist_ok=True)
+        shutil.copy2(archive, copy)
+        conn = sqlite3.connect(copy)
+        conn.create_function("anon", 1, anonymize_id, deterministic=True)
+        for table in ('records', 'absence_periods', 'record_totals'):
+            conn.execute(f"UPDATE {table} SET user_id = anon(user_id)")
+        conn.commit()
+        conn.close()
+    return target
+
+def _percentile(values: List[float], share: float) -> float:
+    return values[max(0, int(len(values) * share) - 1)]
+
+async def replay(paths: List[str], speed: float) -> Dict[str, Any]:
+    from fake_telegram import FakeTelegram
+    from recorder import read_capture
+
+    import config
+    fake = FakeTelegram()
+    config.TELEGRAM_API_URL = await fake.start()
+
+    # Бот импортируется после подготовки окружения: DB_PATH и адрес API читаются при импорте
+    import bot as bot_module
+    bot, dp = bot_module.bot, bot_module.dp
+
+    entries = list(read_capture(paths))
+    if not entries:
+        return {'updates': 0}
+
+    durations: List[float] = []
+    delays: List[float] = []
+    errors = 0
+
+    async def feed(raw: Dict[str, Any]):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            await dp.feed_raw_update(bot, raw)
+        except Exception:
+            errors += 1
+        durations.append(time.perf_counter() - started)
+
+    first = entries[0]['t']
+    started = time.perf_counter()
+    tasks = []
+    for entry in entries:
+        if speed > 0:
+            due = (entry['t'] - first) / speed
+            wait = due - (time.perf_counter() - started)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            delays.append(max(0.0, -wait))
+        tasks.append(asyncio.create_task(feed(entry['u'])))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    await bot.session.close()
+    await fake.stop()
+
+    durations.sort()
+    return {
+        'updates': len(entries),
+        'captured_seconds': round(entries[-1]['t'] - first, 1),
+        'replay_seconds': round(elapsed, 2),
+        'updates_per_second': round(len(entries) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(median(durations) * 1000, 1),
+        'p95_ms': round(_percentile(durations, 0.95) * 1000, 1),
+        'max_ms': round(durations[-1] * 1000, 1),
+        'max_start_delay_ms': round(max(delays) * 1000, 1) if delays else 0.0,
+        'errors': errors,
+        'api_calls': fake.calls,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных апдейтов на копии базы")
+    parser.add_argument("captures", nargs="+", help="файлы записи (можно маску)")
+    parser.add_argument("--db", default="database.db", help="исходная база, копируется")
+    parser.add_argument("--speed", type=float, default=1.0, help="ускорение: 1 - как в записи, 0 - без пауз")
+    args = parser.parse_args()
+
+    paths = sorted({os.path.abspath(path) for pattern in args.captures for path in glob.glob(pattern)})
+    workdir = tempfile.mkdtemp(prefix="shifttracker-replay-")
+
+    # config читает окружение при импорте - всё задаётся до первого импорта модулей бота.
+    # Повтор не пишет свой трафик в запись, даже если RECORD_UPDATES=1 унаследован от продакшена
+    os.environ['DB_PATH'] = os.path.join(workdir, os.path.basename(args.db))
+    os.environ['RECORD_UPDATES'] = "0"
+    os.environ.setdefault('BOT_TOKEN', "123456:REPLAY-REPLAY-REPLAY-REPLAY-REPLAY")
+
+    # Ключ обезличивания берётся из RECORD_SALT, как при записи
+    from recorder import anonymize_id
+    prepare_database(args.db, workdir, anonymize_id)
+
+    import config
+    if not config.RECORD_SALT:
+        print("RECORD_SALT не задан: id из записи не совпадут с сотрудниками в копии базы")
+    # Админские команды в записи идут от обезличенных id
+    config.ADMIN_IDS[:] = [anonymize_id(admin_id) for admin_id in config.ADMIN_IDS]
+    config.RECORD_UPDATES = False
+
+    # bot.py пишет bot.log, копии и записи относительно текущей папки - не в каталоге развёртывания
+    os.chdir(workdir)
+
+    result = asyncio.run(replay(paths, args.speed))
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    print(f"Копия базы и лог: {workdir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from config import (
+    SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST,
+    SEND_GROUP_RATE, SEND_MAX_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: ответы пользователям идут раньше массовых рассылок
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+send_priority: ContextVar[int] = ContextVar("send_priority", default=PRIORITY_INTERACTIVE)
+
+@contextmanager
+def bulk_sending():
+    """Все отправки внутри блока идут с низким приоритетом"""
+    token = send_priority.set(PRIORITY_BULK)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = 0.0
+
+    def _refill(self, now: float):
+        if self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать до появления токена"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+class _Pending:
+    __slots__ = ("chat_id", "future")
+
+    def __init__(self, chat_id: Any, future: asyncio.Future):
+        self.chat_id = chat_id
+        self.future = future
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Центральный планировщик исходящих запросов.
+    Подключается к сессии бота и пропускает все запросы с chat_id
+    через общую и початовую корзины токенов.
+
+    Для каждого приоритета - очереди заявок по чатам и куча чатов
+    по времени, когда корзина чата позволит следующую отправку:
+    выбор заявки стоит O(log n), а не перебор всей очереди
+    """
+
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, chat_rate: float = SEND_CHAT_RATE,
+                 chat_burst: float = SEND_CHAT_BURST, group_rate: float = SEND_GROUP_RATE,
+                 max_retries: int = SEND_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+
+        self._chats: Dict[Any, TokenBucket] = {}
+        # Корзины чистятся, когда их число дорастает до порога, порог - вдвое от оставшихся
+        self._forget_at = 10000
+        priorities = (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+        self._queues: Dict[int, Dict[Any, Deque[_Pending]]] = {p: {} for p in priorities}
+        # (время готовности, номер, chat_id) - каждый чат с заявками ровно один раз
+        self._ready: Dict[int, List[Tuple[float, int, Any]]] = {p: [] for p in priorities}
+        self._depth: Dict[int, int] = {p: 0 for p in priorities}
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.stats = {
+            'sent': 0,
+            'retry_after': 0,
+            'failed_after_retries': 0,
+            'peak_depth': 0,
+        }
+
+    # ---------- метрики ----------
+
+    def queue_depth(self) -> Dict[str, int]:
+        return {
+            'interactive': self._depth[PRIORITY_INTERACTIVE],
+            'bulk': self._depth[PRIORITY_BULK],
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        loop_time = asyncio.get_running_loop().time()
+        return {
+            **self.queue_depth(),
+            **self.stats,
+            'paused_for': round(max(0.0, self._paused_until - loop_time), 1),
+            'tracked_chats': len(self._chats),
+        }
+
+    # ---------- планирование ----------
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Отрицательные ID - группы и каналы, у них свой лимит
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = TokenBucket(rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _forget_idle_chats(self, now: float):
+        """Убираем корзины, которые уже полностью наполнились"""
+        if len(self._chats) < self._forget_at:
+            return
+        for chat_id in [c for c, b in self._chats.items() if now - b.updated > b.capacity / b.rate]:
+            del self._chats[chat_id]
+        self._forget_at = max(10000, 2 * len(self._chats))
+
+    def _schedule(self, priority: int, chat_id: Any, now: float):
+        ready_at = now + self._chat_bucket(chat_id).delay(now)
+        heapq.heappush(self._ready[priority], (ready_at, next(self._seq), chat_id))
+
+    def _pick(self, now: float):
+        """Первая готовая к отправке заявка с учётом приоритета"""
+        min_delay = None
+        for priority in (PRIORITY_INTERACTIVE, PRIORITY_BULK):
+            ready, queues = self._ready[priority], self._queues[priority]
+            while ready and ready[0][0] <= now:
+                _, _, chat_id = heapq.heappop(ready)
+                queue = queues[chat_id]
+                while queue and queue[0].future.done():
+                    queue.popleft()
+                    self._depth[priority] -= 1
+                if not queue:
+                    del queues[chat_id]
+                    continue
+                bucket = self._chat_bucket(chat_id)
+                if bucket.delay(now) > 0:
+                    # Токен чата успела забрать заявка другого приоритета
+                    self._schedule(priority, chat_id, now)
+                    continue
+                pending = queue.popleft()
+                self._depth[priority] -= 1
+                bucket.consume(now)
+                if queue:
+                    self._schedule(priority, chat_id, now)
+                else:
+                    del queues[chat_id]
+                return pending, 0.0
+            if ready:
+                delay = ready[0][0] - now
+                min_delay = delay if min_delay is None else min(min_delay, delay)
+        return None, min_delay
+
+    async def _sleep(self, delay: Optional[float]):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not any(self._ready.values()):
+                await self._sleep(None)
+                continue
+
+            now = loop.time()
+            global_delay = max(self.global_bucket.delay(now), self._paused_until - now)
+            if global_delay > 0:
+                await asyncio.sleep(global_delay)
+                continue
+
+            pending, delay = self._pick(now)
+            if pending is None:
+                await self._sleep(delay)
+                continue
+
+            self.global_bucket.consume(now)
+            pending.future.set_result(None)
+            self._forget_idle_chats(now)
+
+    async def acquire(self, chat_id: Any, priority: int = PRIORITY_INTERACTIVE):
+        """Дождаться разрешения на отправку в чат"""
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._queues[priority].get(chat_id)
+        if queue is None:
+            queue = self._queues[priority][chat_id] = deque()
+            self._schedule(priority, chat_id, loop.time())
+        queue.append(_Pending(chat_id, future))
+        self._depth[priority] += 1
+
+        depth = sum(self._depth.values())
+        self.stats['peak_depth'] = max(self.stats['peak_depth'], depth)
+
+        self._wakeup.set()
+        await future
+
+    def pause(self, seconds: float):
+        """Telegram попросил подождать - останавливаем все отправки"""
+        loop_time = asyncio.get_running_loop().time()
+        self._paused_until = max(self._paused_until, loop_time + seconds)
+
+    # ---------- middleware сессии ----------
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            # getUpdates, answerCallbackQuery и т.п. не ограничиваем
+            return await make_request(bot, method)
+
+        priority = send_priority.get()
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(chat_id, priority)
+            try:
+                result = await make_request(bot, method)
+                self.stats['sent'] += 1
+                return result
+            except TelegramRetryAfter as e:
+                self.stats['retry_after'] += 1
+                if attempt == self.max_retries:
+                    self.stats['failed_after_retries'] += 1
+                    raise
+                logger.warning(
+                    f"Флуд-контроль Telegram: пауза {e.retry_after} с "
+                    f"(чат {chat_id}, попытка {attempt + 1})"
+                )
+                self.pause(e.retry_after)
+
+def format_send_stats(stats: Dict[str, Any]) -> str:
+    """Текст с метриками очереди отправки"""
+    return (
+        f"📤 Очередь отправки\n\n"
+        f"• Ответы в очереди: {stats['interactive']}\n"
+        f"• Рассылка в очереди: {stats['bulk']}\n"
+        f"• Пик очереди: {stats['peak_depth']}\n"
+        f"• Отправлено: {stats['sent']}\n"
+        f"• Ответов 429: {stats['retry_after']}\n"
+        f"• Не доставлено после повторов: {stats['failed_after_retries']}\n"
+        f"• Пауза: {stats['paused_for']} с"
+    )
+
+# Глобальный планировщик отправки
+send_scheduler = SendScheduler()
@@ -0,0 +1,240 @@
+import asyncio
+import bisect
+import hashlib
+import importlib
+import logging
+import multiprocessing
+import queue as queue_module
+import sys
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.utils.backoff import Backoff
+
+from config import SHARD_VIRTUAL_NODES, SHARD_QUEUE_SIZE, SEND_GLOBAL_RATE
+from middlewares import activity, update_dedupe
+from loop_watchdog import loop_watchdog
+from telegram_session import POLLING_BACKOFF
+
+logger = logging.getLogger(__name__)
+
+POLL_TIMEOUT = 30  # Long polling getUpdates, сек
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+class HashRing:
+    """
+    Консистентное хеширование: при изменении числа воркеров
+    на другой воркер переезжает только ~1/N пользователей
+    """
+
+    def __init__(self, nodes: int, virtual_nodes: int = SHARD_VIRTUAL_NODES):
+        points = sorted(
+            (_hash(f"{node}:{replica}"), node)
+            for node in range(nodes)
+            for replica in range(virtual_nodes)
+        )
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: Any) -> int:
+        i = bisect.bisect(self._keys, _hash(str(key))) % len(self._keys)
+        return self._nodes[i]
+
+def update_user_id(update: Dict[str, Any]) -> Any:
+    """
+    Чей это апдейт: from.id для сообщений и нажатий кнопок,
+    иначе id чата, иначе сам update_id
+    """
+    for field, event in update.items():
+        if field == "update_id" or not isinstance(event, dict):
+            continue
+        sender = event.get("from") or event.get("user")
+        if sender:
+            return sender["id"]
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return update["update_id"]
+
+# ============================================
+# ВОРКЕРЫ
+# ============================================
+
+def _share_send_rate(workers: int):
+    """Общий лимит Telegram делится поровну между воркерами и фронтом, который ведёт рассылки"""
+    from send_queue import send_scheduler, TokenBucket
+    rate = SEND_GLOBAL_RATE / (workers + 1)
+    send_scheduler.global_bucket = TokenBucket(rate, rate)
+
+def run_worker(index: int, queue: multiprocessing.Queue, workers: int, acks: multiprocessing.Queue):
+    """Точка входа процесса-воркера"""
+    asyncio.run(_worker_loop(index, queue, workers, acks))
+
+async def _worker_loop(index: int, queue: multiprocessing.Queue, workers: int, acks: multiprocessing.Queue):
+    # spawn уже выполнил bot.py как __mp_main__, если фронт запущен через python bot.py.
+    # Повторный импорт создал бы второй бот и второе подключение к базе
+    main = sys.modules.get("__mp_main__")
+    module = main if hasattr(main, "dp") else importlib.import_module("bot")
+    bot, dp = module.bot, module.dp
+    import broadcast
+    # Рассылки выполняет фронт, воркер только создаёт и отменяет их в базе
+    broadcast.runs_here = False
+    _share_send_rate(workers)
+
+    logger.info(f"Воркер {index} запущен")
+    # Обработчики выполняются здесь - здесь и замеряется задержка цикла
+    loop_watchdog.start()
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    # После перезапуска фронт повторяет необработанные апдейты, часть из них
+    # может ещё лежать в очереди - второй экземпляр пропускается
+    started: Set[int] = set()
+    started_order: Deque[int] = deque()
+
+    def finished(task: asyncio.Task, update_id: int):
+        tasks.discard(task)
+        acks.put_nowait(update_id)
+
+    try:
+        while True:
+            raw = await loop.run_in_executor(None, queue.get)
+            if raw is None:
+                break
+            update_id = raw['update_id']
+            if update_id in started:
+                continue
+            started.add(update_id)
+            started_order.append(update_id)
+            if len(started_order) > 2 * SHARD_QUEUE_SIZE:
+                started.discard(started_order.popleft())
+            task = asyncio.create_task(dp.feed_raw_update(bot, raw))
+            tasks.add(task)
+            task.add_done_callback(lambda done, update_id=update_id: finished(done, update_id))
+    finally:
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        loop_watchdog.stop()
+        await bot.session.close()
+        logger.info(f"Воркер {index} остановлен")
+
+# ============================================
+# ФРОНТ
+# ============================================
+
+class ShardedPolling:
+    """
+    Фронт-процесс: получает апдейты long polling и раздаёт их воркерам
+    по id пользователя. FSM каждого пользователя живёт в одном воркере,
+    база общая (SQLite в режиме WAL).
+
+    Offset в getUpdates сдвигается сразу: придержать его нельзя, Telegram
+    отдавал бы те же апдейты без ожидания. Поэтому фронт помнит апдейты,
+    которые воркер ещё не обработал (воркер подтверждает их через acks),
+    и после падения воркера отдаёт их перезапущенному - не более одного
+    повтора на апдейт, обработчик мог успеть выполниться частично.
+    Апдейты, которые были в работе при падении самого фронта, теряются
+    """
+
+    def __init__(self, workers: int, queue_size: int = SHARD_QUEUE_SIZE):
+        self.workers = workers
+        self.ring = HashRing(workers)
+        self._context = multiprocessing.get_context("spawn")
+        self.queues: List[multiprocessing.Queue] = [
+            self._context.Queue(queue_size) for _ in range(workers)
+        ]
+        self.acks: multiprocessing.Queue = self._context.Queue()
+        # Отправленные воркеру и ещё не подтверждённые апдейты
+        self.unacked: List[Dict[int, Dict[str, Any]]] = [{} for _ in range(workers)]
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self.stats = {'dispatched': [0] * workers, 'restarts': 0, 'redelivered': 0}
+
+    def _start_worker(self, index: int):
+        process = self._context.Process(
+            target=run_worker, args=(index, self.queues[index], self.workers, self.acks),
+            name=f"shifttracker-worker-{index}", daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+
+    def _collect_acks(self):
+        while True:
+            try:
+                update_id = self.acks.get_nowait()
+            except queue_module.Empty:
+                return
+            for unacked in self.unacked:
+                if unacked.pop(update_id, None) is not None:
+                    break
+
+    async def _check_workers(self):
+        """
+        Упавший воркер перезапускается с той же очередью и той же долей пользователей
+        и получает заново апдейты, которые не успел обработать
+        """
+        self._collect_acks()
+        loop = asyncio.get_running_loop()
+        for index, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                logger.error(f"Воркер {index} завершился с кодом {process.exitcode}, перезапуск")
+                self.stats['restarts'] += 1
+                self._start_worker(index)
+                lost = [raw for _, raw in sorted(self.unacked[index].items())]
+                if lost:
+                    logger.warning(f"Воркеру {index} повторно отправлено необработанных апдейтов: {len(lost)}")
+                    self.stats['redelivered'] += len(lost)
+                for raw in lost:
+                    await loop.run_in_executor(None, self.queues[index].put, raw)
+
+    async def _dispatch(self, raw: Dict[str, Any]):
+        index = self.ring.node_for(update_user_id(raw))
+        queue = self.queues[index]
+        self.unacked[index][raw['update_id']] = raw
+        # Полная очередь ждёт в потоке, не блокируя цикл событий фронта
+        await asyncio.get_running_loop().run_in_executor(None, queue.put, raw)
+        self.stats['dispatched'][index] += 1
+        # Обслуживание базы во фронте смотрит на общий поток апдейтов
+        activity.touch()
+
+    async def run(self, bot: Bot, dp: Dispatcher):
+        _share_send_rate(self.workers)
+        for index in range(self.workers):
+            self._start_worker(index)
+        logger.info(f"Запущено воркеров: {self.workers}")
+
+        allowed_updates = dp.resolve_used_update_types()
+        backoff = Backoff(POLLING_BACKOFF)
+        offset = None
+        try:
+            while True:
+                try:
+                    updates = await bot.get_updates(
+                        offset=offset, timeout=POLL_TIMEOUT, allowed_updates=allowed_updates,
+                        request_timeout=int(bot.session.timeout + POLL_TIMEOUT)
+                    )
+                except Exception as e:
+                    logger.error(f"Ошибка получения апдейтов: {e}, повтор через {backoff.next_delay:.1f} с")
+                    await backoff.asleep()
+                    continue
+                backoff.reset()
+
+                await self._check_workers()
+                for update in updates:
+                    offset = update.update_id + 1
+                    if update_dedupe.is_duplicate(update.update_id):
+                        continue
+                    await self._dispatch(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+        finally:
+            await self.stop()
+
+    async def stop(self, timeout: float = 10):
+        loop = asyncio.get_running_loop()
+        for queue in self.queues:
+            await loop.run_in_executor(None, queue.put, None)
+        for process in self.processes:
+            if process is not None:
+                await loop.run_in_executor(None, process.join, timeout)
+                if process.is_alive():
+                    process.terminate()
@@ -0,0 +1,143 @@
+import logging
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+from config import SHIFT_CYCLE, START_DATE, MIN_SHIFT_STAFF
+from database import db
+
+logger = logging.getLogger(__name__)
+
+ABSENCE_TYPES = ['vacation', 'sick', 'unpaid']
+SHIFTS = ['1', '2', '3', '4']
+
+def _merge_intervals(intervals: List[tuple]) -> List[tuple]:
+    """Слияние пересекающихся и соседних отрезков дней"""
+    merged = []
+    for first, last in sorted(intervals):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+def calculate_coverage(start: date, end: date, min_staff: int = MIN_SHIFT_STAFF) -> Optional[Dict[str, Any]]:
+    """
+    Сколько человек реально выходит на дневную и ночную смену каждый день.
+    График даёт плановый состав смены, отсутствия вычитаются через
+    разностные массивы по каждой смене
+    """
+    try:
+        days = (end - start).days + 1
+        if days <= 0:
+            return None
+
+        headcounts = db.get_shift_headcounts()
+
+        # absent[смена][i] - разностный массив отсутствующих на день i
+        absent = {shift: [0] * (days + 1) for shift in SHIFTS}
+        covered: Dict[int, List[tuple]] = {}
+
+        shift_of: Dict[int, str] = {}
+        for period in db.get_overlapping_periods(start, end):
+            first = max(0, (date.fromisoformat(period['start_date']) - start).days)
+            last = min(days - 1, (date.fromisoformat(period['end_date']) - start).days)
+            covered.setdefault(period['user_id'], []).append((first, last))
+            shift_of[period['user_id']] = period['shift_number']
+
+        # Пересекающиеся периоды одного сотрудника (больничный во время отпуска)
+        # сливаются, иначе общие дни вычитались бы дважды
+        for user_id, intervals in covered.items():
+            covered[user_id] = merged = _merge_intervals(intervals)
+            for first, last in merged:
+                absent[shift_of[user_id]][first] += 1
+                absent[shift_of[user_id]][last + 1] -= 1
+
+        reinforce = [0] * days
+        for record in db.get_records_in_range(start, end, ABSENCE_TYPES + ['reinforce']):
+            i = (date.fromisoformat(record['date']) - start).days
+            if record['day_type'] == 'reinforce':
+                reinforce[i] += 1
+                continue
+            # День уже учтён периодом отпуска/больничного
+            if any(first <= i <= last for first, last in covered.get(record['user_id'], [])):
+                continue
+            absent[record['shift_number']][i] += 1
+            absent[record['shift_number']][i + 1] -= 1
+
+        day_staff = [0] * days
+        night_staff = [0] * days
+        cycle_start = date(*START_DATE)
+        day_pos = SHIFT_CYCLE.index('day')
+        night_pos = SHIFT_CYCLE.index('night')
+
+        for shift in SHIFTS:
+            count = headcounts.get(shift, 0)
+            absent_by_day = list(accumulate(absent[shift]))
+            offset = (start - cycle_start).days + int(shift) - 1
+            for i in range(days):
+                position = (offset + i) % len(SHIFT_CYCLE)
+                if position == day_pos:
+                    day_staff[i] += count - absent_by_day[i]
+                elif position == night_pos:
+                    night_staff[i] += count - absent_by_day[i]
+
+        understaffed = [
+            {
+                'date': start + timedelta(days=i),
+                'day': day_staff[i],
+                'night': night_staff[i],
+                'reinforce': reinforce[i],
+            }
+            for i in range(days)
+            if day_staff[i] < min_staff or night_staff[i] < min_staff
+        ]
+
+        return {
+            'start': start,
+            'end': end,
+            'min_staff': min_staff,
+            'day': day_staff,
+            'night': night_staff,
+            'reinforce': reinforce,
+            'understaffed': understaffed,
+        }
+
+    except Exception as e:
+        logger.error(f"Ошибка расчёта покрытия: {e}")
+        return None
+
+def format_coverage(coverage: Dict[str, Any], max_lines: int = 40) -> str:
+    """
+    Форматирование покрытия смен в текст
+    """
+    if not coverage:
+        return "❌ Не удалось рассчитать покрытие"
+
+    text = (
+        f"👥 Покрытие смен {coverage['start'].strftime('%d.%m.%Y')} - "
+        f"{coverage['end'].strftime('%d.%m.%Y')}\n"
+    )
+    text += "─" * 30 + "\n\n"
+
+    days = len(coverage['day'])
+    text += f"🌞 День: мин {min(coverage['day'])}, в среднем {sum(coverage['day']) / days:.1f}\n"
+    text += f"🌙 Ночь: мин {min(coverage['night'])}, в среднем {sum(coverage['night']) / days:.1f}\n"
+    text += f"⚠️ Минимум на смену: {coverage['min_staff']}\n\n"
+
+    understaffed = coverage['understaffed']
+    if not understaffed:
+        text += "✅ Недоукомплектованных дней нет"
+        return text
+
+    text += f"❗ Дней с нехваткой людей: {len(understaffed)}\n"
+    for day in understaffed[:max_lines]:
+        line = f"• {day['date'].strftime('%d.%m')}: 🌞 {day['day']} | 🌙 {day['night']}"
+        if day['reinforce']:
+            line += f" | ⚡ +{day['reinforce']}"
+        text += line + "\n"
+
+    if len(understaffed) > max_lines:
+        text += f"... и ещё {len(understaffed) - max_lines} дней"
+
+    return text
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+from aiohttp import ClientConnectorError, ClientError, ClientTimeout, ServerDisconnectedError
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from aiogram.exceptions import ClientDecodeError, TelegramAPIError, TelegramNetworkError, TelegramServerError
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.utils.backoff import BackoffConfig
+
+from config import (
+    TELEGRAM_API_URL, SESSION_POOL_SIZE, SESSION_KEEPALIVE, SESSION_CONNECT_TIMEOUT,
+    SESSION_READ_TIMEOUT, SESSION_RETRIES, SESSION_BACKOFF_MIN, SESSION_BACKOFF_MAX,
+    BREAKER_FAILURES, BREAKER_COOLDOWN
+)
+
+logger = logging.getLogger(__name__)
+
+# Повтор getUpdates после сбоя сети: быстрый первый повтор, дальше экспонента со случайным разбросом
+POLLING_BACKOFF = BackoffConfig(min_delay=0.5, max_delay=15.0, factor=2.0, jitter=0.3)
+
+class CircuitBreaker:
+    """
+    Предохранитель: после failures подряд ошибок сети запросы сразу
+    завершаются ошибкой на cooldown секунд, потом пропускается один пробный
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probe = False
+        self._outage_started: Optional[float] = None
+        self.stats = {'opened': 0, 'rejected': 0, 'last_outage': None, 'longest_outage': 0.0}
+
+    def allow(self) -> bool:
+        if self.state == 'open':
+            if time.monotonic() - self._opened_at < self.cooldown or self._probe:
+                self.stats['rejected'] += 1
+                return False
+            # half-open: один пробный запрос
+            self._probe = True
+        return True
+
+    def record_success(self):
+        if self._outage_started is not None:
+            outage = round(time.monotonic() - self._outage_started, 2)
+            self.stats['last_outage'] = outage
+            self.stats['longest_outage'] = max(self.stats['longest_outage'], outage)
+            logger.info(f"Связь с Telegram восстановлена, перерыв {outage} с")
+        self.state = 'closed'
+        self._consecutive = 0
+        self._probe = False
+        self._outage_started = None
+
+    def record_failure(self):
+        now = time.monotonic()
+        if self._outage_started is None:
+            self._outage_started = now
+        self._consecutive += 1
+        self._probe = False
+        if self._consecutive >= self.failures and (self.state == 'closed' or now - self._opened_at >= self.cooldown):
+            if self.state == 'closed':
+                self.stats['opened'] += 1
+                logger.warning(f"Telegram недоступен: {self._consecutive} ошибок подряд, пауза {self.cooldown} с")
+            self.state = 'open'
+            self._opened_at = now
+
+    def release_probe(self):
+        """Пробный запрос завершился без вердикта (например, отменён) - следующий станет пробным"""
+        self._probe = False
+
+class ResilientSession(AiohttpSession):
+    """
+    Сессия Bot API с постоянным пулом соединений, раздельными таймаутами
+    подключения и чтения, повторами с экспоненциальной задержкой и разбросом
+    и предохранителем. Повторяются только безопасные запросы: те, что
+    не дошли до сервера, и чтение (get*)
+    """
+
+    def __init__(self, api: TelegramAPIServer = PRODUCTION, retries: int = SESSION_RETRIES,
+                 breaker: CircuitBreaker = None, **kwargs: Any):
+        super().__init__(api=api, timeout=SESSION_READ_TIMEOUT, **kwargs)
+        self._connector_init.update(
+            limit=SESSION_POOL_SIZE,
+            keepalive_timeout=SESSION_KEEPALIVE,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True,
+        )
+        self.retries = retries
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = {'requests': 0, 'network_errors': 0, 'retries': 0}
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        # "Full jitter": равномерно от 0 до экспоненты, чтобы воркеры не стучались разом
+        return random.uniform(0, min(SESSION_BACKOFF_MAX, SESSION_BACKOFF_MIN * 2 ** attempt))
+
+    @staticmethod
+    def _can_retry(method: TelegramMethod, error: Exception) -> bool:
+        if isinstance(error, ClientConnectorError):
+            # Соединение не установлено - запрос точно не выполнен
+            return True
+        return method.__api_method__.startswith("get")
+
+    async def _post(self, bot: Bot, method: TelegramMethod[TelegramType], timeout: float) -> TelegramType:
+        session = await self.create_session()
+        url = self.api.api_url(token=bot.token, method=method.__api_method__)
+        form = self.build_form_data(bot=bot, method=method)
+        client_timeout = ClientTimeout(total=timeout, sock_connect=SESSION_CONNECT_TIMEOUT)
+        async with session.post(url, data=form, timeout=client_timeout) as resp:
+            raw_result = await resp.text()
+        response = self.check_response(bot=bot, method=method, status_code=resp.status, content=raw_result)
+        return response.result
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: Optional[int] = None
+    ) -> TelegramType:
+        if not self.breaker.allow():
+            raise TelegramNetworkError(method=method, message="Telegram недоступен, запрос не отправлен")
+
+        # Открытый предохранитель пропускает только пробный запрос
+        is_probe = self.breaker.state == 'open'
+        timeout = self.timeout if timeout is None else timeout
+        attempt = 0
+        try:
+            while True:
+                self.stats['requests'] += 1
+                try:
+                    result = await self._post(bot, method, timeout)
+                except (TelegramServerError, ClientDecodeError):
+                    # 5xx или HTML-страница прокси вместо ответа Bot API
+                    self.breaker.record_failure()
+                    raise
+                except TelegramAPIError:
+                    # Ответ пришёл - сеть в порядке, ошибка в самом запросе
+                    self.breaker.record_success()
+                    raise
+                except (asyncio.TimeoutError, ClientError) as e:
+                    self.stats['network_errors'] += 1
+                    self.breaker.record_failure()
+                    if attempt >= self.retries or not self._can_retry(method, e) or self.breaker.state == 'open':
+                        message = "Request timeout error" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+                        raise TelegramNetworkError(method=method, message=message)
+                    # Закрытое сервером соединение из пула сразу заменяется новым
+                    delay = 0 if isinstance(e, ServerDisconnectedError) else self._backoff(attempt)
+                    attempt += 1
+                    self.stats['retries'] += 1
+                    logger.warning(f"{method.__api_method__}: {type(e).__name__}, повтор {attempt} через {delay:.2f} с")
+                    await asyncio.sleep(delay)
+                    continue
+                except Exception:
+                    self.breaker.record_failure()
+                    raise
+                self.breaker.record_success()
+                return result
+        finally:
+            # Пробный запрос не должен остаться занятым навсегда, чем бы он ни завершился
+            if is_probe:
+                self.breaker.release_probe()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, **self.breaker.stats, 'breaker': self.breaker.state}
+
+def create_session() -> ResilientSession:
+    """Сессия бота: TELEGRAM_API_URL позволяет подключить локальный Bot API или тестовый сервер"""
+    api = TelegramAPIServer.from_base(TELEGRAM_API_URL) if TELEGRAM_API_URL else PRODUCTION
+    return ResilientSession(api=api)
+
+def format_session_stats(stats: Dict[str, Any]) -> str:
+    state = {'closed': "✅ норма", 'open': "⛔ пауза"}.get(stats['breaker'], stats['breaker'])
+    last = f"{stats['last_outage']} с" if stats['last_outage'] is not None else "не было"
+    return (
+        f"🌐 Связь с Telegram: {state}\n\n"
+        f"• Запросов: {stats['requests']}\n"
+        f"• Ошибок сети: {stats['network_errors']}\n"
+        f"• Повторов: {stats['retries']}\n"
+        f"• Отклонено предохранителем: {stats['rejected']}\n"
+        f"• Срабатываний предохранителя: {stats['opened']}\n"
+        f"• Последний перерыв: {last}, самый долгий: {stats['longest_outage']} с"
+    )
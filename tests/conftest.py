@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# config читает окружение при импорте: база, лог и копии - во временной папке
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix="shifttracker-tests-")
+ADMIN_ID = 42
+os.environ['DB_PATH'] = os.path.join(WORKDIR, "test.db")
+os.environ['BOT_TOKEN'] = "123456:TEST-TEST-TEST-TEST-TEST-TEST-TEST"
+os.environ['ADMIN_IDS'] = str(ADMIN_ID)
+os.environ.pop('RECORD_UPDATES', None)
+os.environ.pop('TELEGRAM_API_URL', None)
+os.chdir(WORKDIR)
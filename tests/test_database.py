@@ -0,0 +1,116 @@
+import os
+import sqlite3
+from datetime import date
+
+import pytest
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    from database_sqlite import Database
+    db = Database(str(tmp_path / "archive-test.db"))
+    db.add_employee(5001, "Архив Тест", "1")
+    db.add_records_bulk(5001, [date(2020, 3, d) for d in (2, 3, 4)], 'work', 12)
+    db.add_records_bulk(5001, [date(date.today().year, 1, 9)], 'work', 8)
+    return db
+
+def _count(path: str, table: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_archive_year_replaces_leftover_file(fresh_db):
+    path = fresh_db._archive_path(2020)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as leftover:
+        leftover.write(b"not a database")
+
+    result = fresh_db.archive_year(2020)
+    assert result == {'year': 2020, 'records': 3, 'periods': 0}
+    assert _count(path, "records") == 3
+    assert _count(fresh_db.db_path, "records") == 1
+    assert 2020 in fresh_db.archived_years
+
+def test_failed_archive_leaves_main_intact(fresh_db, monkeypatch):
+    def broken(cursor):
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(fresh_db, "_create_record_triggers", broken)
+
+    assert fresh_db.archive_year(2020) is None
+    assert not os.path.exists(fresh_db._archive_path(2020))
+    assert _count(fresh_db.db_path, "records") == 4
+    assert _count(fresh_db.db_path, "archives") == 0
+
+def test_record_triggers_restored_after_archive(fresh_db):
+    assert fresh_db.archive_year(2020)
+    conn = sqlite3.connect(fresh_db.db_path)
+    try:
+        triggers = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'records'"
+        )}
+        seq_before = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM cache_changes").fetchone()[0]
+    finally:
+        conn.close()
+    for action in ('insert', 'delete', 'update'):
+        for kind in ('totals', 'closed', 'changes'):
+            assert f"trg_records_{kind}_{action}" in triggers
+
+    assert fresh_db.add_record(5001, date(date.today().year, 1, 12), 'work', 12)
+    conn = sqlite3.connect(fresh_db.db_path)
+    try:
+        row = conn.execute("SELECT seq FROM cache_changes WHERE key = 'records:5001'").fetchone()
+    finally:
+        conn.close()
+    assert row is not None and row[0] > seq_before
+
+def test_history_page_reads_covering_index(fresh_db):
+    conn = fresh_db.get_connection()
+    try:
+        plan = " ".join(row['detail'] for row in conn.execute(
+            """
+            EXPLAIN QUERY PLAN
+            SELECT id, day, type_code, hours FROM records
+            WHERE user_id = ? AND (day, id) < (?, ?) ORDER BY day DESC LIMIT ?
+            """,
+            (5001, 10, 1, 11)
+        ))
+    finally:
+        conn.close()
+    assert "COVERING INDEX idx_records_user_day" in plan
+
+def test_broadcast_recipient_fails_after_max_passes(fresh_db):
+    broadcast_id = fresh_db.create_broadcast("Объявление", 42)
+    assert fresh_db.end_broadcast_pass(broadcast_id, 2) == 1
+    assert fresh_db.get_broadcast_progress(broadcast_id)['pending'] == 1
+    assert fresh_db.end_broadcast_pass(broadcast_id, 2) == 0
+    assert fresh_db.get_broadcast_progress(broadcast_id) == {'pending': 0, 'sent': 0, 'failed': 1}
+
+def test_fuzzy_search_tolerates_typo_in_first_letters(fresh_db):
+    fresh_db.add_employee(5002, "Федоров Пётр Ильич", "2")
+    # Первая буква фамилии неверная: префиксный поиск кандидатов не даст
+    found = fresh_db.search_employees("Ведоров")
+    assert [emp['user_id'] for emp in found] == [5002]
+    assert fresh_db.search_employees("федор")[0]['user_id'] == 5002
+
+def test_range_totals_have_no_float_drift(fresh_db):
+    days = [date(2021, 5, d) for d in range(1, 29)]
+    for day in days:
+        fresh_db.add_record(5001, day, 'work', 0.1)
+    totals = fresh_db.get_range_totals(5001, date(2021, 5, 2), date(2021, 5, 28))
+    assert totals['work_hours'] == 2.7
+    assert totals['work_days'] == 27
+
+def test_processed_updates_trimmed_by_insertion_order(fresh_db):
+    fresh_db.save_processed_updates([900, 901, 902], keep=3)
+    # После сброса бота update_id начинаются заново
+    fresh_db.save_processed_updates([5, 6], keep=3)
+    assert fresh_db.get_processed_updates(3) == [902, 5, 6]
+
+def test_employees_count_is_cached_until_employees_change(fresh_db):
+    assert fresh_db.count_employees() == 1
+    hits = fresh_db.cache.stats['hits']
+    assert fresh_db.count_employees() == 1
+    assert fresh_db.cache.stats['hits'] == hits + 1
+    fresh_db.add_employee(5003, "Новый Сотрудник", "3")
+    assert fresh_db.count_employees() == 2
@@ -0,0 +1,193 @@
+"""
+Прогон bot.py целиком против поддельного Bot API (fake_telegram.py):
+апдейты идут через getUpdates, ответы перехватываются на стороне сервера
+"""
+import asyncio
+
+import pytest
+
+from conftest import ADMIN_ID
+from fake_telegram import FakeTelegram
+
+class RunningBot:
+    def __init__(self, loop: asyncio.AbstractEventLoop, fake: FakeTelegram, module):
+        self.loop = loop
+        self.fake = fake
+        self.module = module
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+@pytest.fixture(scope="module")
+def running_bot():
+    loop = asyncio.new_event_loop()
+    fake = FakeTelegram()
+    url = loop.run_until_complete(fake.start())
+
+    # Адрес API читается при создании бота - подменяем до импорта bot.py
+    import config
+    import telegram_session
+    config.TELEGRAM_API_URL = telegram_session.TELEGRAM_API_URL = url
+    import bot as bot_module
+
+    polling = loop.create_task(bot_module.dp.start_polling(bot_module.bot, handle_signals=False))
+    loop.run_until_complete(asyncio.sleep(0.3))
+    yield RunningBot(loop, fake, bot_module)
+
+    loop.run_until_complete(bot_module.dp.stop_polling())
+    loop.run_until_complete(polling)
+    loop.run_until_complete(bot_module.bot.session.close())
+    loop.run_until_complete(fake.stop())
+    # Как asyncio.run: дождаться отмены того, что осталось в цикле
+    pending = asyncio.all_tasks(loop)
+    for task in pending:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    loop.close()
+
+def test_start_replies(running_bot):
+    reply = running_bot.run(running_bot.fake.request(1001, "/start"))
+    assert reply['method'] == "sendMessage"
+    assert reply['seconds'] < 2
+
+def test_admin_command(running_bot):
+    reply = running_bot.run(running_bot.fake.request(ADMIN_ID, "/лаг"))
+    assert "Эта команда только для администраторов" not in reply['params']['text']
+
+def test_latency_and_throughput(running_bot):
+    users = list(range(2001, 2021))
+    result = running_bot.run(running_bot.fake.measure(users, "/start", rounds=3))
+    print(f"\n/start, {len(users)} пользователей x 3: {result}")
+    assert result['requests'] == 60
+    assert result['p95_ms'] < 2000
+
+def _callbacks(reply) -> list:
+    markup = reply['params'].get('reply_markup') or {}
+    return [button.get('callback_data') for row in markup.get('inline_keyboard', []) for button in row]
+
+def test_period_flow_has_no_multi_date_button(running_bot):
+    db = running_bot.module.db
+    db.add_employee(3001, "Тест Периодов", "1")
+
+    single = running_bot.run(running_bot.fake.request(3001, "/отпуск"))
+    assert "date_multi" in _callbacks(single)
+    period = running_bot.run(running_bot.fake.request(3001, "/отпуск_период"))
+    assert "date_multi" not in _callbacks(period)
+
+def test_fill_month_in_closed_month_is_refused(running_bot):
+    db = running_bot.module.db
+    db.add_employee(3002, "Тест Закрытого", "2")
+    assert db.close_month(2025, 1, lambda totals, employees, salary: {}, closed_by=ADMIN_ID) == 0
+
+    reply = running_bot.run(running_bot.fake.request(3002, "/заполнить 1.2025"))
+    assert reply['params']['text'] == running_bot.module.LOCKED_DATE_TEXT
+
+    fake = running_bot.fake
+    waiter = fake.wait_for(lambda call: call['method'] == "editMessageText" and str(call['params']['chat_id']) == "3002")
+    fake.push_callback(3002, "fill_confirm_2025_1")
+    edited = running_bot.run(waiter)
+    assert edited['params']['text'] == running_bot.module.LOCKED_DATE_TEXT
+
+def test_closed_month_records_cannot_be_deleted(running_bot):
+    import calculations
+    db = running_bot.module.db
+    db.add_employee(3004, "Тест Исправления", "1")
+    db.add_record(3004, running_bot.module.date(2025, 2, 3), 'work', 12)
+    record = db.get_record(3004, running_bot.module.date(2025, 2, 3))
+
+    assert calculations.close_month_for_team(2025, 2, ADMIN_ID) >= 1
+    snapshot = db.get_month_snapshot(3004, 2025, 2)
+    assert snapshot['closed'] and snapshot['total_work_hours'] == 12
+
+    reply = running_bot.run(running_bot.fake.request(3004, "/исправить"))
+    callbacks = _callbacks(reply)
+    assert "locked" in callbacks
+    assert f"delete_{record['id']}" not in callbacks
+
+    fake = running_bot.fake
+    waiter = fake.wait_for(lambda call: call['method'] == "editMessageText" and str(call['params']['chat_id']) == "3004")
+    fake.push_callback(3004, f"delete_{record['id']}")
+    edited = running_bot.run(waiter)
+    assert edited['params']['text'] == running_bot.module.LOCKED_DATE_TEXT
+    assert db.get_record(3004, running_bot.module.date(2025, 2, 3))
+
+def test_year_stats_match_month_stats(running_bot):
+    import calculations
+    db = running_bot.module.db
+    db.add_employee(3003, "Тест Года", "3")
+    db.update_employee_rates(3003, vacation_rate=2000, sick_rate=1500)
+    db.add_records_bulk(3003, [running_bot.module.date(2026, 3, d) for d in (2, 3, 7)], 'work', 12)
+    db.add_records_bulk(3003, [running_bot.module.date(2026, 3, 10)], 'vacation', 0)
+
+    year = calculations.calculate_year_stats(3003, 2026)
+    march = calculations.calculate_month_stats(3003, 2026, 3)
+    assert year['months'][2]['total'] == march['total']
+    assert year['months'][2]['total_work_hours'] == march['total_work_hours']
+
+def test_front_runs_broadcasts_created_in_workers(running_bot):
+    import broadcast
+    db = running_bot.module.db
+    bot = running_bot.module.bot
+
+    async def wait_status(broadcast_id: int, status: str):
+        for _ in range(100):
+            if db.get_broadcast(broadcast_id)['status'] == status:
+                return
+            await asyncio.sleep(0.05)
+        raise AssertionError(f"рассылка #{broadcast_id} не перешла в {status}")
+
+    # Воркер создаёт рассылку, но не выполняет её
+    broadcast.runs_here = False
+    try:
+        created = db.create_broadcast("Объявление из воркера", ADMIN_ID)
+        broadcast.start_broadcast(bot, created)
+        assert created not in broadcast._running
+        cancelled = db.create_broadcast("Отменённое объявление", ADMIN_ID)
+        assert broadcast.cancel_broadcast(cancelled)
+    finally:
+        broadcast.runs_here = True
+
+    # Фронт подхватывает только то, что осталось активным
+    running_bot.run(broadcast.sync_broadcasts(bot))
+    assert created in broadcast._running
+    assert cancelled not in broadcast._running
+    running_bot.run(wait_status(created, 'done'))
+    texts = [call['params'].get('text') for call in running_bot.fake.sent if call['method'] == "sendMessage"]
+    assert "Объявление из воркера" in texts
+    assert "Отменённое объявление" not in texts
+
+def test_broadcast_retries_recipients_after_network_errors(running_bot, monkeypatch):
+    import broadcast
+    db = running_bot.module.db
+    monkeypatch.setattr(broadcast, "BROADCAST_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(broadcast, "BROADCAST_RETRY_DELAY", 0.2)
+
+    broadcast_id = db.create_broadcast("Объявление со сбоем", ADMIN_ID)
+    running_bot.fake.fail("sendMessage", 502, count=2)
+
+    async def run():
+        broadcast.start_broadcast(running_bot.module.bot, broadcast_id)
+        for _ in range(100):
+            if db.get_broadcast(broadcast_id)['status'] == 'done':
+                return
+            await asyncio.sleep(0.05)
+
+    running_bot.run(run())
+    progress = db.get_broadcast_progress(broadcast_id)
+    assert db.get_broadcast(broadcast_id)['status'] == 'done'
+    assert progress['failed'] == 0
+    assert progress['pending'] == 0
+    assert progress['sent'] == len(db.get_all_employees())
+
+def test_restore_keyboard_fits_callback_limit(running_bot):
+    import backup
+    # Длинное имя копии: тег плюс имя файла базы и время
+    created = backup.create_backup(tag="перед-обновлением-очень-длинная-метка")
+    assert created is not None
+    name = created['name']
+
+    reply = running_bot.run(running_bot.fake.request(ADMIN_ID, f"/восстановить {name}"))
+    callbacks = _callbacks(reply)
+    assert callbacks and all(len(data.encode()) <= 64 for data in callbacks)
+    key = next(data for data in callbacks if data.startswith("restore_ok_"))[len("restore_ok_"):]
+    assert backup.find_backup(key) == name
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from aiogram import Bot, Dispatcher
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from loop_watchdog import LoopWatchdog
+
+TOKEN = "123456:TEST-TEST-TEST-TEST-TEST-TEST-TEST"
+
+async def blocking_handler(message: Message):
+    time.sleep(0.5)
+
+def _update(update_id: int, text: str) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': 7, 'type': 'private'},
+            'from': {'id': 7, 'is_bot': False, 'first_name': "Тест"},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text)}],
+        },
+    }
+
+def test_stall_is_attributed_to_blocking_handler():
+    async def scenario():
+        dp = Dispatcher()
+        dp.message.register(blocking_handler, Command("медленно"))
+        bot = Bot(TOKEN)
+        watchdog = LoopWatchdog(interval=0.05, threshold=0.2)
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.1)
+            await dp.feed_raw_update(bot, _update(1, "/медленно"))
+            await asyncio.sleep(0.1)
+        finally:
+            watchdog.stop()
+            await bot.session.close()
+        return watchdog.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['stalls'] == 1
+    assert stats['max_ms'] >= 200
+    (handler, site), count = stats['blockers'][0]
+    assert handler == "test_loop_watchdog.py:blocking_handler"
+    assert site.startswith("test_loop_watchdog.py:blocking_handler:")
@@ -0,0 +1,24 @@
+import asyncio
+
+from aiogram.types import CallbackQuery, Update, User
+
+from middlewares import UserOrderMiddleware
+
+def test_idle_user_slot_is_released_after_duplicate_window():
+    middleware = UserOrderMiddleware(duplicate_window=0.05)
+    user = User(id=7, is_bot=False, first_name="Тест")
+    update = Update(update_id=1, callback_query=CallbackQuery(
+        id="1", from_user=user, chat_instance="1", data="stats_month"
+    ))
+
+    async def handler(event, data):
+        return "ok"
+
+    async def scenario():
+        assert await middleware(handler, update, {'event_from_user': user}) == "ok"
+        # Нажатие помнится, пока не прошло окно повторов
+        assert 7 in middleware._slots
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert middleware._slots == {}
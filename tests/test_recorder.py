@@ -0,0 +1,33 @@
+from recorder import MASKED_NAME, anonymize_id, anonymize_update, mask_state_text
+
+def test_callback_data_ids_are_anonymized():
+    update = {
+        'update_id': 1,
+        'callback_query': {
+            'id': "1",
+            'chat_instance': "1",
+            'from': {'id': 777, 'is_bot': False, 'first_name': "Иван"},
+            'data': "find_stats_555",
+            'message': {
+                'message_id': 1,
+                'chat': {'id': 777, 'type': "private"},
+                'reply_markup': {'inline_keyboard': [[
+                    {'text': "Вперёд ▶️", 'callback_data': "employees_next_555"},
+                    {'text': "Отмена", 'callback_data': "cancel"},
+                ]]},
+            },
+        },
+    }
+    query = anonymize_update(update)['callback_query']
+    assert query['data'] == f"find_stats_{anonymize_id(555)}"
+    buttons = query['message']['reply_markup']['inline_keyboard'][0]
+    assert buttons[0]['callback_data'] == f"employees_next_{anonymize_id(555)}"
+    assert buttons[1]['callback_data'] == "cancel"
+
+def test_registration_answers_are_masked():
+    def message(text):
+        return {'update_id': 1, 'message': {'message_id': 1, 'text': text}}
+
+    assert mask_state_text(message("555"), "AddEmployeeState:waiting_user_id")['message']['text'] == str(anonymize_id(555))
+    assert mask_state_text(message("Иванов Иван"), "AddEmployeeState:waiting_full_name")['message']['text'] == MASKED_NAME
+    assert mask_state_text(message("/статистика"), None)['message']['text'] == "/статистика"
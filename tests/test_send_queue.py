@@ -0,0 +1,39 @@
+import asyncio
+
+from send_queue import PRIORITY_BULK, PRIORITY_INTERACTIVE, SendScheduler
+
+def test_ready_chats_are_not_blocked_by_busy_ones():
+    scheduler = SendScheduler(global_rate=1000, chat_rate=20, chat_burst=1, group_rate=20)
+    order = []
+
+    async def send(chat_id, tag, priority=PRIORITY_INTERACTIVE):
+        await scheduler.acquire(chat_id, priority)
+        order.append(tag)
+
+    async def scenario():
+        tasks = [asyncio.create_task(send(1, f"a{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(send(2, "b0", PRIORITY_BULK)))
+        tasks.append(asyncio.create_task(send(3, "c0")))
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=2)
+        assert scheduler.queue_depth() == {'interactive': 0, 'bulk': 0}
+
+    asyncio.run(scenario())
+    # Чат 1 упирается в свой лимит, остальные не ждут его очереди
+    assert order[:3] == ["a0", "c0", "b0"]
+    assert order[3:] == ["a1", "a2"]
+
+def test_cancelled_request_leaves_queue():
+    scheduler = SendScheduler(global_rate=1000, chat_rate=5, chat_burst=1, group_rate=5)
+
+    async def scenario():
+        await scheduler.acquire(1)
+        waiting = asyncio.create_task(scheduler.acquire(1))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        await asyncio.wait_for(scheduler.acquire(2), timeout=1)
+        await asyncio.sleep(0.3)
+        assert scheduler.queue_depth()['interactive'] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+from sharding import ShardedPolling
+
+class DeadProcess:
+    exitcode = -9
+
+    def is_alive(self):
+        return False
+
+def test_crashed_worker_gets_unacked_updates_again(monkeypatch):
+    front = ShardedPolling(1)
+    monkeypatch.setattr(front, "_start_worker", lambda index: None)
+
+    async def scenario():
+        for update_id in (1, 2, 3):
+            await front._dispatch({'update_id': update_id, 'message': {'from': {'id': 7}}})
+        front.acks.put(2)
+        # Очередь multiprocessing передаёт данные через поток-отправитель
+        time.sleep(0.2)
+        front.processes[0] = DeadProcess()
+        await front._check_workers()
+
+    asyncio.run(scenario())
+    queued = []
+    while len(queued) < 5:
+        queued.append(front.queues[0].get(timeout=1)['update_id'])
+    assert queued == [1, 2, 3, 1, 3]
+    assert front.stats['redelivered'] == 2
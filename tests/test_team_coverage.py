@@ -0,0 +1,26 @@
+from datetime import date
+
+import team_coverage
+from database_sqlite import Database
+
+def test_overlapping_periods_are_subtracted_once(tmp_path, monkeypatch):
+    db = Database(str(tmp_path / "coverage-test.db"))
+    monkeypatch.setattr(team_coverage, "db", db)
+    for user_id in (6001, 6002):
+        db.add_employee(user_id, f"Смена Один {user_id}", "1")
+    start, end = date(2030, 6, 1), date(2030, 6, 20)
+    before = team_coverage.calculate_coverage(start, end, min_staff=0)
+
+    # Больничный посреди отпуска одного сотрудника
+    db.add_absence_period(6001, 'vacation', date(2030, 6, 1), date(2030, 6, 10))
+    db.add_absence_period(6001, 'sick', date(2030, 6, 5), date(2030, 6, 15))
+    after = team_coverage.calculate_coverage(start, end, min_staff=0)
+
+    for shift in ('day', 'night'):
+        missing = [b - a for b, a in zip(before[shift], after[shift])]
+        assert set(missing) <= {0, 1}
+        assert 1 in missing
+
+def test_merge_intervals():
+    assert team_coverage._merge_intervals([(5, 14), (0, 9), (16, 18), (15, 15)]) == [(0, 18)]
+    assert team_coverage._merge_intervals([(0, 2), (4, 5)]) == [(0, 2), (4, 5)]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from aiogram import Bot
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import ClientDecodeError, TelegramServerError
+
+from fake_telegram import FakeTelegram
+from telegram_session import CircuitBreaker, ResilientSession
+
+TOKEN = "123456:TEST-TEST-TEST-TEST-TEST-TEST-TEST"
+
+async def _open_breaker():
+    fake = FakeTelegram()
+    url = await fake.start()
+    breaker = CircuitBreaker(failures=1, cooldown=0.1)
+    bot = Bot(TOKEN, session=ResilientSession(api=TelegramAPIServer.from_base(url), breaker=breaker))
+    fake.fail("getMe", 502)
+    with pytest.raises(TelegramServerError):
+        await bot.get_me()
+    assert breaker.state == 'open'
+    await asyncio.sleep(0.15)
+    return fake, bot, breaker
+
+def test_breaker_recovers_after_html_probe():
+    async def scenario():
+        fake, bot, breaker = await _open_breaker()
+        try:
+            # Пробный запрос получает HTML-страницу прокси вместо JSON
+            fake.fail("getMe", 502, html=True)
+            with pytest.raises(ClientDecodeError):
+                await bot.get_me()
+            assert breaker.state == 'open'
+
+            await asyncio.sleep(0.15)
+            me = await bot.get_me()
+            assert me.is_bot
+            assert breaker.state == 'closed'
+        finally:
+            await bot.session.close()
+            await fake.stop()
+
+    asyncio.run(scenario())
+
+def test_breaker_recovers_after_cancelled_probe():
+    async def scenario():
+        fake, bot, breaker = await _open_breaker()
+        try:
+            fake.latency = 1.0
+            probe = asyncio.create_task(bot.get_me())
+            await asyncio.sleep(0.05)
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+
+            fake.latency = 0.0
+            me = await bot.get_me()
+            assert me.is_bot
+            assert breaker.state == 'closed'
+        finally:
+            await bot.session.close()
+            await fake.stop()
+
+    asyncio.run(scenario())